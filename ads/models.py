@@ -3,10 +3,12 @@ import os
 import re
 import uuid
 from datetime import date
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Max
 from django.utils.translation import gettext_lazy as _
 
+from main.tasks import defer_per_transaction
+
 def ad_poster_upload_path(instance, filename):
     """Generate a file path for new ad poster uploads."""
     ext = filename.split('.')[-1]
@@ -126,8 +128,24 @@ class AdClick(models.Model):
 def normalize_positions(ad_space):
     """
     Reassigns sequential position numbers to AdPlacements in a given AdSpace.
+    Only the placements whose position changes are written, in one bulk_update
+    (which fires no signals, so this does not re-trigger itself).
     """
-    placements = AdPlacement.objects.filter(ad_space=ad_space).order_by('position')
+    placements = AdPlacement.objects.filter(ad_space=ad_space).order_by('position', 'pk').only('pk', 'position')
+    changed = []
     for i, placement in enumerate(placements):
-        placement.position = i + 1
-        placement.save()
\ No newline at end of file
+        if placement.position != i + 1:
+            placement.position = i + 1
+            changed.append(placement)
+    return AdPlacement.objects.bulk_update(changed, ['position'], batch_size=500)
+
+
+def schedule_normalize(ad_space_id):
+    """ Normalize the space once the current transaction commits, however many placements it touched. """
+    defer_per_transaction('ads.normalize_positions', [ad_space_id], normalize_spaces)
+
+
+def normalize_spaces(ad_space_ids):
+    for ad_space_id in sorted(ad_space_ids):
+        with transaction.atomic():
+            normalize_positions(ad_space_id)
\ No newline at end of file
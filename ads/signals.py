@@ -1,7 +1,10 @@
 from datetime import date
 from django.db.models.signals import pre_save, post_delete, post_save
 from django.dispatch import receiver
-from .models import AdManager, AdPlacement, normalize_positions
+from main.cache import bump_generation
+from main.files import track_file_fields
+from main.images import watch_image_fields
+from .models import AdManager, AdPlacement, AdType, schedule_normalize
 
 
 @receiver(pre_save, sender=AdManager)
@@ -18,5 +21,17 @@ def ad_manager_pre_save(sender, instance, **kwargs):
 
 
 @receiver([post_save, post_delete], sender=AdPlacement)
-def auto_normalize_positions(sender, instance, **kwargs):
-    normalize_positions(instance.ad_space)
+def auto_normalize_positions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_normalize(instance.ad_space_id)
+
+
+@receiver([post_save, post_delete], sender=AdManager)
+@receiver([post_save, post_delete], sender=AdType)
+def bump_ads_generation(sender, **kwargs):
+    """ Invalidate the cached home page ad carousel. """
+    bump_generation("ads")
+
+
+track_file_fields(AdManager, "poster")
+watch_image_fields(AdManager, "poster", generation="ads")
@@ -1,3 +1,46 @@
+from unittest import mock
+
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import AdManager, AdPlacement, AdSpace
+
+
+class PlacementPositionTest(TestCase):
+
+    def setUp(self):
+        self.space = AdSpace.objects.create(name="Home", slug="home")
+        self.ads = AdManager.objects.bulk_create([AdManager(campaign_title=f"Ad {i}") for i in range(5)])
+
+    def positions(self):
+        return list(AdPlacement.objects.filter(ad_space=self.space).values_list("ad_id", "position"))
+
+    def test_positions_are_normalized_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for ad in self.ads:
+                    AdPlacement.objects.create(ad=ad, ad_space=self.space, position=10 * (ad.pk % 3) + 5)
+        self.assertEqual(len(callbacks), 1)
+        ordered = sorted(self.ads, key=lambda ad: (10 * (ad.pk % 3) + 5, ad.pk))
+        self.assertEqual(self.positions(), [(ad.pk, i) for i, ad in enumerate(ordered, start=1)])
+
+    def test_delete_closes_the_gap_in_one_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for ad in self.ads:
+                AdPlacement.objects.create(ad=ad, ad_space=self.space)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            AdPlacement.objects.get(ad=self.ads[1]).delete()
+        self.assertEqual(self.positions(), [(ad.pk, i) for i, ad in enumerate(self.ads[:1] + self.ads[2:], start=1)])
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("UPDATE")]), 1)
 
-# Create your tests here.
+    def test_rolled_back_spaces_are_not_normalized(self):
+        sidebar = AdSpace.objects.create(name="Sidebar", slug="sidebar")
+        with mock.patch("ads.models.normalize_positions") as normalize:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    AdPlacement.objects.create(ad=self.ads[0], ad_space=sidebar)
+                    raise RuntimeError
+            with self.captureOnCommitCallbacks(execute=True):
+                AdPlacement.objects.create(ad=self.ads[1], ad_space=self.space)
+        normalize.assert_called_once_with(self.space.pk)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from schools.models.schoolsModel import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the public read endpoints served synchronously (WSGI: a fixed pool of worker "
+        "threads, like gunicorn sync workers) and asynchronously (ASGI: one event loop) with "
+        "--connections clients in flight at once. Latency is measured from the moment a request "
+        "is sent, so time spent queued for a WSGI worker counts. Each ASGI request gets its own "
+        "thread for sync code, as under ASGIHandler. --db-latency models a networked database. "
+        "Throwaway schools are created and deleted again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=500, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and server.")
+        parser.add_argument("--workers", type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument("--schools", type=int, default=50, help="Throwaway schools to create.")
+        parser.add_argument("--db-latency", type=float, default=0,
+                            help="Milliseconds added to every query, like a database across the network.")
+
+    def handle(self, *args, **options):
+        # One log line per request would dominate the run
+        logging.getLogger("main.instrumentation").setLevel(logging.ERROR)
+        prefix = f"bench-asgi-{uuid.uuid4().hex[:8]}"
+        School.objects.bulk_create(
+            School(name=f"{prefix} {i}", location="11.5564,104.9282") for i in range(options["schools"])
+        )
+        endpoints = [
+            ("schools-list", reverse("api:schools-view"), {"q": prefix}),
+            ("search", reverse("search:search_schools"), {"q": "bench"}),
+            ("scholarships", reverse("scholarships"), {}),
+        ]
+        if options["db_latency"]:
+            self.add_latency(options["db_latency"] / 1000)
+        try:
+            for name, url, params in endpoints:
+                wsgi = self.run_wsgi(url, params, options)
+                asgi = asyncio.run(self.run_asgi(url, params, options))
+                for server, (elapsed, latencies, statuses, threads) in (("wsgi", wsgi), ("asgi", asgi)):
+                    self.report(name, server, elapsed, latencies, statuses, threads)
+        finally:
+            School.objects.filter(name__startswith=prefix).delete()
+
+    def run_wsgi(self, url, params, options):
+        def get(sent):
+            try:
+                status = Client().get(url, params).status_code
+                return status, time.perf_counter() - sent
+            finally:
+                connections.close_all()
+
+        async def clients():
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                # The event loop only models the clients; every request runs on a worker thread
+                return await self.drive(options, lambda: loop.run_in_executor(pool, get, time.perf_counter()))
+
+        return asyncio.run(clients())
+
+    async def run_asgi(self, url, params, options):
+        async def get():
+            sent = time.perf_counter()
+            # ASGIHandler gives each request its own thread for sync code; AsyncClient does not
+            async with ThreadSensitiveContext():
+                response = await AsyncClient().get(url, params)
+            return response.status_code, time.perf_counter() - sent
+
+        return await self.drive(options, get)
+
+    def add_latency(self, seconds):
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            if slow_execute not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_execute)
+
+        # Every thread opens its own connections
+        connection_created.connect(install, weak=False)
+        for connection in connections.all():
+            install(connection)
+
+    async def drive(self, options, request):
+        """
+        Send ``--requests`` requests from ``--connections`` clients, each one
+        request at a time; also return the most threads alive at once.
+        """
+        total, concurrency = options["requests"], options["connections"]
+        results = []
+        threads = 0
+
+        async def client(count):
+            nonlocal threads
+            for _ in range(count):
+                results.append(await request())
+                threads = max(threads, threading.active_count())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client(total // concurrency + (i < total % concurrency)) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        return elapsed, [latency for _, latency in results], [s for s, _ in results], threads
+
+    def report(self, name, server, elapsed, latencies, statuses, threads):
+        p50 = statistics.median(latencies) * 1000
+        p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+        errors = sum(status != 200 for status in statuses)
+        self.stdout.write(f"{name:<13} {server}: {len(latencies) / elapsed:8.1f} req/s, "
+                          f"p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, {threads} threads, {errors} errors")
@@ -0,0 +1,32 @@
+"""
+ api/pagination.py
+ Pagination classes shared by the API views
+"""
+from rest_framework.pagination import CursorPagination
+
+# ?ordering= values accepted by the school list, paginated or streamed ("-" prefix for descending)
+SCHOOL_ORDERING_FIELDS = ("created_date", "name")
+
+
+def school_ordering(value):
+    """ ``order_by`` fields for an ``?ordering=`` value, with ``pk`` as tie-breaker; None when not accepted. """
+    value = value or "created_date"
+    if value.removeprefix("-") not in SCHOOL_ORDERING_FIELDS:
+        return None
+    return (value, "-pk" if value.startswith("-") else "pk")
+
+
+class SchoolCursorPagination(CursorPagination):
+    """
+    Keyset pagination for schools ordered by ``created_date`` with ``pk`` as tie-breaker.
+
+    Pass ``?ordering=`` one of ``SCHOOL_ORDERING_FIELDS``, e.g. ``-created_date``
+    to walk the catalogue newest first; the view rejects other values.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("created_date", "pk")
+
+    def get_ordering(self, request, queryset, view):
+        return school_ordering(request.query_params.get("ordering")) or self.ordering
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch, QuerySet
 from rest_framework import serializers
 
 # Application
@@ -35,6 +36,13 @@ class PlatformProfileSerializer(serializers.ModelSerializer):
 
 
 class SchoolSerializer(serializers.ModelSerializer):
+    """
+    Serializer for School with its nested types, levels and platform profiles.
+
+    Querysets handed to this serializer are passed through
+    ``setup_eager_loading`` so the nested relations are fetched with a fixed
+    number of queries instead of one (or more) per school.
+    """
     type = SchoolTypeSerializer(many=True, read_only=True)
     educational_levels = EducationalLevelSerializer(many=True, read_only=True)
     platform_profiles = PlatformProfileSerializer(
@@ -45,10 +53,30 @@ class SchoolSerializer(serializers.ModelSerializer):
         model = School
         fields = (
             'pk', 'uuid', 'name', 'local_name', 'logo', 'cover_image', 'short_name', 
-            'founder', 'president', 'established', 'location', 'created_date', 
+            'founder', 'president', 'established', 'location', 'latitude', 'longitude', 'created_date', 
             'updated_date', 'slug', 'type', 'educational_levels', 'platform_profiles'
         )
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """ Add the prefetches needed to serialize ``queryset`` without N+1 queries. """
+        return queryset.prefetch_related(
+            "type",
+            "educational_levels",
+            Prefetch(
+                "platform_profiles_school",
+                queryset=PlatformProfile.objects.select_related("platform"),
+            ),
+        )
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            args = (cls.setup_eager_loading(args[0]),) + args[1:]
+        elif isinstance(kwargs.get("instance"), QuerySet):
+            kwargs["instance"] = cls.setup_eager_loading(kwargs["instance"])
+        return super().many_init(*args, **kwargs)
+
     def create(self, validated_data):
         types_data = validated_data.pop('type', [])
         school = School.objects.create(**validated_data)
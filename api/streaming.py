@@ -0,0 +1,58 @@
+"""
+ api/streaming.py
+ Helpers to stream large querysets as JSON without building the whole payload in memory
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+STREAM_CHUNK_SIZE = 500
+
+
+def iter_json_array(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """ Yield a JSON array one serialized row at a time. """
+    renderer = JSONRenderer()
+    yield b"["
+    separator = b""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield separator + renderer.render(serializer_class(obj).data)
+        separator = b","
+    yield b"]"
+
+
+async def aiter_json_array(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    ``iter_json_array`` for ASGI, where Django would buffer a sync iterator
+    whole. Each chunk of rows is read and serialized in the sync thread (the
+    cursor stays on one thread, and lazy serializer lookups are allowed).
+    """
+    parts = iter_json_array(queryset, serializer_class, chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: b"".join(islice(parts, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iteration over a sync iterator of byte chunks, for ASGI responses.
+    Each ``next()`` runs in the sync thread, so a generator reading the
+    database keeps its cursor on one thread.
+    """
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, None)) is not None:
+        yield chunk
+
+
+def streaming_json_response(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE, asynchronous=False):
+    """
+    Return a StreamingHttpResponse that writes ``queryset`` as a JSON array.
+    Pass ``asynchronous=True`` when the request is served through ASGI.
+    """
+    iterate = aiter_json_array if asynchronous else iter_json_array
+    return StreamingHttpResponse(
+        iterate(queryset, serializer_class, chunk_size=chunk_size),
+        content_type="application/json",
+    )
@@ -1,3 +1,250 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.handlers.base import BaseHandler
+from django.db import connection
+from django.http import JsonResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.views.schools_api import SchoolAPIView
+from user.models import User
+from schools.models.levels import EducationalLevel
+from schools.models.OnlineProfile import Platform, PlatformProfile
+from schools.models.schoolsModel import School, SchoolType
+
+
+def create_schools(count, prefix="School"):
+    """ Create ``count`` schools, each with a type, a level and two platform profiles. """
+    school_type, _ = SchoolType.objects.get_or_create(type="University")
+    level, _ = EducationalLevel.objects.get_or_create(level_name="Higher Education")
+    facebook, _ = Platform.objects.get_or_create(name="Facebook", short_name="fb")
+    telegram, _ = Platform.objects.get_or_create(name="Telegram", short_name="tg")
+    schools = []
+    for i in range(count):
+        school = School.objects.create(name=f"{prefix} {i}", location="11.5564,104.9282")
+        school.type.add(school_type)
+        school.educational_levels.add(level)
+        PlatformProfile.objects.create(school=school, platform=facebook, username=f"fb{i}")
+        PlatformProfile.objects.create(school=school, platform=telegram, username=f"tg{i}")
+        schools.append(school)
+    return schools
+
+
+class SchoolSerializerQueryCountTest(TestCase):
+    """ The school endpoints must not issue per-row queries for nested relations. """
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_schools_list_query_count_is_constant(self):
+        url = reverse("api:schools-view")
+        create_schools(2, prefix="Small")
+        small_count, small_data = self.count_queries(url)
+
+        create_schools(20, prefix="Large")
+        large_count, large_data = self.count_queries(url)
+
+        self.assertEqual(len(small_data), 2)
+        self.assertEqual(len(large_data), 22)
+        self.assertEqual(small_count, large_count)
+        # schools + type + educational_levels + platform profiles (with platform)
+        self.assertEqual(large_count, 4)
+        self.assertEqual(large_data[0]["platform_profiles"][0]["platform"]["name"], "Facebook")
+
+
+class SchoolViewSetListTest(TestCase):
+    """ Cursor pagination and streaming output for /api/v1/schools/ """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="api-user", password="secret"))
+        self.url = reverse("api:schools-list")
+        create_schools(5)
+
+    def test_list_is_cursor_paginated(self):
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([s["name"] for s in data["results"]], ["School 0", "School 1"])
+        self.assertIsNone(data["previous"])
+
+        names = [s["name"] for s in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            names += [s["name"] for s in data["results"]]
+        self.assertEqual(names, [f"School {i}" for i in range(5)])
+
+    def test_list_descending_order(self):
+        data = self.client.get(self.url, {"ordering": "-created_date"}).json()
+        self.assertEqual(data["results"][0]["name"], "School 4")
+
+    def test_list_ordering_matches_the_stream(self):
+        data = self.client.get(self.url, {"ordering": "-name", "page_size": 2}).json()
+        names = [s["name"] for s in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            names += [s["name"] for s in data["results"]]
+        self.assertEqual(names, [f"School {i}" for i in reversed(range(5))])
+        for ordering in ("no_such_field", "organization__name"):
+            self.assertEqual(self.client.get(self.url, {"ordering": ordering}).status_code, 400)
+
+    def test_empty_list(self):
+        data = self.client.get(self.url, {"search": "no such school"}).json()
+        self.assertEqual(data["results"], [])
+
+    def test_stream_returns_all_rows(self):
+        response = self.client.get(self.url, {"stream": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([s["name"] for s in rows], [f"School {i}" for i in range(5)])
+        self.assertEqual(len(rows[0]["platform_profiles"]), 2)
+
+    def test_stream_empty(self):
+        response = self.client.get(self.url, {"stream": "1", "search": "no such school"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
+
+    def test_stream_ordering_is_validated(self):
+        rows = json.loads(b"".join(self.client.get(self.url, {"stream": "1", "ordering": "-name"}).streaming_content))
+        self.assertEqual(rows[0]["name"], "School 4")
+        for ordering in ("no_such_field", "organization__name"):
+            response = self.client.get(self.url, {"stream": "1", "ordering": ordering})
+            self.assertEqual(response.status_code, 400)
+
+    async def test_stream_is_an_async_iterator_under_asgi(self):
+        user = await User.objects.acreate(username="async-user")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(self.url, {"stream": "1"})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([s["name"] for s in json.loads(body)], [f"School {i}" for i in range(5)])
+
+
+class SchoolNearbyTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        for name, location in (("Phnom Penh", "11.5564,104.9282"), ("Takhmao", "11.4800,104.9500"),
+                               ("Siem Reap", "13.3633,103.8564"), ("Nowhere", "")):
+            School.objects.create(name=name, location=location)
+
+    def nearby(self, **params):
+        return self.client.get(reverse("api:schools-nearby"), params)
+
+    def test_nearest_first_within_radius(self):
+        response = self.nearby(lat=11.55, lon=104.92, radius=20)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s["name"] for s in response.data], ["Phnom Penh", "Takhmao"])
+        self.assertLess(response.data[0]["distance_km"], response.data[1]["distance_km"])
+
+    def test_large_radius_and_limit(self):
+        # Siem Reap is about 230 km from Phnom Penh but all three are 110-125 km from this point
+        response = self.nearby(lat=12.45, lon=104.40, radius=200, limit=5)
+        self.assertEqual([s["name"] for s in response.data], ["Phnom Penh", "Siem Reap", "Takhmao"])
+        self.assertEqual(len(self.nearby(lat=12.45, lon=104.40, radius=200, limit=1).data), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.nearby(lat=11.55).status_code, 400)
+        self.assertEqual(self.nearby(lat=95, lon=104.92).status_code, 400)
+        self.assertEqual(self.nearby(lat=11.55, lon=104.92, radius=5000).status_code, 400)
+
+
+class AsyncSchoolAPIViewTest(TestCase):
+    """ schools-list/ is an async view and must serve ASGI requests. """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_schools(3, prefix="Royal")
+        create_schools(2, prefix="Institute")
+
+    async def test_async_client_lists_and_filters(self):
+        response = await self.async_client.get(reverse("api:schools-view"), {"q": "royal"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sorted(s["name"] for s in data), ["Royal 0", "Royal 1", "Royal 2"])
+        self.assertEqual(data[0]["type"][0]["type"], "University")
+        self.assertEqual(len(data[0]["platform_profiles"]), 2)
+
+    async def test_only_get_is_allowed(self):
+        response = await self.async_client.post(reverse("api:schools-view"))
+        self.assertEqual(response.status_code, 405)
+
+    def test_middleware_chain_is_not_adapted(self):
+        # With DEBUG, Django logs every middleware it has to wrap in sync_to_async/async_to_sync
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            BaseHandler().load_middleware(is_async=True)
+
+    async def test_slow_requests_are_served_concurrently(self):
+        async def slow_get(view, request, *args, **kwargs):
+            await asyncio.sleep(0.2)
+            return JsonResponse([], safe=False)
+
+        with mock.patch.object(SchoolAPIView, "get", slow_get):
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(self.async_client.get(reverse("api:schools-view")) for _ in range(10)))
+            elapsed = time.perf_counter() - start
+        self.assertEqual({response.status_code for response in responses}, {200})
+        # One after the other they would take 2 s
+        self.assertLess(elapsed, 1.0)
+
+
+class CatalogExportTest(TestCase):
+    """ Streaming exports at /api/export/<kind>.<format> """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="api-user", password="secret"))
+        self.schools = create_schools(3)
+
+    def url(self, kind="schools", file_format="jsonl"):
+        return reverse("api:catalog-export", args=[kind, file_format])
+
+    def test_jsonl_streams_one_row_per_line_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url())
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["name"] for row in rows], ["School 0", "School 1", "School 2"])
+        self.assertEqual((rows[0]["type"], rows[0]["educational_levels"]), (["University"], ["Higher Education"]))
+        self.assertEqual(rows[0]["uuid"], str(self.schools[0].uuid))
+        # Rows, then one query per many-to-many field for the batch
+        self.assertEqual(len(queries), 3)
+
+    def test_csv_since_exports_only_updated_rows(self):
+        School.objects.filter(pk=self.schools[0].pk).update(updated_date=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get(self.url(file_format="csv"), {"since": since})
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["name"] for row in rows], ["School 1", "School 2"])
+        self.assertEqual(rows[0]["type"], "University")
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url(kind="users")).status_code, 404)
+        self.assertEqual(self.client.get(self.url(file_format="xml")).status_code, 400)
+        self.assertEqual(self.client.get(self.url(), {"since": "yesterday"}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(self.url()).status_code, (401, 403))
+
+    async def test_export_is_an_async_iterator_under_asgi(self):
+        user = await User.objects.acreate(username="async-user")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(self.url())
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["School 0", "School 1", "School 2"])
@@ -5,6 +5,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from api.views.export_api import CatalogExportView
 from api.views.school_type_api import SchoolTypeViewSet
 from api.views.schools_api import SchoolAPIView, SchoolViewSet
 
@@ -18,4 +19,5 @@ router.register(r'school-types', SchoolTypeViewSet, basename="school-types")
 urlpatterns = [
     path('', include(router.urls)),
     path('schools-list/', SchoolAPIView.as_view(), name="schools-view"),
+    path('export/<slug:kind>.<slug:file_format>', CatalogExportView.as_view(), name="catalog-export"),
 ]
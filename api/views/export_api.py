@@ -0,0 +1,45 @@
+""" Catalog export API """
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.streaming import aiter_chunks
+from schools.services.export import CONTENT_TYPES, EXPORTS, available_formats, iter_export, parse_since
+
+
+class CatalogExportView(APIView):
+    """
+    Streams a whole table as a file download: /api/export/<kind>.<jsonl|csv|parquet>
+
+    ``kind`` is schools, scholarships or organizations. Pass
+    ``?since=<ISO date or datetime>`` to export only the rows updated after it.
+    Under ASGI the batches are pulled through an async iterator, since Django
+    would read a sync iterator to the end before sending anything.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, kind, file_format):
+        if kind not in EXPORTS:
+            return Response({"detail": f"Unknown export {kind!r}."}, status=status.HTTP_404_NOT_FOUND)
+        if file_format not in available_formats():
+            return Response({"detail": f"Format {file_format!r} is not available; use one of {available_formats()}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        since = None
+        if request.query_params.get("since"):
+            since = parse_since(request.query_params["since"])
+            if since is None:
+                return Response({"detail": "since must be an ISO date or datetime."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        chunks = iter_export(kind, file_format, since=since)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[file_format])
+        filename = f"{kind}-{timezone.now():%Y%m%d%H%M%S}.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -2,36 +2,61 @@
  project/api/schools_api.py 
  Handler for School API
 """
+import heapq
+
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q
+from django.http import JsonResponse
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.permissions import AllowAny
-from rest_framework.views import APIView
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.renderers import JSONRenderer
 
 from schools.models.schoolsModel import School, SchoolType
+from api.pagination import SCHOOL_ORDERING_FIELDS, SchoolCursorPagination, school_ordering
 from api.serializers.school_serializers import SchoolSerializer, SchoolTypeSerializer
+from api.streaming import streaming_json_response
+from schools.services.geo import covering_cells, within_radius
+from search.suggest import suggest_index
+
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 200
+NEARBY_MAX_LIMIT = 100
 
 
-class SchoolAPIView(APIView):
-    permission_classes = [AllowAny]
+class SchoolAPIView(View):
+    """
+    Public list of schools, optionally filtered by name: ?q=<text>
+
+    A plain async Django view rather than a DRF ``APIView`` (DRF views are
+    synchronous), so under ASGI the queries run on the async ORM and a slow
+    database does not hold a worker thread.
+    """
 
-    def get(self, request, *args, **kwargs):
-        search_query = request.query_params.get('q', '')
+    async def get(self, request, *args, **kwargs):
+        search_query = request.GET.get('q', '')
         schools = School.objects.all()
         if search_query:
             schools = schools.filter(name__icontains=search_query)
-        serializer = SchoolSerializer(schools, many=True)
-        return Response(serializer.data)
+        schools = SchoolSerializer.setup_eager_loading(schools)
+        # Prefetches are applied per chunk, so the query count stays constant
+        instances = [school async for school in schools.aiterator(chunk_size=500)]
+        return JsonResponse(SchoolSerializer(instances, many=True).data, safe=False)
 
 
 class SchoolViewSet(viewsets.ViewSet):
     """
     ViewSet for handling CRUD operations for School, with filtering, search, and ordering.
+
+    ``list`` is cursor paginated; pass ``?stream=1`` to receive every matching
+    school as a single streamed JSON array instead.
     """
     permission_classes = [IsAuthenticated]
+    pagination_class = SchoolCursorPagination
     # lookup_field = 'uuid'
 
     def list(self, request):
@@ -52,17 +77,62 @@ class SchoolViewSet(viewsets.ViewSet):
                                        Q(president__icontains=search) |
                                        Q(founder__icontains=search))
 
-        ordering = request.query_params.get('ordering', None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        else:
-            queryset = queryset.order_by('created_date')
-
-        if not queryset:
-            return Response([], status=status.HTTP_200_OK)
-         
-        serializer = SchoolSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        queryset = SchoolSerializer.setup_eager_loading(queryset)
+
+        # Validated once for both outputs; the paginator reads the same parameter
+        ordering = school_ordering(request.query_params.get('ordering'))
+        if ordering is None:
+            return Response({"detail": f"ordering must be one of {', '.join(SCHOOL_ORDERING_FIELDS)}, "
+                                       f"optionally prefixed with '-'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get("stream") in ("1", "true"):
+            queryset = queryset.order_by(*ordering)
+            return streaming_json_response(queryset, SchoolSerializer,
+                                           asynchronous=isinstance(request._request, ASGIRequest))
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = SchoolSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["get"], permission_classes=[AllowAny])
+    def suggest(self, request):
+        """ Autocomplete school names from the in-memory suggest index: ?q=<text>&limit=<n> """
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 25)
+        except ValueError:
+            limit = 10
+        return Response(suggest_index.suggest(query, limit=limit), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], permission_classes=[AllowAny])
+    def nearby(self, request):
+        """ Active schools within ``radius`` km of a point, nearest first: ?lat=&lon=&radius=<km>&limit=<n> """
+        try:
+            lat = float(request.query_params["lat"])
+            lon = float(request.query_params["lon"])
+            radius = float(request.query_params.get("radius", NEARBY_DEFAULT_RADIUS_KM))
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), NEARBY_MAX_LIMIT)
+        except (KeyError, ValueError):
+            return Response({"detail": "lat and lon are required and must be numbers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 0 < radius <= NEARBY_MAX_RADIUS_KM:
+            return Response({"detail": f"Invalid coordinates or radius (max {NEARBY_MAX_RADIUS_KM} km)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Geohash cells covering the circle are index range scans; "~" sorts after every geohash character
+        cells = Q()
+        for cell in covering_cells(lat, lon, radius):
+            cells |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+        points = School.objects.filter(cells, is_active=True).values_list("pk", "latitude", "longitude")
+        nearest = heapq.nsmallest(limit, within_radius(lat, lon, radius, points.iterator()))
+
+        schools = SchoolSerializer.setup_eager_loading(School.objects.all()).in_bulk([pk for _, pk in nearest])
+        data = SchoolSerializer([schools[pk] for _, pk in nearest], many=True).data
+        for item, (distance, _pk) in zip(data, nearest):
+            item["distance_km"] = round(distance, 3)
+        return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request):
         serializer = SchoolSerializer(data=request.data)
@@ -73,7 +143,7 @@ class SchoolViewSet(viewsets.ViewSet):
 
     def retrieve(self, request, pk=None):
         try:
-            school = School.objects.get(pk=pk)
+            school = SchoolSerializer.setup_eager_loading(School.objects.all()).get(pk=pk)
             serializer = SchoolSerializer(school)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except School.DoesNotExist:
@@ -0,0 +1,70 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from main.database import has_psycopg_pool, postgres_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the Postgres connection reuse modes of main/database.py. Worker threads "
+        "issue short requests (one query, then the end-of-request connection cleanup Django "
+        "runs) and the p50/p99 latency of each mode is reported. Defaults to the database of "
+        "AZURE_POSTGRESQL_CONNECTIONSTRING."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connection-string", default=os.environ.get("AZURE_POSTGRESQL_CONNECTIONSTRING"))
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=8, help="Worker threads, like a gunicorn pool.")
+        parser.add_argument("--query", default="SELECT 1")
+
+    def handle(self, *args, **options):
+        if not options["connection_string"]:
+            raise CommandError("Pass --connection-string or set AZURE_POSTGRESQL_CONNECTIONSTRING.")
+        modes = ["off", "persistent", "pgbouncer"] + (["psycopg"] if has_psycopg_pool() else [])
+        baseline = None
+        for mode in modes:
+            latencies = self.run(mode, options)
+            p50 = statistics.median(latencies) * 1000
+            p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+            baseline = baseline or p50
+            self.stdout.write(f"{mode:<11} p50 {p50:7.2f} ms, p99 {p99:7.2f} ms "
+                              f"({(1 - p50 / baseline) * 100:+.0f}% p50 vs off)")
+
+    def run(self, mode, options):
+        alias = f"benchmark_{mode}"
+        database = postgres_settings(f"{options['connection_string']} pool={mode}")
+        # configure_settings fills in the defaults of every other DATABASES key
+        configured = connections.configure_settings({DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+                                                     alias: database})
+        connections.settings[alias] = configured[alias]
+
+        opened = set()
+
+        def request(_):
+            connection = connections[alias]
+            opened.add(connection)
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(options["query"])
+                cursor.fetchall()
+            # What request_finished does: close, keep, or return the connection to the pool
+            connection.close_if_unusable_or_obsolete()
+            return time.perf_counter() - start
+
+        try:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                return list(pool.map(request, range(options["requests"])))
+        finally:
+            # The wrappers belong to the finished worker threads; close their driver connections directly
+            for connection in opened:
+                if connection.connection is not None and mode != "psycopg":
+                    connection.connection.close()
+            if mode == "psycopg":
+                connections[alias].close_pool()
+            del connections.settings[alias]
@@ -1,3 +1,27 @@
+import base64
+from hashlib import sha256
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+
+
+class HealthCheckTest(TestCase):
+
+    def token(self, key):
+        return base64.b64encode(sha256(key.encode()).digest()).decode()
+
+    async def test_requires_internal_token(self):
+        with mock.patch.dict("os.environ", {"WEBSITE_AUTH_ENCRYPTION_KEY": "secret"}):
+            response = await self.async_client.get(reverse("health_check:health_check"),
+                                                    headers={"x-ms-auth-internal-token": "wrong"})
+        self.assertEqual(response.status_code, 403)
 
-# Create your tests here.
+    async def test_reports_database(self):
+        with mock.patch.dict("os.environ", {"WEBSITE_AUTH_ENCRYPTION_KEY": "secret"}):
+            response = await self.async_client.get(reverse("health_check:health_check"),
+                                                    headers={"x-ms-auth-internal-token": self.token("secret")})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["status"], data["database"]), ("healthy", True))
+        self.assertEqual(data["pool"], {"mode": "off", "conn_max_age": 0, "connected": True})
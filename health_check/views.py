@@ -2,8 +2,11 @@ import base64
 import os
 from hashlib import sha256
 
+from asgiref.sync import sync_to_async
 from django.http import HttpResponseForbidden, JsonResponse
 
+from main.database import connection_stats
+
 
 def header_matches_env_var(header_value):
     """
@@ -19,22 +22,32 @@ def header_matches_env_var(header_value):
     return hash == header_value
 
 
-def health_check(request):
+def check_database():
+    """ Return whether the default database answers, and its connection pool stats. """
+    from django.db import connections
+    from django.db.utils import OperationalError
+    connection = connections['default']
+    try:
+        connection.cursor()
+        healthy = True
+    except OperationalError:
+        healthy = False
+    return healthy, connection_stats(connection)
+
+
+async def health_check(request):
     auth_header = request.headers.get('x-ms-auth-internal-token')
     if not header_matches_env_var(auth_header):
         return HttpResponseForbidden("Invalid token")
 
+    # Connecting is blocking; run it on the thread that owns the connection
+    healthy, pool = await sync_to_async(check_database)()
+
     # Health check logic
     data = {
         "status": "healthy",
-        "database": True
+        "database": healthy,
+        "pool": pool,
     }
-    try:
-        from django.db import connections
-        from django.db.utils import OperationalError
-        db_conn = connections['default']
-        db_conn.cursor()
-    except OperationalError:
-        data["database"] = False
 
     return JsonResponse(data, status=200 if data["database"] else 500)
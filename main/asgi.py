@@ -2,6 +2,8 @@
 ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI worker, e.g.
+``gunicorn -k uvicorn.workers.UvicornWorker main.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -11,7 +13,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-SETTINGS_MODULE = "main.settings.production" if "WEBSITE_HOSTNAME" in os.environ else "main.settings.development"
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', SETTINGS_MODULE)
+
+settings_module = 'main.production' if 'WEBSITE_HOSTNAME' in os.environ else 'main.settings'
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
 
 application = get_asgi_application()
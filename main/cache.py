@@ -0,0 +1,255 @@
+"""
+ main/cache.py
+ Cache helpers shared by the apps.
+
+ ``TieredCache`` is a cache backend that puts a small in-process LocMem tier
+ (L1) with a short TTL in front of a shared backend such as Redis, and
+ protects ``get_or_set`` against stampedes. ``redis_cache_settings`` builds
+ the production CACHES entry for it.
+
+ Generation counters version groups of cached data: cache keys include the
+ current generation of the data they were built from, and signals bump the
+ generation when that data changes, so stale entries are simply never read
+ again and expire on their own.
+"""
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+# Keys that must never be served stale from another process's L1: sessions
+# (logout must take effect everywhere) and the login throttling counters.
+LOCAL_EXCLUDED_PREFIXES = ("django.contrib.sessions", "login_throttle:")
+LOCK_STRIPES = 64
+
+
+class TieredCache(BaseCache):
+    """
+    Two-tier cache backend.
+
+    OPTIONS:
+      REMOTE             CACHES-style dict of the shared backend (required)
+      LOCAL_TIMEOUT      seconds a value may be served from the local tier (5)
+      LOCAL_MAX_ENTRIES  size of the local tier (1000)
+      LOCAL_EXCLUDED_PREFIXES  keys starting with these skip the local tier
+      LOCK_TIMEOUT       seconds a get_or_set recomputation may hold its lock (10)
+
+    Writes go to both tiers, so a process always sees its own writes; other
+    processes may read a value up to LOCAL_TIMEOUT seconds old. Keys, versions
+    and timeouts are passed through unchanged, so KEY_PREFIX/VERSION/TIMEOUT
+    belong in the REMOTE settings.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get("OPTIONS", {}))
+        remote = dict(options.pop("REMOTE"))
+        super().__init__({})
+        self.remote = import_string(remote.pop("BACKEND"))(remote.pop("LOCATION", ""), remote)
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self.local = LocMemCache(f"tiered-{location}-{id(self)}", {
+            "TIMEOUT": self.local_timeout,
+            "OPTIONS": {"MAX_ENTRIES": options.get("LOCAL_MAX_ENTRIES", 1000)},
+        })
+        self.excluded_prefixes = tuple(options.get("LOCAL_EXCLUDED_PREFIXES", LOCAL_EXCLUDED_PREFIXES))
+        self.lock_timeout = options.get("LOCK_TIMEOUT", 10)
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def is_local(self, key):
+        return not str(key).startswith(self.excluded_prefixes)
+
+    def local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def set_local(self, key, value, timeout, version):
+        if not self.is_local(key):
+            return
+        ttl = self.local_ttl(timeout)
+        if ttl > 0:
+            self.local.set(key, value, ttl, version=version)
+        else:
+            self.local.delete(key, version=version)
+
+    def get(self, key, default=None, version=None):
+        if self.is_local(key):
+            value = self.local.get(key, self._missing_key, version=version)
+            if value is not self._missing_key:
+                return value
+        value = self.remote.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            return default
+        self.set_local(key, value, None, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        local_keys = [key for key in keys if self.is_local(key)]
+        if local_keys:
+            found.update(self.local.get_many(local_keys, version=version))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            remote = self.remote.get_many(missing, version=version)
+            for key, value in remote.items():
+                self.set_local(key, value, None, version)
+            found.update(remote)
+        return found
+
+    def has_key(self, key, version=None):
+        return (self.is_local(key) and self.local.has_key(key, version=version)) or \
+            self.remote.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout, version=version)
+        self.set_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self.set_local(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout, version=version)
+        if added:
+            self.set_local(key, value, timeout, version)
+        else:
+            self.local.delete(key, version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        return self.remote.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.local.delete_many(keys, version=version)
+        self.remote.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version=version)
+        return self.remote.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self.local.delete(key, version=version)
+        return self.remote.decr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.remote.clear()
+
+    def close(self, **kwargs):
+        self.remote.close(**kwargs)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Like ``BaseCache.get_or_set``, but a callable ``default`` is computed by
+        one caller at a time: threads of this process queue on a striped lock,
+        other processes wait (polling) on a lock key in the shared tier for up to
+        LOCK_TIMEOUT seconds, then compute it themselves.
+        """
+        value = self.get(key, self._missing_key, version=version)
+        if value is not self._missing_key:
+            return value
+        if not callable(default):
+            return super().get_or_set(key, default, timeout, version)
+
+        with self.locks[zlib.crc32(str(key).encode()) % LOCK_STRIPES]:
+            value = self.get(key, self._missing_key, version=version)
+            if value is not self._missing_key:
+                return value
+            lock_key = f"{key}:lock"
+            deadline = time.monotonic() + self.lock_timeout
+            locked = self.remote.add(lock_key, 1, self.lock_timeout, version=version)
+            while not locked and time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = self.remote.get(key, self._missing_key, version=version)
+                if value is not self._missing_key:
+                    self.set_local(key, value, timeout, version)
+                    return value
+                locked = self.remote.add(lock_key, 1, self.lock_timeout, version=version)
+            try:
+                value = default()
+                self.set(key, value, timeout, version=version)
+            finally:
+                if locked:
+                    self.remote.delete(lock_key, version=version)
+            return value
+
+
+def redis_url(connection_string):
+    """
+    Accept a redis:// URL or an Azure/StackExchange style connection string
+    (``host:6380,password=...,ssl=True,abortConnect=False``) and return a URL.
+    """
+    if connection_string.startswith(("redis://", "rediss://", "unix://")):
+        return connection_string
+    host, *pairs = [part.strip() for part in connection_string.split(",") if part.strip()]
+    options = dict(pair.split("=", 1) for pair in pairs if "=" in pair)
+    scheme = "rediss" if options.get("ssl", "").lower() == "true" else "redis"
+    password = options.get("password")
+    auth = f":{quote(password, safe='')}@" if password else ""
+    return f"{scheme}://{auth}{host}/0"
+
+
+def redis_cache_settings(connection_string, local_timeout=5, max_connections=50):
+    """ CACHES["default"] for a TieredCache in front of django-redis with pooling and zlib compression. """
+    return {
+        "BACKEND": "main.cache.TieredCache",
+        "OPTIONS": {
+            "LOCAL_TIMEOUT": local_timeout,
+            "REMOTE": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": redis_url(connection_string),
+                "TIMEOUT": 36000,
+                "OPTIONS": {
+                    "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                    "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
+                    "SOCKET_CONNECT_TIMEOUT": 2,
+                    "SOCKET_TIMEOUT": 2,
+                    "CONNECTION_POOL_KWARGS": {
+                        "max_connections": max_connections,
+                        "health_check_interval": 30,
+                        "retry_on_timeout": True,
+                    },
+                },
+            },
+        },
+    }
+
+GENERATION_KEY = "generation:{}"
+
+
+def new_generation():
+    # Time based, so a counter that was evicted never restarts at a value that is still cached
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    """ Return ``{name: generation}`` with a single cache round trip when all counters exist. """
+    keys = {name: GENERATION_KEY.format(name) for name in names}
+    values = cache.get_many(keys.values())
+    generations = {}
+    for name, key in keys.items():
+        if key not in values:
+            cache.add(key, new_generation(), timeout=None)
+            values[key] = cache.get(key)
+        generations[name] = values[key]
+    return generations
+
+
+def bump_generation(*names):
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_generation(), timeout=None)
@@ -0,0 +1,113 @@
+"""
+ main/database.py
+ Production database settings built from the Azure Postgres connection string.
+
+ ``AZURE_POSTGRESQL_CONNECTIONSTRING`` is a libpq keyword/value string
+ (``dbname=... host=... user=... password=... sslmode=require``). Besides the
+ libpq keywords it may carry the connection reuse settings of this app:
+
+   pool           psycopg (default when psycopg_pool is installed): a psycopg3
+                  connection pool in each process.
+                  persistent (default otherwise): one connection per thread
+                  kept for conn_max_age seconds and health checked on reuse.
+                  pgbouncer: persistent connections to a pgbouncer in
+                  transaction mode, with server-side cursors and prepared
+                  statements disabled because consecutive transactions may
+                  run on different server connections.
+                  off: a new connection for every request.
+   pool_min_size  connections each process keeps open (2)
+   pool_max_size  connections each process may open (10)
+   pool_timeout   seconds a request waits for a free connection (10)
+   conn_max_age   seconds a persistent connection is reused (600)
+ 
+ Under ASGI prefer pool=psycopg, or pgbouncer with conn_max_age=0: Django does
+ not reuse persistent connections across async requests.
+"""
+import shlex
+
+from django.core.exceptions import ImproperlyConfigured
+
+POOL_MODES = ("psycopg", "persistent", "pgbouncer", "off")
+APP_KEYS = ("pool", "pool_min_size", "pool_max_size", "pool_timeout", "conn_max_age")
+LIBPQ_SETTINGS = {"dbname": "NAME", "user": "USER", "password": "PASSWORD", "host": "HOST", "port": "PORT"}
+
+
+def parse_connection_string(connection_string):
+    """ Split a libpq keyword/value string; values may be quoted (``password='a b'``). """
+    parameters = {}
+    for pair in shlex.split(connection_string):
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise ImproperlyConfigured(f"Invalid database connection string parameter {key!r}")
+        parameters[key.strip()] = value
+    return parameters
+
+
+def has_psycopg_pool():
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def postgres_settings(connection_string):
+    """ DATABASES["default"] for Postgres, with the reuse mode chosen in the connection string. """
+    parameters = parse_connection_string(connection_string)
+    app = {key: parameters.pop(key) for key in APP_KEYS if key in parameters}
+    mode = app.get("pool") or ("psycopg" if has_psycopg_pool() else "persistent")
+    if mode not in POOL_MODES:
+        raise ImproperlyConfigured(f"Unknown database pool mode {mode!r}; expected one of {POOL_MODES}")
+
+    database = {"ENGINE": "django.db.backends.postgresql"}
+    for key, setting in LIBPQ_SETTINGS.items():
+        database[setting] = parameters.pop(key, "")
+    # Everything else (sslmode, connect_timeout, ...) goes to the driver as is
+    options = dict(parameters)
+
+    if mode == "psycopg":
+        if not has_psycopg_pool():
+            raise ImproperlyConfigured("pool=psycopg requires the psycopg-pool package")
+        # Django returns the connection to the pool at the end of each request,
+        # so persistent connections must stay off.
+        options["pool"] = {
+            "min_size": int(app.get("pool_min_size", 2)),
+            "max_size": int(app.get("pool_max_size", 10)),
+            "timeout": float(app.get("pool_timeout", 10)),
+        }
+        database["CONN_MAX_AGE"] = 0
+        # Checks each connection as it leaves the pool (ConnectionPool.check_connection)
+        database["CONN_HEALTH_CHECKS"] = True
+    elif mode in ("persistent", "pgbouncer"):
+        database["CONN_MAX_AGE"] = int(app.get("conn_max_age", 600))
+        database["CONN_HEALTH_CHECKS"] = True
+        if mode == "pgbouncer":
+            database["DISABLE_SERVER_SIDE_CURSORS"] = True
+            options["prepare_threshold"] = None
+    else:
+        database["CONN_MAX_AGE"] = 0
+
+    if options:
+        database["OPTIONS"] = options
+    return database
+
+
+def pool_mode(database):
+    """ Reuse mode of a DATABASES entry, as reported by the health check. """
+    if database.get("OPTIONS", {}).get("pool"):
+        return "psycopg"
+    if database.get("DISABLE_SERVER_SIDE_CURSORS"):
+        return "pgbouncer"
+    return "persistent" if database.get("CONN_MAX_AGE") else "off"
+
+
+def connection_stats(connection):
+    """ Pool counters (psycopg_pool ``get_stats``) or the state of the thread's persistent connection. """
+    stats = {"mode": pool_mode(connection.settings_dict)}
+    pool = getattr(connection, "pool", None) if connection.vendor == "postgresql" else None
+    if pool is not None:
+        stats.update(pool.get_stats())
+    else:
+        stats["conn_max_age"] = connection.settings_dict.get("CONN_MAX_AGE") or 0
+        stats["connected"] = connection.connection is not None
+    return stats
@@ -0,0 +1,255 @@
+"""
+ main/files.py
+ Delete replaced and orphaned uploads after commit.
+
+ ``track_file_fields`` remembers the stored names of a model's file fields
+ when an instance is loaded (from the row itself, no extra query). After a
+ save that replaced a file, or a delete, the old files are queued and
+ deleted once the transaction commits, in the background, through the
+ storage API (so any backend works). Nothing is deleted when the
+ transaction rolls back. The renditions of deleted images go with them.
+
+ The queued names of one transaction are deleted as one batch; Azure
+ storages send them as batched blob deletes.
+
+ Files orphaned some other way (bulk deletes, failed deletes, uploads whose
+ row was never saved) are found by ``find_orphans``, which streams the
+ storage listing against the names referenced by every file field, and are
+ removed by ``collect_orphans`` (the ``media_gc`` command). Files stored
+ without a file field (such as the profile QR codes) are kept while a
+ function passed to ``register_references`` lists them.
+"""
+import logging
+import os
+import posixpath
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+
+from main.images import MANIFEST_KEY, MANIFEST_SUFFIX, RENDITION_PATTERN, forget_renditions
+from main.tasks import defer_per_transaction, run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Azure accepts at most 256 sub-requests per batch
+AZURE_BATCH_SIZE = 256
+TRACKED_NAMES = "_tracked_file_names"
+REFERENCE_CHUNK_SIZE = 5000
+# Functions yielding (storage, name) of files in use that no file field references
+EXTRA_REFERENCES = []
+
+
+def stored_name(value):
+    """ Name of a file stored in the row, or None for a new upload that has not been saved yet. """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, FieldFile) and getattr(value, "_committed", True):
+        return value.name
+    return None
+
+
+def schedule_delete(storage, name, using=DEFAULT_DB_ALIAS):
+    """ Delete ``name`` from ``storage`` once the current transaction commits. """
+    defer_per_transaction("delete_files", [(storage, name)], delete_in_background, using=using)
+
+
+def delete_in_background(queued):
+    files = {}    # storage -> set of names
+    for storage, name in queued:
+        files.setdefault(storage, set()).add(name)
+    run_in_background(delete_files, files)
+
+
+def delete_files(files):
+    for storage, names in files.items():
+        names = set(names)
+        for name in list(names):
+            names.update(forget_renditions(name, storage))
+        try:
+            delete_from_storage(storage, sorted(names))
+        except Exception:
+            logger.exception("Could not delete %d replaced files", len(names))
+
+
+def delete_from_storage(storage, names):
+    client = getattr(storage, "client", None)
+    if hasattr(client, "delete_blobs"):
+        # django-storages' AzureStorage: one batch request instead of a round trip per blob
+        paths = [storage._get_valid_path(name) for name in names]
+        for start in range(0, len(paths), AZURE_BATCH_SIZE):
+            client.delete_blobs(*paths[start:start + AZURE_BATCH_SIZE], raise_on_any_failure=False)
+        return
+    for name in names:
+        storage.delete(name)
+
+
+def track_file_fields(model, *field_names):
+    """
+    Delete the stored file of ``field_names`` when an instance of ``model``
+    replaces or clears it, or is deleted. A file still referenced by another
+    row of ``model`` is kept.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+
+    def remember(sender, instance, **kwargs):
+        # Deferred fields are not in __dict__; they are not tracked (and not saved either)
+        names = {field.attname: stored_name(instance.__dict__[field.attname])
+                 for field in fields if field.attname in instance.__dict__}
+        instance.__dict__[TRACKED_NAMES] = names
+
+    def release(instance, field, name, using):
+        if name and not model._default_manager.using(using).filter(**{field.attname: name}).exists():
+            schedule_delete(field.storage, name, using=using)
+
+    def on_save(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, update_fields=None, **kwargs):
+        tracked = instance.__dict__.get(TRACKED_NAMES, {})
+        for field in fields:
+            if update_fields is not None and field.name not in update_fields:
+                continue
+            current = getattr(instance, field.attname).name or ""
+            old = tracked.get(field.attname)
+            if not raw and old and old != current:
+                release(instance, field, old, using)
+            tracked[field.attname] = current
+        instance.__dict__[TRACKED_NAMES] = tracked
+
+    def on_delete(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+        for field in fields:
+            if field.attname in instance.__dict__:
+                release(instance, field, getattr(instance, field.attname).name, using)
+
+    uid = f"tracked_files:{model._meta.label_lower}"
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+
+
+class ReferencedFiles:
+    """
+    Names stored in file fields, and whether a stored name belongs to one:
+    the renditions and manifest of a referenced image are kept with it.
+    """
+
+    def __init__(self, names=()):
+        self.names = set(names)
+        self.stems = {posixpath.splitext(name)[0] for name in self.names}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        if name in self.names:
+            return True
+        if name.endswith(MANIFEST_SUFFIX):
+            return name[:-len(MANIFEST_SUFFIX)] in self.names
+        match = RENDITION_PATTERN.match(name)
+        return match is not None and match["stem"] in self.stems
+
+
+def register_references(func):
+    """ Keep the files listed by ``func()``, an iterable of ``(storage, name)``, from ``media_gc``. """
+    if func not in EXTRA_REFERENCES:
+        EXTRA_REFERENCES.append(func)
+    return func
+
+
+def referenced_files():
+    """ ``{storage: ReferencedFiles}`` of every file field of every installed model, and the registered extras. """
+    names = {}
+    for model in apps.get_models():
+        if model._meta.proxy:
+            continue
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.FileField):
+                continue
+            stored = model._base_manager.exclude(**{field.attname: ""}).exclude(**{f"{field.attname}__isnull": True})
+            names.setdefault(field.storage, set()).update(
+                stored.values_list(field.attname, flat=True).iterator(chunk_size=REFERENCE_CHUNK_SIZE))
+    for func in EXTRA_REFERENCES:
+        for storage, name in func():
+            names.setdefault(storage, set()).add(name)
+    return {storage: ReferencedFiles(stored) for storage, stored in names.items()}
+
+
+def iter_stored_files(storage, prefix=""):
+    """ Yield ``(name, size, modified)`` of every file under ``prefix``, streamed from the storage listing. """
+    client = getattr(storage, "client", None)
+    if hasattr(client, "list_blobs"):
+        # AzureStorage: pages of the container listing, sizes and dates included
+        location = storage.location.strip("/")
+        start = f"{location}/" if location else ""
+        for blob in client.list_blobs(name_starts_with=start + prefix):
+            yield blob.name[len(start):], blob.size, blob.last_modified
+        return
+    try:
+        root = storage.path("")
+    except NotImplementedError:
+        yield from _walk_storage(storage, prefix.rstrip("/"))
+        return
+    for directory, _dirs, files in os.walk(os.path.join(root, prefix)):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            yield name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+
+
+def _walk_storage(storage, directory):
+    directories, files = storage.listdir(directory)
+    for filename in files:
+        name = posixpath.join(directory, filename)
+        yield name, storage.size(name), storage.get_modified_time(name)
+    for subdirectory in directories:
+        yield from _walk_storage(storage, posixpath.join(directory, subdirectory))
+
+
+def find_orphans(storage, referenced, prefix="", exclude=(), older_than=None, stats=None):
+    """
+    Yield ``(name, size)`` of the stored files under ``prefix`` that no file
+    field references. Files modified after ``older_than`` are skipped: an
+    upload is stored before the row naming it is committed.
+    """
+    stats = {} if stats is None else stats
+    stats.setdefault("scanned", 0)
+    for name, size, modified in iter_stored_files(storage, prefix):
+        stats["scanned"] += 1
+        if (exclude and name.startswith(tuple(exclude))) or name in referenced:
+            continue
+        if older_than and modified and modified > older_than:
+            continue
+        yield name, size
+
+
+def collect_orphans(orphans, storage, batch_size=AZURE_BATCH_SIZE, workers=4):
+    """ Delete ``orphans`` (names) in batches, ``workers`` batches at a time; return the number deleted. """
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        iterator = iter(orphans)
+        while batch := list(islice(iterator, batch_size)):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                deleted += sum(future.result() for future in done)
+            pending.add(pool.submit(_delete_batch, storage, batch))
+        deleted += sum(future.result() for future in pending)
+    return deleted
+
+
+def _delete_batch(storage, names):
+    try:
+        delete_from_storage(storage, names)
+    except Exception:
+        logger.exception("Could not delete %d orphaned files", len(names))
+        return 0
+    cache.delete_many([MANIFEST_KEY.format(name[:-len(MANIFEST_SUFFIX)])
+                       for name in names if name.endswith(MANIFEST_SUFFIX)])
+    return len(names)
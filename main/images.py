@@ -0,0 +1,194 @@
+"""
+ main/images.py
+ Resized WebP/AVIF renditions of uploaded images.
+
+ After a model with a watched image field is saved, the original is decoded
+ once in a background thread and written back at the widths in
+ ``RENDITION_WIDTHS`` (never wider than the original), in every format the
+ installed Pillow can encode. The renditions sit next to the original as
+ ``<name>.<content hash>.<width>w.<format>``, so their URLs can be cached
+ forever. A manifest (``<name>.renditions.json``) records what exists; it is
+ cached, and the ``{% picture %}`` tag reads it to build ``srcset``. Images
+ without a manifest yet are served as uploaded.
+"""
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import re
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, features
+
+from main.cache import bump_generation
+from main.tasks import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+# Bump when the output changes; it is part of the content hash, so new names are generated
+RENDITION_VERSION = 1
+RENDITION_WIDTHS = {
+    "thumb": 160,
+    "card": 480,
+    "hero": 1600,
+}
+# Preferred first; AVIF needs a Pillow built with libavif
+RENDITION_FORMATS = {
+    "avif": ("image/avif", {"quality": 55}),
+    "webp": ("image/webp", {"quality": 80, "method": 4}),
+}
+MANIFEST_KEY = "renditions:{}"
+MANIFEST_SUFFIX = ".renditions.json"
+# ``<stem>.<content hash>.<width>w.<format>``, see ``rendition_name``
+RENDITION_PATTERN = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{16}\.\d+w\.(?:%s)$" % "|".join(RENDITION_FORMATS))
+# A missing manifest is remembered briefly so pages do not hit the storage on every render
+MISSING_TIMEOUT = 60
+
+
+def available_formats():
+    return [fmt for fmt in RENDITION_FORMATS if features.check(fmt)]
+
+
+def manifest_name(name):
+    return f"{name}{MANIFEST_SUFFIX}"
+
+
+def rendition_name(name, digest, width, fmt):
+    stem = posixpath.splitext(name)[0]
+    return f"{stem}.{digest}.{width}w.{fmt}"
+
+
+def content_digest(content):
+    return hashlib.sha256(f"{RENDITION_VERSION}:".encode() + content).hexdigest()[:16]
+
+
+def target_widths(original_width):
+    """ ``{size: width}``; sizes wider than the original share the original width. """
+    return {size: min(width, original_width) for size, width in RENDITION_WIDTHS.items()}
+
+
+def encode(image, width, fmt):
+    resized = image.copy()
+    resized.thumbnail((width, width * 10), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format=fmt.upper(), **RENDITION_FORMATS[fmt][1])
+    return buffer.getvalue(), resized.height
+
+
+def generate_renditions(name, storage=default_storage):
+    """ Write the missing renditions of the stored image ``name`` and its manifest; return the manifest. """
+    with storage.open(name, "rb") as original:
+        content = original.read()
+    digest = content_digest(content)
+    with Image.open(io.BytesIO(content)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    widths = target_widths(image.width)
+    files = {}
+    for width in sorted(set(widths.values())):
+        for fmt in available_formats():
+            target = rendition_name(name, digest, width, fmt)
+            if not storage.exists(target):
+                data, height = encode(image, width, fmt)
+                storage.save(target, ContentFile(data))
+            else:
+                height = round(image.height * width / image.width)
+            files.setdefault(width, {"width": width, "height": height})[fmt] = target
+
+    manifest = {
+        "digest": digest,
+        "width": image.width,
+        "height": image.height,
+        "sizes": {size: files[width] for size, width in widths.items()},
+    }
+    if storage.exists(manifest_name(name)):
+        storage.delete(manifest_name(name))
+    storage.save(manifest_name(name), ContentFile(json.dumps(manifest).encode()))
+    cache.set(MANIFEST_KEY.format(name), manifest, timeout=None)
+    return manifest
+
+
+def get_manifest(name, storage=default_storage):
+    """ Manifest of ``name``, or None while its renditions have not been generated. """
+    key = MANIFEST_KEY.format(name)
+    manifest = cache.get(key)
+    if manifest is None:
+        try:
+            with storage.open(manifest_name(name), "rb") as stored:
+                manifest = json.load(stored)
+        except (FileNotFoundError, OSError, ValueError):
+            manifest = {}
+        cache.set(key, manifest, timeout=None if manifest else MISSING_TIMEOUT)
+    return manifest or None
+
+
+def forget_renditions(name, storage=default_storage):
+    """ Drop the cached manifest of ``name`` and return its stored renditions and manifest, for deletion. """
+    manifest = get_manifest(name, storage)
+    cache.delete(MANIFEST_KEY.format(name))
+    if not manifest:
+        return []
+    files = {entry[fmt] for entry in manifest["sizes"].values() for fmt in RENDITION_FORMATS if fmt in entry}
+    return sorted(files) + [manifest_name(name)]
+
+
+def manifest_srcset(manifest, fmt, storage=default_storage):
+    """ ``"<url> 160w, <url> 480w"`` for ``fmt`` from a manifest, or "" when it has no rendition in that format. """
+    if not manifest:
+        return ""
+    files = {entry["width"]: entry[fmt] for entry in manifest["sizes"].values() if fmt in entry}
+    return ", ".join(f"{storage.url(files[width])} {width}w" for width in sorted(files))
+
+
+def manifest_url(manifest, name, size, storage=default_storage):
+    """ URL of the ``size`` rendition listed in a manifest, falling back to the original ``name``. """
+    entry = manifest["sizes"].get(size) if manifest else None
+    if entry:
+        for fmt in ("webp", *RENDITION_FORMATS):
+            if fmt in entry:
+                return storage.url(entry[fmt])
+    return storage.url(name)
+
+
+def rendition_url(name, size, storage=default_storage):
+    """ URL of the ``size`` rendition in the most widely supported format, falling back to the original. """
+    return manifest_url(get_manifest(name, storage), name, size, storage)
+
+
+# (model, field names, generation) of every watched image field
+WATCHED_FIELDS = []
+
+def process(name, generation=None):
+    try:
+        generate_renditions(name)
+    except Exception:
+        logger.exception("Could not generate renditions of %s", name)
+        return
+    if generation:
+        # Cached fragments that embed the image pick up the new srcset
+        bump_generation(generation)
+
+
+def schedule_renditions(name, generation=None):
+    """ Generate the renditions of ``name`` once the current transaction commits. """
+    run_after_commit(process, name, generation)
+
+
+def watch_image_fields(model, *field_names, generation=None):
+    """ Generate renditions for ``field_names`` of ``model`` whenever an instance is saved with a new image. """
+    def receiver(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        for field_name in field_names:
+            name = getattr(instance, field_name).name
+            if name and get_manifest(name) is None:
+                schedule_renditions(name, generation)
+
+    WATCHED_FIELDS.append((model, field_names, generation))
+    post_save.connect(receiver, sender=model, weak=False,
+                      dispatch_uid=f"renditions:{model._meta.label_lower}:{','.join(field_names)}")
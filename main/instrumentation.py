@@ -0,0 +1,191 @@
+"""
+ main/instrumentation.py
+ Per-request metrics: SQL query count and time, cache hits and misses, and
+ total time, tagged with the resolved URL name.
+
+ ``RequestMetricsMiddleware`` reports them in a ``Server-Timing`` header (shown
+ in the browser dev tools) and as one JSON log line per request on the
+ ``main.instrumentation`` logger. ``QUERY_BUDGETS`` maps URL names to the most
+ queries a request may issue; requests over budget are logged as warnings,
+ and raise ``QueryBudgetExceeded`` when ``QUERY_BUDGETS_STRICT`` is set, which
+ is how the tests turn an N+1 into a failure.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_metrics", default=None)
+_missing = object()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class RequestMetrics:
+    view: str = ""
+    queries: int = 0
+    sql_ms: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    total_ms: float = 0.0
+
+    def server_timing(self):
+        return ", ".join([
+            f'sql;desc="{self.queries} queries";dur={self.sql_ms:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f"total;dur={self.total_ms:.1f}",
+        ])
+
+
+def current_metrics():
+    """ Metrics of the request being handled, or None outside the middleware. """
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """ ``connection.execute_wrapper`` hook counting and timing queries. """
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_ms += (time.perf_counter() - start) * 1000
+
+
+def instrument_cache(backend):
+    """
+    Count the hits and misses of ``get``/``get_many`` on a cache backend
+    instance. Wrapping the instances handed out by ``caches`` (not the
+    classes) counts each lookup once, even when a backend such as
+    ``TieredCache`` delegates to inner backends.
+    """
+    if getattr(backend, "_instrumented", False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def instrumented_get(key, default=None, version=None):
+        value = get(key, _missing, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _missing else value
+
+    def instrumented_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get, backend.get_many = instrumented_get, instrumented_get_many
+    backend._instrumented = True
+
+
+def instrument_connections():
+    """
+    Install ``record_query`` on the connections of the calling thread. It
+    stays installed (it does nothing outside a request) and goes first, so
+    the ``execute_wrapper`` blocks of other code still pop their own wrapper.
+    """
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, record_query)
+
+
+def instrument_caches():
+    for alias in settings.CACHES:
+        instrument_cache(caches[alias])
+
+
+class RequestMetricsMiddleware:
+    """
+    Collect ``RequestMetrics`` for each request and attach them to the
+    response as ``response.metrics``. Put it first in ``MIDDLEWARE`` so the
+    total covers the other middleware. For streaming responses the total
+    stops when the response is returned, before its content is sent.
+
+    It runs natively under ASGI too, so it never forces the middleware chain
+    onto a sync thread. Database connections belong to a thread, and the
+    async ORM runs its queries on the request's ``sync_to_async`` thread, so
+    under ASGI ``record_query`` is installed on that thread's connections.
+    The thread sees the request's ``ContextVar``, so those queries count too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            instrument_caches()
+            instrument_connections()
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            instrument_caches()
+            await sync_to_async(instrument_connections)()
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, "resolver_match", None)
+        metrics.view = match.view_name if match else ""
+
+        response.metrics = metrics
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", True):
+            response["Server-Timing"] = metrics.server_timing()
+        self.log(request, response, metrics)
+        self.check_budget(metrics)
+        return response
+
+    def log(self, request, response, metrics):
+        fields = {"method": request.method, "status": response.status_code, **asdict(metrics)}
+        fields["sql_ms"], fields["total_ms"] = round(metrics.sql_ms, 1), round(metrics.total_ms, 1)
+        slow_ms = getattr(settings, "REQUEST_METRICS_SLOW_MS", 1000)
+        level = logging.WARNING if metrics.total_ms >= slow_ms else logging.INFO
+        logger.log(level, json.dumps(fields), extra={"request_metrics": fields})
+
+    def check_budget(self, metrics):
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(metrics.view)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f"{metrics.view} issued {metrics.queries} queries, over its budget of {budget}"
+        if getattr(settings, "QUERY_BUDGETS_STRICT", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -2,12 +2,16 @@ import os
 import re
 from main.settings import *
 from main.settings import BASE_DIR
+from main.cache import redis_cache_settings
+from main.database import postgres_settings
 
 
 
 ALLOWED_HOSTS = [os.environ['WEBSITE_HOSTNAME']] if 'WEBSITE_HOSTNAME' in os.environ else []
 ALLOWED_HOSTS += ["https://eduhubstorage.blob.core.windows.net"]
 CSRF_TRUSTED_ORIGINS = ['https://' + os.environ['WEBSITE_HOSTNAME']] if 'WEBSITE_HOSTNAME' in os.environ else []
+if 'SITE_URL' not in os.environ and 'WEBSITE_HOSTNAME' in os.environ:
+    SITE_URL = 'https://' + os.environ['WEBSITE_HOSTNAME']
 CORS_ALLOWED_ORIGINS = [
     'https://eduhubstorage.blob.core.windows.net',
     f"https://{os.environ['WEBSITE_HOSTNAME']}" if 'WEBSITE_HOSTNAME' in os.environ else ''
@@ -63,21 +67,13 @@ TEMPLATES = [
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Connections are pooled or kept open between requests; see main/database.py for
+# the pool=... settings accepted in the connection string.
 if not DEBUG:
     connection_string = os.environ['AZURE_POSTGRESQL_CONNECTIONSTRING']
     if connection_string:
-        parameters = {pair.split("=")[0]: pair.split("=")[1]
-                      for pair in connection_string.split(" ")}
-
         DATABASES = {
-            "default": {
-                "ENGINE": "django.db.backends.postgresql",
-                "NAME": parameters["dbname"],
-                "USER": parameters["user"],
-                "PASSWORD": parameters["password"],
-                "HOST": parameters["host"],
-                "PORT": parameters["port"],
-            }
+            "default": postgres_settings(connection_string),
         }
 
 else:
@@ -129,25 +125,25 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 
 
-# Cache configuration with Redis (commented out but ready for use)
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django_redis.cache.RedisCache",
-#         "LOCATION": os.environ.get('AZURE_REDIS_CONNECTIONSTRING'),
-#         "OPTIONS": {
-#             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-#             "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
-#         },
-#     }
-# }
-# SESSION_ENGINE = "django.contrib.sessions.backends.cache"
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': os.path.join(BASE_DIR, 'cache'), 
-        'TIMEOUT': 36000,
+# Cache configuration: shared Redis (pooled, zlib compressed) behind a short-lived
+# in-process tier, so throttling and sessions are consistent across instances.
+# Without Redis each instance falls back to its own file cache.
+if os.environ.get('AZURE_REDIS_CONNECTIONSTRING'):
+    CACHES = {
+        'default': redis_cache_settings(
+            os.environ['AZURE_REDIS_CONNECTIONSTRING'],
+            local_timeout=int(os.environ.get('CACHE_LOCAL_TIMEOUT', 5)),
+            max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', 50)),
+        )
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'), 
+            'TIMEOUT': 36000,
+        }
     }
-}
 
 # Logging configuration
 LOGGING = {
@@ -175,5 +171,11 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'propagate': True,
         },
+        # One JSON line per request (main/instrumentation.py)
+        'main.instrumentation': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
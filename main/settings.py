@@ -19,6 +19,10 @@ DEBUG = True
 
 ALLOWED_HOSTS = [ "*" ]
 
+# Canonical address of the site, for absolute links that must not depend on the
+# request's Host header (the profile QR codes in user/qr.py)
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
+
 if 'CODESPACE_NAME' in os.environ:
     CSRF_TRUSTED_ORIGINS = [f'https://{os.getenv("CODESPACE_NAME")}-8000.{os.getenv("GITHUB_CODESPACES_PORT_FORWARDING_DOMAIN")}']
 
@@ -76,25 +80,28 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'main.instrumentation.RequestMetricsMiddleware',  # first, so its timings cover the rest
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'user.middleware.session.RefreshingSessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'oauth2_provider.middleware.OAuth2TokenMiddleware',  # OAuth2
+    'user.middleware.oauth2.OAuth2TokenMiddleware',  # OAuth2, async capable
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'user.middleware.profile.EnsureProfileMiddleware',
+    'user.middleware.profile.LazyProfileMiddleware',
 ]
 
 # SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 # Ensure SESSION settings are properly configured
 SESSION_COOKIE_NAME = "auth_server_sessionid"
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are re-saved (expiry bumped) at most once per window by RefreshingSessionMiddleware
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_WINDOW = 15 * 60
 # Application definition
 ROOT_URLCONF = 'main.urls'
 
@@ -233,8 +240,55 @@ STORAGES = {
 # Path to your private and public keys for JWT
 JWT_PRIVATE_KEY_PATH = 'private_key.pem'
 JWT_PUBLIC_KEY_PATH = 'public_key.pem'
+# Optional JWKS file with extra verification keys (e.g. the previous key while rotating)
+JWT_JWKS_PATH = None
+# Verified tokens are cached per process until they expire (at most JWT_VERIFY_CACHE_TTL seconds)
+JWT_VERIFY_CACHE_SIZE = 10000
+JWT_VERIFY_CACHE_TTL = 300
+
+# Failed logins allowed per (attempts, window seconds) before user_login answers 429
+LOGIN_THROTTLE_RATES = {
+    'username': (5, 300),
+    'ip': (20, 300),
+}
+# Request.META key holding the client IP behind a proxy, e.g. 'HTTP_X_FORWARDED_FOR'
+LOGIN_THROTTLE_IP_HEADER = None
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Seconds before each worker reloads the in-memory school autocomplete index
+# (search/suggest.py); saves in the same worker are applied immediately.
+SUGGEST_INDEX_MAX_AGE = 300
+
+# Cached ProfileAggregate lifetime (user/aggregate.py); signals drop it as soon as
+# the profile or one of its rows changes.
+PROFILE_AGGREGATE_CACHE_TIMEOUT = 60 * 60
+
+# Upper bound for the home page fragments; they are normally replaced as soon as
+# a School, SchoolType or ad changes (see main/cache.py).
+HOME_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Work done after commit, off the request (main/tasks.py), runs on this many
+# background threads; set BACKGROUND_TASKS_ASYNC = False to run it in the
+# committing thread instead.
+BACKGROUND_WORKERS = 2
+BACKGROUND_TASKS_ASYNC = True
+
+# Per-request metrics (main/instrumentation.py): Server-Timing header, one JSON
+# log line per request, and a warning when a request is slower than this.
+REQUEST_METRICS_SERVER_TIMING = True
+REQUEST_METRICS_SLOW_MS = 1000
+# Most queries a request to each URL name may issue; over budget is logged, or
+# raises QueryBudgetExceeded when QUERY_BUDGETS_STRICT is set (the tests do).
+QUERY_BUDGETS = {
+    # Signed in: user and profile, plus SAVEPOINT/UPDATE/RELEASE when
+    # RefreshingSessionMiddleware re-saves the session (once per SESSION_REFRESH_WINDOW)
+    'home': 5,
+    'schools:school-detail': 6,
+    'profiles:profile': 13,
+    'profiles:public_profile': 9,
+}
+QUERY_BUDGETS_STRICT = False
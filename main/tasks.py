@@ -0,0 +1,93 @@
+"""
+ main/tasks.py
+ A small pool of background threads for work that must not hold up the
+ request: image renditions, logo colors, file deletes and related-school
+ updates.
+
+ ``BACKGROUND_WORKERS`` threads run the tasks; with ``BACKGROUND_TASKS_ASYNC``
+ off (as in the tests) they run in the calling thread instead. Tasks must
+ catch and log their own errors. Each task's database connections are closed
+ when it returns, since the pool threads outlive it.
+
+ ``defer_per_transaction`` collects ids queued by many saves into one
+ on_commit callback, so a transaction does the follow-up work once.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "BACKGROUND_WORKERS", 2),
+                thread_name_prefix="background",
+            )
+        return _executor
+
+
+def _run_and_close(func, *args):
+    try:
+        func(*args)
+    finally:
+        # Pool threads outlive the task; do not leave their database connections open
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """
+    Call ``func(*args)`` on the background pool (in the calling thread when
+    BACKGROUND_TASKS_ASYNC is off). ``func`` must catch and log its own errors.
+    """
+    if getattr(settings, "BACKGROUND_TASKS_ASYNC", True):
+        get_executor().submit(_run_and_close, func, *args)
+    else:
+        func(*args)
+
+
+def run_after_commit(func, *args):
+    """ ``run_in_background`` once the current transaction commits. """
+    transaction.on_commit(lambda: run_in_background(func, *args))
+
+
+class TransactionQueue:
+    """ One on_commit callback holding the ids queued under ``key`` within the same (save)point of a transaction. """
+
+    def __init__(self, key, flush):
+        self.key, self.flush = key, flush
+        self.ids = set()
+
+    def __call__(self):
+        # Drained, so ids queued after it ran (TestCase keeps run callbacks listed) get a new callback
+        ids, self.ids = self.ids, None
+        self.flush(ids)
+
+
+def defer_per_transaction(key, ids, flush, using=DEFAULT_DB_ALIAS):
+    """
+    Call ``flush(ids)`` once the current transaction commits, with every id
+    queued under ``key`` by then. Outside a transaction it runs at once.
+
+    The ids live in the on_commit callback, one per savepoint level, so a
+    rolled back transaction or savepoint discards the ids queued inside it.
+    """
+    connection = connections[using]
+    if connection.in_atomic_block:
+        # atomic(savepoint=False) pushes None, which is never rolled back on its own. A callback
+        # registered under every active savepoint is reused: its other savepoints were released.
+        savepoints = set(connection.savepoint_ids) - {None}
+        for sids, callback, _robust in connection.run_on_commit:
+            if (isinstance(callback, TransactionQueue) and callback.key == key and sids - {None} >= savepoints
+                    and callback.ids is not None):
+                callback.ids.update(ids)
+                return
+    queue = TransactionQueue(key, flush)
+    queue.ids.update(ids)
+    transaction.on_commit(queue, using=using)
@@ -0,0 +1,20 @@
+""" Helpers shared by the apps' tests """
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+
+class MediaTestCase(TestCase):
+    """ The default storage writes to a temporary directory, ``self.media``, removed after each test. """
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        storages = {**settings.STORAGES, "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.media}}}
+        storage_override = override_settings(STORAGES=storages)
+        storage_override.enable()
+        self.addCleanup(storage_override.disable)
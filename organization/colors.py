@@ -0,0 +1,60 @@
+"""
+    colors.py
+    Organization colors derived from the logo.
+
+    The analysis (decode, resize, quantize to one color) runs on the
+    background pool of ``main.images`` after the upload commits, never inside
+    ``Organization.save``. The logo is read through the storage API, so it
+    works with remote storages, and results are cached by the SHA-256 of the
+    logo bytes: re-uploading the same image costs one read and a cache hit.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.cache import cache
+
+from main.tasks import run_after_commit
+from organization.models import DEFAULT_COLOR, Organization, get_contrast_color, get_dominant_color
+
+logger = logging.getLogger(__name__)
+
+COLORS_KEY = "logo_colors:{}"
+
+
+def content_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def analyze_logo(content):
+    """ ``(primary_color, on_primary_color)`` of logo bytes; a module-level function so process pools can pickle it. """
+    rgb = get_dominant_color(io.BytesIO(content))
+    return '%02x%02x%02x' % rgb, get_contrast_color(rgb)
+
+
+def logo_colors(content):
+    """ Cached ``analyze_logo``. """
+    return tuple(cache.get_or_set(COLORS_KEY.format(content_digest(content)), lambda: analyze_logo(content), None))
+
+
+def update_logo_colors(pk):
+    """ Fill the colors of organization ``pk`` from its logo if they are still the defaults. """
+    organization = Organization.objects.filter(pk=pk).first()
+    if organization is None or not organization.needs_logo_colors():
+        return
+    try:
+        with organization.logo.open("rb") as logo:
+            primary, on_primary = logo_colors(logo.read())
+    except Exception:
+        logger.exception("Could not analyze the logo of organization %s", pk)
+        return
+    # update() rather than save(): no signals, and concurrent edits of other fields are kept.
+    # Skipped if the logo was replaced or a color was set meanwhile.
+    Organization.objects.filter(pk=pk, logo=organization.logo.name, primary_color__in=("", DEFAULT_COLOR)).update(
+        primary_color=primary, on_primary_color=on_primary,
+    )
+
+
+def schedule_logo_colors(organization):
+    if organization.needs_logo_colors():
+        run_after_commit(update_logo_colors, organization.pk)
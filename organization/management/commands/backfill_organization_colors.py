@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from organization.colors import COLORS_KEY, analyze_logo, content_digest
+from organization.models import DEFAULT_COLOR, Organization
+
+
+def analyze(content):
+    """ ``analyze_logo`` that reports unreadable images as None instead of failing the whole map. """
+    try:
+        return analyze_logo(content)
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill primary_color/on_primary_color of every organization from its logo. "
+        "Logos are read here and analyzed by a pool of worker processes; results are cached by content hash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+        parser.add_argument("--batch-size", type=int, default=200, help="Organizations read and updated at a time.")
+        parser.add_argument("--force", action="store_true", help="Recompute colors that were already set.")
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.exclude(logo="").exclude(logo__isnull=True).order_by("pk")
+        if not options["force"]:
+            organizations = organizations.filter(primary_color__in=("", DEFAULT_COLOR))
+        pks = list(organizations.values_list("pk", flat=True))
+
+        start = time.perf_counter()
+        updated = analyzed = failed = 0
+        # Workers only decode images; they must not inherit this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup) as pool:
+            iterator = iter(pks)
+            while batch := list(islice(iterator, options["batch_size"])):
+                contents = {}
+                for organization in Organization.objects.filter(pk__in=batch).only("pk", "logo"):
+                    try:
+                        with organization.logo.open("rb") as logo:
+                            contents[organization.pk] = logo.read()
+                    except OSError as error:
+                        failed += 1
+                        self.stderr.write(f"Organization {organization.pk}: {error}")
+                digests = {pk: content_digest(content) for pk, content in contents.items()}
+                cached = cache.get_many([COLORS_KEY.format(digest) for digest in set(digests.values())])
+                # Identical logos are analyzed once
+                missing = {digest: pk for pk, digest in digests.items() if COLORS_KEY.format(digest) not in cached}
+                results = {}
+                for digest, colors in zip(missing, pool.map(analyze, [contents[pk] for pk in missing.values()])):
+                    if colors is None:
+                        self.stderr.write(f"Organization {missing[digest]}: the logo is not a readable image")
+                    else:
+                        results[COLORS_KEY.format(digest)] = colors
+                analyzed += len(results)
+                cache.set_many(results, timeout=None)
+                cached.update(results)
+
+                changed = []
+                for pk, digest in digests.items():
+                    if COLORS_KEY.format(digest) not in cached:
+                        failed += 1
+                        continue
+                    primary, on_primary = cached[COLORS_KEY.format(digest)]
+                    changed.append(Organization(pk=pk, primary_color=primary, on_primary_color=on_primary))
+                updated += Organization.objects.bulk_update(changed, ["primary_color", "on_primary_color"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} organizations ({analyzed} logos analyzed, {failed} unreadable) "
+            f"in {time.perf_counter() - start:.2f}s."
+        ))
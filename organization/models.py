@@ -6,9 +6,10 @@ import uuid
 from django.utils.text import slugify
 from django.db import models
 from django.urls import reverse
-from django.core.files.storage import default_storage
 from django.utils.translation import gettext_lazy as _
 
+DEFAULT_COLOR = "000000"
+
 def organization_logo_image_upload_path(instance, filename):
     """ Generate a file path for new organization logo uploads. """
     ext = filename.split('.')[-1]
@@ -47,7 +48,7 @@ class Organization(models.Model):
     description = models.TextField()
     established_year = models.CharField(verbose_name=_("Established year"), max_length=4, null=True, blank=True)
     industry = models.ForeignKey("Industry", on_delete=models.SET_NULL, blank=True, null=True)
-    primary_color = models.CharField(default="000000", max_length=25, verbose_name=_("Primary color"))
+    primary_color = models.CharField(default=DEFAULT_COLOR, max_length=25, verbose_name=_("Primary color"))
     on_primary_color = models.CharField(default="000000", max_length=25, verbose_name=_("on primary color"))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -60,19 +61,13 @@ class Organization(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.name.lower()}-{str(uuid.uuid4())[:6]}")
-
-        # Only analyze logo if it exists and primary_color is default
-        if self.logo and (not self.primary_color or self.primary_color == "000000"):
-            # get path of the image in the storage
-            logo_path = self.logo.path if hasattr(self.logo, 'path') else None
-
-            if logo_path and default_storage.exists(logo_path):
-                dominant_rgb = get_dominant_color(logo_path)
-                self.primary_color = '%02x%02x%02x' % dominant_rgb
-                self.on_primary_color = get_contrast_color(dominant_rgb)
-
+        # The logo colors are filled in after commit by organization.colors
         super().save(*args, **kwargs)
 
+    def needs_logo_colors(self):
+        """ Colors are only derived from the logo while they still have their default value. """
+        return bool(self.logo) and self.primary_color in ("", DEFAULT_COLOR)
+
     def get_absolute_url(self):
         return reverse("organization-detail", kwargs={"slug": self.slug})
 
@@ -88,9 +83,10 @@ class Organization(models.Model):
         ordering = ["-created_at"]
 
 
-def get_dominant_color(image_path):
-    with Image.open(image_path) as img:
-        img = img.resize((50, 50))  # resize for faster processing
+def get_dominant_color(image):
+    """ ``image`` is a path or a binary file object. """
+    with Image.open(image) as img:
+        img = img.convert('RGB').resize((50, 50))  # resize for faster processing
         result = img.convert('P', palette=Image.ADAPTIVE, colors=1)
         dominant_color = result.getpalette()[:3]
     return tuple(dominant_color)
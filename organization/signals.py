@@ -1,12 +1,17 @@
 
-import os
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from django.dispatch import receiver
+from main.files import track_file_fields
+from main.images import watch_image_fields
 from organization import models
+from organization.colors import schedule_logo_colors
 
 
-@receiver(post_delete, sender=models.Organization)
-def delete_logo_on_delete(sender, instance, **kwargs):
-    if instance.logo:
-        if os.path.isfile(instance.logo.path):
-            instance.logo.delete(save=False)
\ No newline at end of file
+@receiver(post_save, sender=models.Organization)
+def analyze_logo_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_logo_colors(instance)
+
+
+track_file_fields(models.Organization, "logo")
+watch_image_fields(models.Organization, "logo")
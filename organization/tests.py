@@ -1,3 +1,56 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+
+from main.testing import MediaTestCase
+from organization import colors
+from organization.models import DEFAULT_COLOR, Organization
+
+
+def logo(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, format="PNG")
+    return SimpleUploadedFile("logo.png", buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class LogoColorsTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_colors_are_filled_after_commit_and_cached_by_content(self):
+        with mock.patch("organization.colors.analyze_logo", wraps=colors.analyze_logo) as analyze:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = Organization.objects.create(name="ACME", description="", logo=logo((200, 30, 30)))
+                # save() itself no longer opens the image
+                self.assertEqual(Organization.objects.get(pk=first.pk).primary_color, DEFAULT_COLOR)
+            with self.captureOnCommitCallbacks(execute=True):
+                second = Organization.objects.create(name="ACME 2", description="", logo=logo((200, 30, 30)))
+        self.assertEqual(analyze.call_count, 1)
+        for organization in (first, second):
+            organization.refresh_from_db()
+            self.assertEqual((organization.primary_color, organization.on_primary_color), ("c81e1e", "#FFFFFF"))
+
+    def test_colors_set_by_hand_are_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            organization = Organization.objects.create(name="ACME", description="", logo=logo("white"),
+                                                       primary_color="123456")
+        organization.refresh_from_db()
+        self.assertEqual(organization.primary_color, "123456")
+
+    def test_backfill_command(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            pks = [Organization.objects.create(name=f"ACME {i}", description="", logo=logo("white")).pk
+                   for i in range(3)]
+        out = io.StringIO()
+        call_command("backfill_organization_colors", "--workers", "1", stdout=out)
+        self.assertIn("Updated 3 organizations (1 logos analyzed", out.getvalue())
+        self.assertEqual(set(Organization.objects.filter(pk__in=pks).values_list("primary_color", "on_primary_color")),
+                         {("ffffff", "#000000")})
@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.services.export import EXPORT_BATCH_SIZE, EXPORTS, FORMATS, available_formats, iter_export, parse_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Export schools, scholarships or organizations as JSONL, CSV or Parquet. "
+        "Rows are streamed in batches, so memory use does not grow with the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", dest="file_format", choices=FORMATS, default="jsonl")
+        parser.add_argument("--since", help="Only rows updated after this ISO date or datetime.")
+        parser.add_argument("--output", "-o", default="-", help="Output file (default: standard output).")
+        parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows read per query.")
+
+    def handle(self, *args, **options):
+        kind, file_format = options["kind"], options["file_format"]
+        if file_format not in available_formats():
+            raise CommandError(f"--format {file_format} requires the pyarrow package.")
+        since = None
+        if options["since"]:
+            since = parse_since(options["since"])
+            if since is None:
+                raise CommandError(f"--since {options['since']!r} is not an ISO date or datetime.")
+
+        start = time.perf_counter()
+        written = 0
+        chunks = iter_export(kind, file_format, since=since, batch_size=options["batch_size"])
+        if options["output"] == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        with open(options["output"], "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written / 1024:,.0f} KiB of {kind} to {options['output']} in {time.perf_counter() - start:.2f}s."
+        ))
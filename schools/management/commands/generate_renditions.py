@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from main.cache import bump_generation
+from main.images import WATCHED_FIELDS, generate_renditions, get_manifest
+
+
+class Command(BaseCommand):
+    help = "Generate the missing WebP/AVIF renditions of every stored logo, cover, poster and photo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Images processed in parallel.")
+        parser.add_argument("--force", action="store_true", help="Rewrite manifests that already exist.")
+
+    def handle(self, *args, **options):
+        names, generations = set(), set()
+        for model, field_names, generation in WATCHED_FIELDS:
+            for field_name in field_names:
+                stored = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                names.update(stored.values_list(field_name, flat=True).iterator())
+            if generation:
+                generations.add(generation)
+        if not options["force"]:
+            names = {name for name in names if get_manifest(name) is None}
+
+        start = time.perf_counter()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for name, error in zip(sorted(names), pool.map(self.generate, sorted(names))):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+        if generations:
+            bump_generation(*generations)
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated renditions for {len(names) - failed} images in {time.perf_counter() - start:.2f}s"
+            f" ({failed} failed)."
+        ))
+
+    @staticmethod
+    def generate(name):
+        try:
+            generate_renditions(name)
+        except Exception as error:
+            return str(error) or type(error).__name__
+        return None
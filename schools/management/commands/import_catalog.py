@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.services.catalog import IMPORTERS, chunked, finish_import, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert schools, scholarships or organizations from a CSV or JSONL file, matched on uuid. "
+        "Rows are written in chunks of one transaction each; an interrupted import continues "
+        "from the last committed chunk with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or a .jsonl file with one object per line.")
+        parser.add_argument("--model", choices=sorted(IMPORTERS), default="schools", help="What the file contains.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows written per transaction.")
+        parser.add_argument("--resume", action="store_true", help="Skip the rows committed by a previous run.")
+        parser.add_argument("--state", help="Progress file (default: <path>.import-state.json).")
+        parser.add_argument("--skip-related", action="store_true",
+                            help="Do not update the related-school recommendations of the imported schools.")
+
+    def handle(self, *args, **options):
+        path, kind = options["path"], options["model"]
+        if not os.path.isfile(path):
+            raise CommandError(f"{path} does not exist.")
+        state_path = options["state"] or f"{path}.import-state.json"
+
+        offset = 0
+        if options["resume"] and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+            if state.get("model") != kind:
+                raise CommandError(f"{state_path} belongs to a {state.get('model')} import.")
+            offset = state["offset"]
+            self.stdout.write(f"Resuming after {offset} rows.")
+
+        importer = IMPORTERS[kind]()
+        start = time.perf_counter()
+        imported = 0
+        pks = set()
+        for chunk in chunked(islice(read_records(path), offset, None), options["chunk_size"]):
+            pks.update(importer.import_chunk(chunk))
+            imported += len(chunk)
+            # Written after the chunk's transaction committed, so a crash repeats at most one chunk
+            with open(state_path, "w") as state_file:
+                json.dump({"model": kind, "offset": offset + imported}, state_file)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{offset + imported:>10} rows  {imported / elapsed:,.0f} rows/s")
+
+        # A resumed import does not know the rows of the interrupted run, so it rebuilds them all
+        finish_import(kind, pks=None if offset else pks, update_related=not options["skip_related"])
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} {kind} in {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from main.files import AZURE_BATCH_SIZE, collect_orphans, find_orphans, referenced_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored media that no file field references (renditions and manifests of referenced images are kept). "
+        "Use --dry-run to only report what would be deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report orphaned files without deleting them.")
+        parser.add_argument("--prefix", default="", help="Only scan names starting with this path, e.g. uploads/.")
+        parser.add_argument("--exclude", action="append", default=[],
+                            help="Never collect names starting with this path (repeatable).")
+        parser.add_argument("--min-age", type=float, default=24,
+                            help="Keep files modified in the last N hours (uploads not yet committed).")
+        parser.add_argument("--workers", type=int, default=4, help="Delete batches sent in parallel.")
+        parser.add_argument("--batch-size", type=int, default=AZURE_BATCH_SIZE, help="Files per delete batch.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        start = time.perf_counter()
+        referenced = referenced_files()
+        loaded = time.perf_counter() - start
+        older_than = timezone.now() - timedelta(hours=options["min_age"]) if options["min_age"] else None
+
+        for storage, names in referenced.items():
+            stats = {}
+            orphans = self.report(find_orphans(storage, names, prefix=options["prefix"], exclude=options["exclude"],
+                                               older_than=older_than, stats=stats), stats)
+            scan_start = time.perf_counter()
+            if options["dry_run"]:
+                deleted = sum(1 for _name in orphans)
+            else:
+                deleted = collect_orphans(orphans, storage, batch_size=options["batch_size"],
+                                          workers=options["workers"])
+            elapsed = time.perf_counter() - scan_start
+            verb = "Would delete" if options["dry_run"] else "Deleted"
+            self.stdout.write(self.style.SUCCESS(
+                f"{storage.__class__.__name__}: scanned {stats['scanned']} files against {len(names)} referenced "
+                f"({loaded:.2f}s to load). {verb} {deleted} of {stats['orphans']} orphaned files "
+                f"({filesizeformat(stats['bytes'])}) in {elapsed:.2f}s, "
+                f"{stats['scanned'] / elapsed if elapsed else 0:.0f} files/s."
+            ))
+
+    def report(self, orphans, stats):
+        stats.update(orphans=0, bytes=0)
+        for name, size in orphans:
+            stats["orphans"] += 1
+            stats["bytes"] += size or 0
+            if self.verbosity > 1:
+                self.stdout.write(f"  {name} ({filesizeformat(size or 0)})")
+            yield name
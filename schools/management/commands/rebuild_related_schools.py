@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schools.services.recommendations import rebuild_related_schools
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored related-school recommendations of every school."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Schools rewritten per transaction.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_related_schools(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt recommendations for {count} schools in {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0006_schoolcustomizebutton'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedSchool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='score')),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.school')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='schools.school')),
+            ],
+            options={
+                'verbose_name': 'related school',
+                'verbose_name_plural': 'related schools',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['school', '-score'], name='related_school_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('school', 'related'), name='unique_related_school')],
+            },
+        ),
+    ]
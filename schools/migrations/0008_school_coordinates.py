@@ -0,0 +1,86 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+# Frozen copies of the parsing and geohash encoding in schools.services.geo, so
+# this migration keeps filling the same values whatever that module becomes.
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def parse_location(location):
+    try:
+        lat_str, lon_str = (location or "").split(",", 1)
+        lat, lon = float(lat_str.strip()), float(lon_str.strip())
+    except ValueError:
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def location_fields(location):
+    coords = parse_location(location)
+    if coords is None:
+        return None, None, ""
+    return coords[0], coords[1], encode_geohash(*coords)
+
+
+def fill_coordinates(apps, schema_editor):
+    School = apps.get_model('schools', 'School')
+    batch = []
+    for school in School.objects.exclude(location='').only('pk', 'location').iterator(chunk_size=1000):
+        school.latitude, school.longitude, school.geohash = location_fields(school.location)
+        batch.append(school)
+        if len(batch) == 1000:
+            School.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            batch = []
+    if batch:
+        School.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0007_related_school'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, verbose_name='geohash'),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='latitude'),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='longitude'),
+        ),
+        migrations.RunPython(fill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+"""
+    related.py
+    Precomputed "related schools" shown on the school detail page
+"""
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from schools.models.schoolsModel import School
+
+
+class RelatedSchool(models.Model):
+    """ One recommendation edge: ``related`` is suggested on the page of ``school`` """
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name="related_entries")
+    related = models.ForeignKey(School, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(verbose_name=_("score"))
+    updated_date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.school_id} -> {self.related_id} ({self.score:.3f})"
+
+    class Meta:
+        ordering = ["-score"]
+        verbose_name = _("related school")
+        verbose_name_plural = _("related schools")
+        constraints = [
+            models.UniqueConstraint(fields=["school", "related"], name="unique_related_school"),
+        ]
+        indexes = [
+            models.Index(fields=["school", "-score"], name="related_school_score_idx"),
+        ]
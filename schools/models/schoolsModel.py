@@ -5,6 +5,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from schools.models.base import DefaultField
+from schools.services.geo import location_fields
 from organization.models import Organization
 
 class SchoolType(DefaultField):
@@ -111,6 +112,10 @@ class School(models.Model):
     president = models.CharField(max_length=125, blank=True, verbose_name=_('president'))
     endowment = models.DecimalField(max_digits=18, decimal_places=2, blank=True, default=0.00, verbose_name=_('endowment'))
     location = models.CharField(max_length=255, blank=True, verbose_name=_('location'))
+    # Derived from ``location`` on save
+    latitude = models.FloatField(null=True, blank=True, editable=False, verbose_name=_('latitude'))
+    longitude = models.FloatField(null=True, blank=True, editable=False, verbose_name=_('longitude'))
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False, verbose_name=_('geohash'))
     motto = models.CharField(max_length=250, blank=True, verbose_name=_('motto'), default=_('N/A'))	
     tuition = models.DecimalField(max_digits=18, decimal_places=2, blank=True, default=0.00, verbose_name=(_("tuition")))
     
@@ -130,6 +135,10 @@ class School(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name) + "-" + (str(uuid.uuid4())[:6])
+        self.latitude, self.longitude, self.geohash = location_fields(self.location)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "location" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "latitude", "longitude", "geohash"}
         super().save(*args, **kwargs)
     
     def __str__(self):
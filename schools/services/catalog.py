@@ -0,0 +1,229 @@
+"""
+    catalog.py
+    Bulk import of schools, scholarships and organizations from CSV or JSONL.
+
+    Records are streamed from the input and written in chunks: each chunk is
+    one ``bulk_create(update_conflicts=True)`` upsert on ``uuid`` plus bulk
+    writes of its many-to-many rows, inside one transaction. No ``save()``
+    runs, so no model signals fire; ``finish_import`` then refreshes what
+    those signals would have maintained (search index, related schools of
+    the imported rows, cached home page fragments) once for the whole import.
+
+    Records without a ``uuid`` get one derived from their name, so importing
+    the same file twice updates rows instead of duplicating them.
+"""
+import csv
+import json
+import uuid
+from itertools import islice
+
+from django.db import models, transaction
+from django.utils.text import slugify
+
+from main.cache import bump_generation
+from organization.models import Industry, Organization
+from schools.models.levels import EducationalLevel
+from schools.models.schoolsModel import Scholarship, ScholarshipType, School, SchoolType
+from schools.services.geo import location_fields
+from schools.services.recommendations import rebuild_related_schools, update_related_schools
+from search.backends import get_search_backend
+from search.suggest import suggest_index
+
+UUID_NAMESPACE = uuid.UUID("6f1c7e52-4a8e-4b83-9d49-0a8f3c2b7d10")
+LIST_SEPARATOR = "|"
+
+
+def read_records(path):
+    """ Yield one dict per CSV row or JSONL line; the format follows the file extension. """
+    with open(path, newline="", encoding="utf-8") as source:
+        if str(path).endswith((".jsonl", ".ndjson")):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(source)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def split_list(value):
+    """ M2M columns are lists in JSONL and ``a|b`` strings in CSV. """
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value or "").split(LIST_SEPARATOR) if item.strip()]
+
+
+class LookupMap:
+    """ Case-insensitive ``name -> pk`` map of a lookup table, loaded once; unknown names are created. """
+
+    def __init__(self, model, field, **defaults):
+        self.model, self.field, self.defaults = model, field, defaults
+        self.pks = {name.casefold(): pk for name, pk in model.objects.values_list(field, "pk")}
+
+    def __getitem__(self, name):
+        key = name.casefold()
+        if key not in self.pks:
+            obj, _created = self.model.objects.get_or_create(**{f"{self.field}__iexact": name},
+                                                            defaults={self.field: name, **self.defaults})
+            self.pks[key] = obj.pk
+        return self.pks[key]
+
+
+class CatalogImporter:
+    """
+    Upserts one model. Scalar columns are the model's own editable fields;
+    subclasses add foreign keys and many-to-many columns resolved through
+    ``LookupMap``s, and the fields derived on ``save()``.
+    """
+    model = None
+    name_field = "name"
+    foreign_keys = {}    # column -> model field; values resolved by ``resolve_foreign_key``
+    many_to_many = {}    # column -> model field; values resolved by ``lookup``
+    lookups = {}         # column -> (model, name field) of the lookup table behind the column
+
+    def __init__(self):
+        self.fields = {
+            field.name: field for field in self.model._meta.concrete_fields
+            if field.editable and not (field.primary_key or field.is_relation or isinstance(field, models.FileField))
+            and field.name != "uuid"
+        }
+        self.lookup_maps = {}
+
+    def record_uuid(self, record):
+        if record.get("uuid"):
+            return uuid.UUID(str(record["uuid"]))
+        return uuid.uuid5(UUID_NAMESPACE, f"{self.model._meta.label_lower}:{record.get(self.name_field, '')}")
+
+    def convert(self, field, value):
+        if value in ("", None):
+            if field.null:
+                return None
+            return field.get_default()
+        return field.to_python(value)
+
+    def build(self, record):
+        values = {name: self.convert(field, record[name]) for name, field in self.fields.items() if name in record}
+        values["uuid"] = self.record_uuid(record)
+        for column, field_name in self.foreign_keys.items():
+            if record.get(column):
+                values[f"{field_name}_id"] = self.resolve_foreign_key(column, str(record[column]).strip())
+        obj = self.model(**values)
+        self.derive(obj)
+        return obj
+
+    def resolve_foreign_key(self, column, value):
+        return self.lookup(column)[value]
+
+    def lookup(self, column):
+        """ The ``LookupMap`` of a column declared in ``lookups``, loaded on first use. """
+        if column not in self.lookup_maps:
+            model, field = self.lookups[column]
+            self.lookup_maps[column] = LookupMap(model, field)
+        return self.lookup_maps[column]
+
+    def derive(self, obj):
+        """ Fill in what ``save()`` would have computed. """
+        if "slug" in self.fields and not obj.slug:
+            obj.slug = slugify(getattr(obj, self.name_field))[:60] + "-" + obj.uuid.hex[:6]
+
+    def update_fields(self, records):
+        """ Columns present in the input, plus the derived ones; ``slug`` is only set on insert. """
+        present = set().union(*records)
+        fields = [name for name in self.fields if name in present and name != "slug"]
+        fields += [field_name for column, field_name in self.foreign_keys.items() if column in present]
+        return fields + [f.name for f in self.model._meta.concrete_fields if getattr(f, "auto_now", False)]
+
+    def import_chunk(self, records):
+        objs = [self.build(record) for record in records]
+        with transaction.atomic():
+            self.model.objects.bulk_create(objs, update_conflicts=True, unique_fields=["uuid"],
+                                           update_fields=self.update_fields(records))
+            pks = dict(self.model.objects.filter(uuid__in=[obj.uuid for obj in objs]).values_list("uuid", "pk"))
+            for column, field_name in self.many_to_many.items():
+                self.replace_m2m(field_name, column, records, objs, pks)
+        return list(pks.values())
+
+    def replace_m2m(self, field_name, column, records, objs, pks):
+        through = getattr(self.model, field_name).through
+        source, target = self.model._meta.model_name, getattr(self.model, field_name).field.m2m_reverse_field_name()
+        owners = [(pks[obj.uuid], split_list(record[column])) for record, obj in zip(records, objs) if column in record]
+        if not owners:
+            return
+        lookup = self.lookup(column)
+        through.objects.filter(**{f"{source}_id__in": [pk for pk, _names in owners]}).delete()
+        through.objects.bulk_create([
+            through(**{f"{source}_id": pk, f"{target}_id": target_pk})
+            for pk, names in owners
+            for target_pk in {lookup[name] for name in names}
+        ], ignore_conflicts=True)
+
+
+class SchoolImporter(CatalogImporter):
+    model = School
+    foreign_keys = {"organization": "organization"}
+    many_to_many = {"type": "type", "educational_levels": "educational_levels"}
+    lookups = {"type": (SchoolType, "type"), "educational_levels": (EducationalLevel, "level_name")}
+
+    def resolve_foreign_key(self, column, value):
+        # Organizations are referenced by uuid and must exist (import them first)
+        organizations = self.lookup_maps.setdefault("organization", {})
+        if value not in organizations:
+            organizations[value] = Organization.objects.values_list("pk", flat=True).get(uuid=value)
+        return organizations[value]
+
+    def derive(self, obj):
+        super().derive(obj)
+        obj.latitude, obj.longitude, obj.geohash = location_fields(obj.location)
+
+    def update_fields(self, records):
+        fields = super().update_fields(records)
+        if "location" in fields:
+            fields += ["latitude", "longitude", "geohash"]
+        return fields
+
+
+class ScholarshipImporter(CatalogImporter):
+    model = Scholarship
+    foreign_keys = {"type": "type"}
+    lookups = {"type": (ScholarshipType, "name")}
+
+    def derive(self, obj):
+        if not obj.slug:
+            obj.slug = slugify(f"{obj.name}-{obj.provider}-{obj.uuid.hex[:6]}")[:255]
+
+
+class OrganizationImporter(CatalogImporter):
+    model = Organization
+    foreign_keys = {"industry": "industry"}
+    lookups = {"industry": (Industry, "name")}
+
+
+IMPORTERS = {
+    "schools": SchoolImporter,
+    "scholarships": ScholarshipImporter,
+    "organizations": OrganizationImporter,
+}
+
+
+def finish_import(kind, pks=None, update_related=True):
+    """
+    Refresh what the skipped signals maintain, once for the whole import.
+    ``pks`` are the imported rows; the related schools are updated around
+    them, or rebuilt for every school when they are not known.
+    """
+    if kind == "schools":
+        backend = get_search_backend()
+        backend.install()
+        backend.rebuild()
+        suggest_index.clear()
+        if update_related and pks is None:
+            rebuild_related_schools()
+        elif update_related:
+            update_related_schools(pks)
+        bump_generation("schools", "school_types", "profile_references")
+    elif kind == "organizations":
+        bump_generation("profile_references")
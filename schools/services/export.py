@@ -0,0 +1,241 @@
+"""
+    export.py
+    Streaming export of schools, scholarships and organizations.
+
+    Rows are read with ``values_list().iterator()`` in primary-key order and
+    encoded one batch at a time, so memory use depends on the batch size and
+    not on the table size. The columns are the ones ``import_catalog``
+    reads: foreign keys and many-to-many relations are written by name (or
+    uuid for organizations), lists as JSON arrays in JSONL and ``a|b`` in CSV.
+
+    Parquet needs the optional ``pyarrow`` package; each batch becomes one
+    row group.
+"""
+import csv
+import io
+import uuid
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from organization.models import Organization
+from schools.models.schoolsModel import Scholarship, School
+from schools.services.catalog import LIST_SEPARATOR, chunked
+
+EXPORT_BATCH_SIZE = 2000
+FORMATS = ("jsonl", "csv", "parquet")
+CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_since(value):
+    """ Parse an ISO date or datetime; naive values are in the current time zone. Returns None if invalid. """
+    try:
+        since = parse_datetime(value)
+        if since is None and (day := parse_date(value)) is not None:
+            since = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != "parquet" or has_pyarrow()]
+
+
+class CatalogExport:
+    """
+    Columns of one model: its own concrete fields, ``foreign_keys`` as
+    ``column -> lookup`` and ``many_to_many`` as ``field -> name field of
+    the related model``.
+    """
+    model = None
+    updated_field = "updated_at"
+    foreign_keys = {}
+    many_to_many = {}
+
+    def __init__(self, since=None):
+        self.since = since
+        self.fields = [field for field in self.model._meta.concrete_fields
+                       if not (field.primary_key or field.is_relation)]
+        self.columns = [field.name for field in self.fields] + list(self.foreign_keys) + list(self.many_to_many)
+
+    def queryset(self):
+        queryset = self.model.objects.order_by("pk")
+        if self.since is not None:
+            queryset = queryset.filter(**{f"{self.updated_field}__gt": self.since})
+        return queryset.values_list("pk", *[field.name for field in self.fields], *self.foreign_keys.values())
+
+    def batches(self, batch_size=EXPORT_BATCH_SIZE):
+        """ Yield lists of rows (tuples in ``columns`` order) with their related names attached. """
+        for chunk in chunked(self.queryset().iterator(chunk_size=batch_size), batch_size):
+            pks = [row[0] for row in chunk]
+            related = [self.related_names(field_name, name_field, pks)
+                       for field_name, name_field in self.many_to_many.items()]
+            yield [
+                tuple(self.convert(value) for value in row[1:]) + tuple(names.get(row[0], []) for names in related)
+                for row in chunk
+            ]
+
+    def related_names(self, field_name, name_field, pks):
+        """ ``pk -> [names]`` for one many-to-many field, one query per batch. """
+        field = self.model._meta.get_field(field_name)
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        names = {}
+        rows = through.objects.filter(**{f"{source}_id__in": pks}).order_by(f"{target}__{name_field}")
+        for pk, name in rows.values_list(f"{source}_id", f"{target}__{name_field}"):
+            names.setdefault(pk, []).append(name)
+        return names
+
+    def convert(self, value):
+        return str(value) if isinstance(value, uuid.UUID) else value
+
+
+class SchoolExport(CatalogExport):
+    model = School
+    updated_field = "updated_date"
+    foreign_keys = {"organization": "organization__uuid"}
+    many_to_many = {"type": "type", "educational_levels": "level_name"}
+
+
+class ScholarshipExport(CatalogExport):
+    model = Scholarship
+    foreign_keys = {"type": "type__name"}
+
+
+class OrganizationExport(CatalogExport):
+    model = Organization
+    foreign_keys = {"industry": "industry__name"}
+
+
+EXPORTS = {
+    "schools": SchoolExport,
+    "scholarships": ScholarshipExport,
+    "organizations": OrganizationExport,
+}
+
+
+def iter_jsonl(export, batch_size=EXPORT_BATCH_SIZE):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in export.batches(batch_size):
+        yield "".join(encoder.encode(dict(zip(export.columns, row))) + "\n" for row in batch).encode()
+
+
+def iter_csv(export, batch_size=EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.columns)
+    for batch in export.batches(batch_size):
+        writer.writerows(
+            [LIST_SEPARATOR.join(value) if isinstance(value, list) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Drain:
+    """ Write-only sink that hands out what was written so far; Parquet only ever appends. """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def arrow_type(field):
+    import pyarrow as pa
+
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema(export):
+    import pyarrow as pa
+
+    return pa.schema(
+        [(field.name, arrow_type(field)) for field in export.fields]
+        + [(column, pa.string()) for column in export.foreign_keys]
+        + [(column, pa.list_(pa.string())) for column in export.many_to_many]
+    )
+
+
+def iter_parquet(export, batch_size=EXPORT_BATCH_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(export)
+    sink = _Drain()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd") as writer:
+        for batch in export.batches(batch_size):
+            columns = list(zip(*batch))
+            for index, field in enumerate(schema):
+                if pa.types.is_string(field.type):
+                    columns[index] = [None if value is None else str(value) for value in columns[index]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema,
+            ))
+            yield sink.take()
+    yield sink.take()
+
+
+WRITERS = {
+    "jsonl": iter_jsonl,
+    "csv": iter_csv,
+    "parquet": iter_parquet,
+}
+
+
+def iter_export(kind, file_format, since=None, batch_size=EXPORT_BATCH_SIZE):
+    """ Yield the encoded export of ``kind`` as byte chunks, one per batch. """
+    return WRITERS[file_format](EXPORTS[kind](since=since), batch_size=batch_size)
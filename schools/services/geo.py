@@ -0,0 +1,123 @@
+"""
+    geo.py
+    Coordinates, geohashes and distances for school locations.
+
+    ``School.location`` stays the editable ``"lat,lon"`` string; ``School.save``
+    derives ``latitude``, ``longitude`` and a ``geohash`` from it. Geohash
+    prefixes name nested grid cells, so the schools of a cell are one range
+    scan on the indexed ``geohash`` column in any database.
+"""
+import math
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def parse_location(location):
+    """ Parse a ``"lat,lon"`` string; return None when it is missing or invalid. """
+    try:
+        lat_str, lon_str = (location or "").split(",", 1)
+        lat, lon = float(lat_str.strip()), float(lon_str.strip())
+    except ValueError:
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def location_fields(location):
+    """ Return ``(latitude, longitude, geohash)`` for a location string, blank when it does not parse. """
+    coords = parse_location(location)
+    if coords is None:
+        return None, None, ""
+    return coords[0], coords[1], encode_geohash(*coords)
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """ Height and width in degrees of a geohash cell of ``precision`` characters. """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_precision(lat, radius_km):
+    """ Longest geohash precision whose cells are at least ``radius_km`` tall and wide at ``lat``. """
+    lat_radius = radius_km / KM_PER_DEGREE
+    lon_radius = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if height >= lat_radius and width >= lon_radius:
+            return precision
+    return 0
+
+
+def covering_cells(lat, lon, radius_km):
+    """
+    Geohash prefixes covering every point within ``radius_km`` of ``(lat, lon)``:
+    the cell containing the point and its eight neighbours, each at least
+    ``radius_km`` across. Returns ``[""]`` (everything) for very large radii.
+    """
+    precision = covering_precision(lat, radius_km)
+    if precision == 0:
+        return [""]
+    height, width = cell_size(precision)
+    cells = set()
+    for dlat in (-height, 0, height):
+        neighbour_lat = lat + dlat
+        if not -90 <= neighbour_lat <= 90:
+            continue
+        for dlon in (-width, 0, width):
+            neighbour_lon = (lon + dlon + 180) % 360 - 180
+            cells.add(encode_geohash(neighbour_lat, neighbour_lon, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(h, 1.0)))
+
+
+def within_radius(lat, lon, radius_km, points):
+    """
+    Yield ``(distance_km, key)`` for each ``(key, lat, lon)`` in ``points`` within ``radius_km``.
+
+    The trigonometry of the center is computed once; a latitude band check
+    drops most far points before the exact haversine distance.
+    """
+    lat_band = radius_km / KM_PER_DEGREE
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    for key, point_lat, point_lon in points:
+        if abs(point_lat - lat) > lat_band:
+            continue
+        p_lat = radians(point_lat)
+        h = sin((p_lat - lat_rad) / 2) ** 2 + cos_lat * cos(p_lat) * sin((radians(point_lon) - lon_rad) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * asin(sqrt(min(h, 1.0)))
+        if distance <= radius_km:
+            yield distance, key
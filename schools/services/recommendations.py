@@ -0,0 +1,309 @@
+"""
+    recommendations.py
+    Scores and stores the "related schools" of each school.
+
+    Two schools are related by the Jaccard overlap of their types and of
+    their educational levels, plus a bonus that decays with the distance
+    between their locations. Each school keeps its ``STORED_RELATED`` best
+    matches in ``RelatedSchool`` so the detail page reads them with one
+    indexed query; the signals in ``schools.signals`` queue the changed
+    schools, which are updated on the background pool after commit.
+
+    Candidates come from buckets: each type and each level of a school, and
+    the geohash cells around it. A bucket contributes at most
+    ``CANDIDATES_PER_BUCKET`` schools, the closest in geohash order, so the
+    work per school stays bounded however many schools share a type.
+"""
+import bisect
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Q
+
+from main.tasks import defer_per_transaction, run_in_background
+from schools.models.related import RelatedSchool
+from schools.models.schoolsModel import School
+from schools.services.geo import KM_PER_DEGREE, covering_cells, haversine_km, within_radius
+
+logger = logging.getLogger(__name__)
+
+TYPE_WEIGHT = 0.4
+LEVEL_WEIGHT = 0.4
+DISTANCE_WEIGHT = 0.2
+# Distance (km) at which the proximity bonus has dropped to 1/e
+DISTANCE_SCALE_KM = 25.0
+# Schools of any type within this radius (km) are candidates; the bonus is under 3% past it
+NEARBY_KM = 2 * DISTANCE_SCALE_KM
+# Most candidates taken from one type, level or neighbourhood
+CANDIDATES_PER_BUCKET = 50
+# Past this many changed schools, one bulk load beats querying each school's buckets
+BULK_UPDATE_THRESHOLD = 200
+
+STORED_RELATED = 12
+RELATED_LIMIT = 6
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def nearest(lat, lon, radius_km, points, limit):
+    """ Keys of the ``limit`` nearest ``(key, lat, lon)`` points within ``radius_km``. """
+    return [key for _distance, key in sorted(within_radius(lat, lon, radius_km, points))[:limit]]
+
+
+def chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@dataclass
+class SchoolFeatures:
+    types: set = field(default_factory=set)
+    levels: set = field(default_factory=set)
+    coords: tuple = None
+    geohash: str = ""
+
+
+def load_features(pks=None):
+    """ Features of the active schools among ``pks``, or of every active school. """
+    schools = School.objects.filter(is_active=True)
+    types = School.type.through.objects.all()
+    levels = School.educational_levels.through.objects.all()
+    if pks is not None:
+        schools, types, levels = (
+            schools.filter(pk__in=pks), types.filter(school_id__in=pks), levels.filter(school_id__in=pks))
+    features = {
+        pk: SchoolFeatures(coords=(lat, lon) if lat is not None else None, geohash=geohash)
+        for pk, lat, lon, geohash in schools.values_list("pk", "latitude", "longitude", "geohash")
+    }
+    for school_id, type_id in types.values_list("school_id", "schooltype_id"):
+        if school_id in features:
+            features[school_id].types.add(type_id)
+    for school_id, level_id in levels.values_list("school_id", "educationallevel_id"):
+        if school_id in features:
+            features[school_id].levels.add(level_id)
+    return features
+
+
+class MemoryIndex:
+    """ Buckets of every active school, sorted by geohash, for rebuilds and large updates. """
+
+    def __init__(self, features):
+        self.buckets = {"type": {}, "educational_levels": {}}
+        ordered = sorted((school.geohash, pk) for pk, school in features.items())
+        for item in ordered:
+            school = features[item[1]]
+            for type_id in school.types:
+                self.buckets["type"].setdefault(type_id, []).append(item)
+            for level_id in school.levels:
+                self.buckets["educational_levels"].setdefault(level_id, []).append(item)
+        self.located = [
+            (geohash, pk, *features[pk].coords) for geohash, pk in ordered if features[pk].coords]
+
+    def closest(self, relation, key, geohash, limit):
+        """ About ``limit`` schools of a bucket around ``geohash`` in geohash order. """
+        bucket = self.buckets[relation].get(key, [])
+        position = bisect.bisect_left(bucket, (geohash,))
+        start = max(0, min(position - limit // 2, len(bucket) - limit))
+        return [pk for _geohash, pk in bucket[start:start + limit]]
+
+    def within(self, features, radius_km, limit):
+        """ The ``limit`` nearest schools within ``radius_km``, of the closest ``limit`` of each covering cell. """
+        lat, lon = features.coords
+        points = []
+        for cell in covering_cells(lat, lon, radius_km):
+            lo = bisect.bisect_left(self.located, (cell,))
+            hi = bisect.bisect_left(self.located, (cell + "~",))
+            position = bisect.bisect_left(self.located, (features.geohash,), lo, hi)
+            start = max(lo, min(position - limit // 2, hi - limit))
+            points.extend(item[1:] for item in self.located[start:min(start + limit, hi)])
+        return nearest(lat, lon, radius_km, points, limit)
+
+
+class QueryIndex:
+    """ The same buckets read with indexed queries, for updating a few schools. """
+
+    def closest(self, relation, key, geohash, limit):
+        schools = School.objects.filter(is_active=True, **{relation: key})
+        before = list(schools.filter(geohash__lt=geohash).order_by("-geohash", "-pk")
+                      .values_list("pk", flat=True)[:limit // 2])
+        after = list(schools.filter(geohash__gte=geohash).order_by("geohash", "pk")
+                     .values_list("pk", flat=True)[:limit - len(before)])
+        return before + after
+
+    def within(self, features, radius_km, limit):
+        lat, lon = features.coords
+        cells = covering_cells(lat, lon, radius_km)
+        ranges = Q()
+        for cell in cells:
+            ranges |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+        lat_band = radius_km / KM_PER_DEGREE
+        schools = School.objects.filter(ranges, is_active=True, latitude__range=(lat - lat_band, lat + lat_band))
+        points = schools.order_by("geohash").values_list("pk", "latitude", "longitude")[:limit * len(cells)]
+        return nearest(lat, lon, radius_km, points, limit)
+
+
+class SchoolGraph:
+    """
+    Features of active schools and the scores between them. Without ``pks``
+    every active school is loaded up front; otherwise ``pks`` are, and the
+    features of their candidates as they are found.
+    """
+
+    def __init__(self, pks=None):
+        if pks is None:
+            self.features = load_features()
+            self.loaded = None
+            self.index = MemoryIndex(self.features)
+        else:
+            self.features = {}
+            self.loaded = set()
+            self.index = QueryIndex()
+            self.load(pks)
+
+    def load(self, pks):
+        if self.loaded is None:
+            return
+        missing = set(pks) - self.loaded
+        for batch in chunks(missing, 500):
+            self.features.update(load_features(batch))
+        self.loaded |= missing
+
+    def score(self, a, b):
+        fa, fb = self.features[a], self.features[b]
+        score = TYPE_WEIGHT * jaccard(fa.types, fb.types) + LEVEL_WEIGHT * jaccard(fa.levels, fb.levels)
+        if fa.coords and fb.coords:
+            score += DISTANCE_WEIGHT * math.exp(-haversine_km(*fa.coords, *fb.coords) / DISTANCE_SCALE_KM)
+        return score
+
+    def candidates(self, pk):
+        """ The closest schools sharing a type or level with ``pk``, and the schools around it. """
+        features = self.features[pk]
+        candidates = set()
+        for type_id in features.types:
+            candidates.update(self.index.closest("type", type_id, features.geohash, CANDIDATES_PER_BUCKET))
+        for level_id in features.levels:
+            candidates.update(
+                self.index.closest("educational_levels", level_id, features.geohash, CANDIDATES_PER_BUCKET))
+        if features.coords:
+            candidates.update(self.index.within(features, NEARBY_KM, CANDIDATES_PER_BUCKET))
+        candidates.discard(pk)
+        return candidates
+
+    def scores(self, pk):
+        """ ``{other: score}`` of the candidates of ``pk`` scoring above zero. """
+        if pk not in self.features:
+            return {}
+        candidates = self.candidates(pk)
+        self.load(candidates)
+        scores = {other: self.score(pk, other) for other in candidates if other in self.features}
+        return {other: score for other, score in scores.items() if score > 0}
+
+    def top_related(self, pk):
+        return rank(self.scores(pk))
+
+
+def rank(scores):
+    """ The ``STORED_RELATED`` best ``(score, other)`` of a ``{other: score}`` mapping. """
+    ranked = sorted(((score, other) for other, score in scores.items()), key=lambda item: (-item[0], item[1]))
+    return ranked[:STORED_RELATED]
+
+
+def store_related(lists):
+    """ Replace the stored recommendations of each school of ``{pk: [(score, other), ...]}``. """
+    rows = [
+        RelatedSchool(school_id=pk, related_id=other, score=score)
+        for pk, ranked in lists.items()
+        for score, other in ranked
+    ]
+    with transaction.atomic():
+        RelatedSchool.objects.filter(school_id__in=list(lists)).delete()
+        RelatedSchool.objects.bulk_create(rows, batch_size=1000)
+
+
+def rebuild_related_schools(batch_size=500):
+    """ Recompute the recommendations of every school. """
+    graph = SchoolGraph()
+    RelatedSchool.objects.exclude(school_id__in=graph.features).delete()
+    pks = sorted(graph.features)
+    for batch in chunks(pks, batch_size):
+        store_related({pk: graph.top_related(pk) for pk in batch})
+    return len(pks)
+
+
+def stored_scores(pks):
+    """ ``{school: {related: score}}`` of the stored recommendations of ``pks``. """
+    stored = {}
+    for batch in chunks(pks, 500):
+        rows = RelatedSchool.objects.filter(school_id__in=batch).values_list("school_id", "related_id", "score")
+        for school_id, related_id, score in rows:
+            stored.setdefault(school_id, {})[related_id] = score
+    return stored
+
+
+def update_related_schools(pks, batch_size=500):
+    """
+    Update the recommendations after ``pks`` changed. ``pks`` are recomputed.
+    Their candidates, and the schools listing them, merge in their new scores
+    against ``pks``; one of those is recomputed only when its full list lost
+    or lowered a match, since an unstored school may then outrank it.
+    """
+    pks = set(pks)
+    if not pks:
+        return
+    graph = SchoolGraph(None if len(pks) > BULK_UPDATE_THRESHOLD else pks)
+    scores = {pk: graph.scores(pk) for pk in pks}
+    lists = {pk: rank(pk_scores) for pk, pk_scores in scores.items()}
+
+    listing = set()
+    for batch in chunks(pks, 500):
+        listing.update(RelatedSchool.objects.filter(related_id__in=batch).values_list("school_id", flat=True))
+    others = (listing | {other for pk_scores in scores.values() for other in pk_scores}) - pks
+    stored = stored_scores(others)
+    recompute = set()
+    for other in others:
+        current = stored.get(other, {})
+        merged = {related: score for related, score in current.items() if related not in pks}
+        merged.update((pk, scores[pk][other]) for pk in pks if other in scores[pk])
+        lowered = any(merged.get(pk, 0) < current[pk] for pk in pks & current.keys())
+        if lowered and len(current) >= STORED_RELATED:
+            recompute.add(other)
+            continue
+        ranked = rank(merged)
+        if {related: score for score, related in ranked} != current:
+            lists[other] = ranked
+    for other in recompute:
+        graph.load([other])
+        lists[other] = graph.top_related(other)
+
+    for batch in chunks(sorted(lists), batch_size):
+        store_related({pk: lists[pk] for pk in batch})
+
+
+# Updates read and rewrite the lists of neighbouring schools, so run them one at a time
+_update_lock = threading.Lock()
+
+
+def schedule_update(pks):
+    """ Queue ``pks`` for an update on the background pool once the current transaction commits. """
+    defer_per_transaction("schools.related", pks, flush_updates)
+
+
+def flush_updates(pks):
+    if pks:
+        run_in_background(refresh_related, set(pks))
+
+
+def refresh_related(pks):
+    try:
+        with _update_lock:
+            update_related_schools(pks)
+    except Exception:
+        logger.exception("Could not update the related schools of %s", sorted(pks))
@@ -1,24 +1,78 @@
-import os
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
+from main.cache import bump_generation
+from main.files import track_file_fields
+from main.images import watch_image_fields
 from schools.models import schoolsModel
+from schools.models.related import RelatedSchool
+from schools.services.recommendations import schedule_update
+
+# Fields of School that the scores depend on, besides the type and level relations
+RELATED_FIELDS = ("location", "is_active")
+_unknown = object()
+
+
+def related_state(instance):
+    # Deferred fields are not in __dict__; they count as unknown, hence changed
+    return {name: instance.__dict__.get(name, _unknown) for name in RELATED_FIELDS}
+
+
+@receiver(post_init, sender=schoolsModel.School)
+def remember_related_fields(sender, instance, **kwargs):
+    instance._related_state = related_state(instance)
+
 
 @receiver(post_save, sender=schoolsModel.School)
-def delete_old_logo_on_update(sender, instance, **kwargs):
-    if not instance.pk:
-        return
-    try:
-        old_logo = sender.objects.get(pk=instance.pk).logo
-    except sender.DoesNotExist:
+def update_related_on_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """ Refresh the school's recommendations when it is new or its location or status changed. """
+    if raw or (update_fields is not None and not set(RELATED_FIELDS) & set(update_fields)):
         return
-    
-    if old_logo and old_logo != instance.logo:
-        if os.path.isfile(old_logo.path):
-            old_logo.delete(save=False)
-            
+    state = related_state(instance)
+    if created or state != instance._related_state:
+        schedule_update([instance.pk])
+    instance._related_state = state
+
+
+@receiver(pre_delete, sender=schoolsModel.School)
+def remember_related_on_delete(sender, instance, **kwargs):
+    instance._listed_by = list(RelatedSchool.objects.filter(related=instance).values_list("school_id", flat=True))
+
+
 @receiver(post_delete, sender=schoolsModel.School)
-def delete_logo_on_delete(sender, instance, **kwargs):
-    if instance.logo:
-        if os.path.isfile(instance.logo.path):
-            instance.logo.delete(save=False)
\ No newline at end of file
+def update_related_on_delete(sender, instance, **kwargs):
+    """ Schools that recommended the deleted school need a replacement. """
+    schedule_update(getattr(instance, "_listed_by", []))
+
+
+@receiver(m2m_changed, sender=schoolsModel.School.type.through)
+@receiver(m2m_changed, sender=schoolsModel.School.educational_levels.through)
+def update_related_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Types and levels drive the Jaccard part of the score. """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            schedule_update([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        schedule_update(pk_set)
+    elif action == "pre_clear":
+        # The cleared schools are gone by post_clear, so collect them now
+        field_name = instance._meta.model_name
+        schedule_update(sender.objects.filter(**{field_name: instance}).values_list("school_id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=schoolsModel.School)
+@receiver(m2m_changed, sender=schoolsModel.School.type.through)
+def bump_schools_generation(sender, **kwargs):
+    """ Invalidate the cached home page school grid. """
+    bump_generation("schools")
+
+
+@receiver([post_save, post_delete], sender=schoolsModel.SchoolType)
+def bump_school_types_generation(sender, **kwargs):
+    """ Invalidate the cached home page type bar (and grids filtered by type name). """
+    bump_generation("school_types")
+
+
+track_file_fields(schoolsModel.School, "logo", "cover_image")
+watch_image_fields(schoolsModel.School, "logo", "cover_image", generation="schools")
+watch_image_fields(schoolsModel.Scholarship, "thumbnail")
@@ -0,0 +1,39 @@
+""" Responsive images from the renditions generated by main/images.py """
+from django import template
+
+from main.images import RENDITION_FORMATS, get_manifest, manifest_srcset, manifest_url, rendition_url
+
+register = template.Library()
+
+
+@register.inclusion_tag("shared/_picture.html")
+def picture(image, size="card", sizes="", alt="", css_class="", loading="lazy"):
+    """
+    ``<picture>`` for an ImageField value: one ``<source>`` per rendition format
+    with a ``srcset`` of every width, and an ``<img>`` of ``size`` as fallback.
+    The manifest is read once for all of them.
+
+        {% picture school.logo "card" sizes="(min-width: 1024px) 12vw, 50vw" alt=school.name css_class="w-full" %}
+    """
+    context = {"alt": alt, "css_class": css_class, "loading": loading, "sizes": sizes, "sources": []}
+    if not image:
+        return context
+    manifest = get_manifest(image.name, image.storage)
+    context["src"] = manifest_url(manifest, image.name, size, image.storage)
+    if manifest:
+        entry = manifest["sizes"].get(size)
+        if entry:
+            context["width"], context["height"] = entry["width"], entry["height"]
+        for fmt, (content_type, _options) in RENDITION_FORMATS.items():
+            srcset = manifest_srcset(manifest, fmt, image.storage)
+            if srcset:
+                context["sources"].append({"type": content_type, "srcset": srcset})
+    return context
+
+
+@register.filter
+def rendition(image, size):
+    """ URL of one rendition, e.g. for CSS backgrounds: ``{{ school.cover_image|rendition:"hero" }}`` """
+    if not image:
+        return ""
+    return rendition_url(image.name, size, image.storage)
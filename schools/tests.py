@@ -1,3 +1,433 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from main.images import forget_renditions, get_manifest, rendition_name
+from main.testing import MediaTestCase
+from organization.models import Organization
+from schools.models.levels import EducationalLevel
+from schools.models.related import RelatedSchool
+from schools.models.schoolsModel import Scholarship, School, SchoolType
+from schools.services.geo import covering_cells, encode_geohash, haversine_km, within_radius
+from schools.services.recommendations import SchoolGraph, rebuild_related_schools
+from user.models import User
+from user.qr import qr_name
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class RelatedSchoolTest(TestCase):
+
+    def setUp(self):
+        self.university = SchoolType.objects.create(type="University")
+        self.institute = SchoolType.objects.create(type="Institute")
+        self.bachelor = EducationalLevel.objects.create(level_name="Bachelor")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.school = self.create("Royal University", "11.56,104.92", [self.university], [self.bachelor])
+            self.twin = self.create("Phnom Penh University", "11.57,104.90", [self.university], [self.bachelor])
+            self.same_type = self.create("Far University", "13.36,103.86", [self.university], [])
+            self.unrelated = self.create("Far Institute", "13.10,103.20", [self.institute], [])
+
+    def create(self, name, location, types, levels):
+        school = School.objects.create(name=name, location=location)
+        school.type.set(types)
+        school.educational_levels.set(levels)
+        return school
+
+    def related_names(self, school):
+        return list(RelatedSchool.objects.filter(school=school).values_list("related__name", flat=True))
+
+    def test_rebuild_ranks_by_overlap_and_distance(self):
+        rebuild_related_schools()
+        self.assertEqual(self.related_names(self.school), ["Phnom Penh University", "Far University"])
+
+    def test_m2m_change_updates_both_sides(self):
+        rebuild_related_schools()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unrelated.type.add(self.university)
+        self.assertIn("Far Institute", self.related_names(self.school))
+        self.assertIn("Royal University", self.related_names(self.unrelated))
+
+    def test_detail_view_reads_precomputed_rows(self):
+        rebuild_related_schools()
+        School.objects.filter(pk=self.twin.pk).update(is_active=False)
+        response = self.client.get(reverse("schools:school-detail", args=[self.school.pk]))
+        self.assertEqual([s.name for s in response.context["related_items"]], ["Far University"])
+
+    def test_only_scored_fields_schedule_an_update(self):
+        with mock.patch("schools.signals.schedule_update") as schedule_update:
+            self.school.name = "Royal University of Phnom Penh"
+            self.school.save()
+            School.objects.get(pk=self.twin.pk).save(update_fields=["name"])
+            schedule_update.assert_not_called()
+
+            self.school.location = "11.60,104.95"
+            self.school.save()
+            schedule_update.assert_called_once_with([self.school.pk])
+
+    def test_rolled_back_changes_are_not_updated(self):
+        with mock.patch("schools.services.recommendations.refresh_related") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    self.unrelated.type.add(self.university)
+                    raise RuntimeError
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.twin.location = "11.60,104.95"
+                self.twin.save()
+                self.twin.educational_levels.clear()
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once_with({self.twin.pk})
+
+    def test_candidates_are_capped_per_bucket(self):
+        for i in range(10):
+            self.create(f"University {i}", "", [self.university], [])
+        with mock.patch("schools.services.recommendations.CANDIDATES_PER_BUCKET", 4):
+            for graph in (SchoolGraph(), SchoolGraph([self.school.pk])):
+                # Four universities, four bachelor schools, four schools nearby
+                self.assertLessEqual(len(graph.candidates(self.school.pk)), 12)
+                self.assertIn(self.twin.pk, graph.candidates(self.school.pk))
+
+    def test_updates_match_a_rebuild(self):
+        rng = random.Random(3)
+        schools = [self.school, self.twin, self.same_type, self.unrelated]
+        with self.captureOnCommitCallbacks(execute=True):
+            schools += [
+                self.create(f"School {i}", f"{rng.uniform(11, 14):.3f},{rng.uniform(103, 105):.3f}",
+                            rng.sample([self.university, self.institute], rng.randint(0, 2)),
+                            rng.sample([self.bachelor], rng.randint(0, 1)))
+                for i in range(40)
+            ]
+
+        def move(school, location):
+            school.location = location
+            school.save()
+
+        def deactivate(school):
+            school.is_active = False
+            school.save()
+
+        changes = [
+            lambda: schools[5].type.set([self.university, self.institute]),
+            lambda: move(schools[6], "11.58,104.91"),
+            lambda: deactivate(schools[7]),
+            lambda: schools[8].delete(),
+            lambda: self.twin.educational_levels.clear(),
+            lambda: self.create("Royal University Campus", "11.56,104.93", [self.university], [self.bachelor]),
+        ]
+        rows = lambda: sorted(RelatedSchool.objects.values_list("school_id", "related_id", "score"))
+        for change in changes:
+            rebuild_related_schools()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            updated = rows()
+            rebuild_related_schools()
+            self.assertEqual(updated, rows())
+
+
+class GeoTest(SimpleTestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744), "u4pruydqq")
+
+    def test_covering_cells_contain_every_point_in_radius(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            lat, lon = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            radius = rng.choice([0.5, 5, 30, 150])
+            cells = covering_cells(lat, lon, radius)
+            for _ in range(20):
+                point = (lat + rng.uniform(-2, 2) * radius / 111, lon + rng.uniform(-2, 2) * radius / 111)
+                if -90 <= point[0] <= 90 and -180 <= point[1] <= 180 and haversine_km(lat, lon, *point) <= radius:
+                    self.assertTrue(any(encode_geohash(*point).startswith(cell) for cell in cells))
+
+    def test_within_radius_matches_haversine(self):
+        points = [(i, 11 + i / 100, 104 + i / 100) for i in range(100)]
+        found = {pk for _distance, pk in within_radius(11.5, 104.5, 40, points)}
+        expected = {pk for pk, lat, lon in points if haversine_km(11.5, 104.5, lat, lon) <= 40}
+        self.assertEqual(found, expected)
+
+
+class SchoolCoordinatesTest(TestCase):
+
+    def test_save_derives_coordinates_from_location(self):
+        school = School.objects.create(name="Royal University", location=" 11.5564 , 104.9282")
+        school.refresh_from_db()
+        self.assertEqual((school.latitude, school.longitude), (11.5564, 104.9282))
+        self.assertEqual(school.geohash, encode_geohash(11.5564, 104.9282))
+
+        school.location = "not a location"
+        school.save(update_fields=["location"])
+        school.refresh_from_db()
+        self.assertEqual((school.latitude, school.longitude, school.geohash), (None, None, ""))
+
+
+class ImportCatalogTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.university = SchoolType.objects.create(type="University")
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            output.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        call_command("import_catalog", path, *args, stdout=io.StringIO())
+
+    def test_csv_upsert_is_idempotent_and_maps_relations(self):
+        path = self.write("schools.csv", (
+            "name,location,type,educational_levels,tuition\n"
+            "Royal University,\"11.56,104.92\",university|Institute,Bachelor|Master,1200.50\n"
+            "Kampot School,,Institute,,\n"
+        ))
+        self.import_file(path, "--chunk-size", "1")
+        self.import_file(path)
+
+        self.assertEqual(School.objects.count(), 2)
+        royal = School.objects.get(name="Royal University")
+        self.assertEqual(sorted(royal.type.values_list("type", flat=True)), ["Institute", "University"])
+        self.assertEqual(sorted(royal.educational_levels.values_list("level_name", flat=True)), ["Bachelor", "Master"])
+        self.assertEqual(SchoolType.objects.count(), 2)
+        self.assertEqual((royal.latitude, royal.longitude, royal.geohash), (11.56, 104.92, encode_geohash(11.56, 104.92)))
+        self.assertEqual(str(royal.tuition), "1200.50")
+        self.assertTrue(royal.slug.startswith("royal-university-"))
+        self.assertEqual(list(School.objects.filter(name__startswith="Royal").values_list("pk", flat=True)), [royal.pk])
+        # Finalization indexes the imported rows and computes their recommendations
+        self.assertEqual(RelatedSchool.objects.filter(school=royal).count(), 1)
+
+    def test_related_schools_are_updated_around_the_imported_rows(self):
+        school = School.objects.create(name="Phnom Penh University", location="11.57,104.90")
+        school.type.set([self.university])
+        path = self.write("schools.csv", 'name,location,type\nRoyal University,"11.56,104.92",University\n')
+        with mock.patch("schools.services.catalog.rebuild_related_schools") as rebuild:
+            self.import_file(path)
+        rebuild.assert_not_called()
+        royal = School.objects.get(name="Royal University")
+        self.assertEqual(list(RelatedSchool.objects.filter(school=school).values_list("related", flat=True)), [royal.pk])
+
+    def test_jsonl_updates_by_uuid_without_touching_omitted_columns(self):
+        school = School.objects.create(name="Old name", motto="Knowledge", location="11.5,104.9")
+        school.type.set([self.university])
+        path = self.write("schools.jsonl", json.dumps({"uuid": str(school.uuid), "name": "New name"}) + "\n")
+        self.import_file(path)
+
+        school.refresh_from_db()
+        self.assertEqual((school.name, school.motto, school.latitude), ("New name", "Knowledge", 11.5))
+        self.assertEqual(list(school.type.all()), [self.university])
+
+    def test_resume_skips_committed_rows(self):
+        path = self.write("schools.csv", "name\n" + "".join(f"School {i}\n" for i in range(5)))
+        state = path + ".import-state.json"
+        with open(state, "w") as state_file:
+            json.dump({"model": "schools", "offset": 3}, state_file)
+        with mock.patch("schools.services.catalog.rebuild_related_schools") as rebuild:
+            self.import_file(path, "--resume", "--chunk-size", "1")
+
+        self.assertEqual(sorted(School.objects.values_list("name", flat=True)), ["School 3", "School 4"])
+        # The rows of the interrupted run are not known, so every school is rebuilt
+        rebuild.assert_called_once_with()
+        self.assertFalse(os.path.exists(state))
+
+    def test_scholarships_and_organizations(self):
+        self.import_file(self.write("organizations.csv", "name,description,industry\nACME,Builds things,Education\n"),
+                         "--model", "organizations")
+        organization = Organization.objects.get(name="ACME")
+        self.assertEqual(organization.industry.name, "Education")
+
+        self.import_file(self.write("scholarships.jsonl", json.dumps(
+            {"name": "Merit Award", "provider": "ACME", "type": "Merit", "amount": "500", "renewable": True}
+        ) + "\n"), "--model", "scholarships")
+        scholarship = Scholarship.objects.get(name="Merit Award")
+        self.assertEqual((scholarship.type.name, scholarship.renewable), ("Merit", True))
+        self.assertTrue(scholarship.slug.startswith("merit-award-acme-"))
+
+        schools = self.write("schools.csv", f"name,organization\nACME School,{organization.uuid}\n")
+        self.import_file(schools)
+        self.assertEqual(School.objects.get(name="ACME School").organization, organization)
+
+    def test_export_round_trips_through_import(self):
+        school = School.objects.create(name="Royal University", location="11.56,104.92", tuition="99.50")
+        school.type.set([self.university])
+        for file_format in ("csv", "jsonl"):
+            path = os.path.join(self.directory.name, f"schools.{file_format}")
+            call_command("export_catalog", "schools", "--format", file_format, "--output", path, stdout=io.StringIO())
+            School.objects.filter(pk=school.pk).update(name="Renamed", tuition=0)
+            school.type.clear()
+            self.import_file(path)
+
+            school.refresh_from_db()
+            self.assertEqual((school.name, str(school.tuition)), ("Royal University", "99.50"))
+            self.assertEqual(list(school.type.all()), [self.university])
+
+
+class UploadTestCase(MediaTestCase):
+    """ Uploads go to a temporary MEDIA directory. """
+
+    def upload(self, width, height, mode="RGB"):
+        buffer = io.BytesIO()
+        Image.new(mode, (width, height), (255, 0, 0, 128)).save(buffer, format="PNG")
+        return SimpleUploadedFile("logo.png", buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class ImageRenditionTest(UploadTestCase):
+
+    def render(self, school):
+        return Template('{% load image_tags %}{% picture school.logo "card" sizes="50vw" alt="Logo" %}').render(
+            Context({"school": school}))
+
+    def test_renditions_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            school = School.objects.create(name="Royal University", logo=self.upload(1000, 600, "RGBA"))
+        # Nothing is generated before the commit, so the page still links the original
+        self.assertIn(f'src="{school.logo.url}"', self.render(school))
+        for callback in callbacks:
+            callback()
+
+        manifest = get_manifest(school.logo.name)
+        self.assertEqual({size: entry["width"] for size, entry in manifest["sizes"].items()},
+                         {"thumb": 160, "card": 480, "hero": 1000})
+        card = manifest["sizes"]["card"]
+        self.assertEqual((card["height"], card["webp"]), (288, rendition_name(school.logo.name, manifest["digest"], 480, "webp")))
+        with Image.open(os.path.join(self.media, card["webp"])) as image:
+            self.assertEqual((image.format, image.size, image.mode), ("WEBP", (480, 288), "RGBA"))
+
+        # One manifest lookup builds the src and every srcset
+        with mock.patch("main.images.cache.get", wraps=cache.get) as cache_get:
+            html = self.render(school)
+        self.assertEqual(cache_get.call_count, 1)
+        self.assertIn(f'src="{default_storage.url(card["webp"])}" width="480" height="288"', html)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(" 160w, ", html)
+        self.assertIn(" 1000w", html)
+
+    def test_small_images_are_not_upscaled_and_names_follow_content(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            school = School.objects.create(name="Small", logo=self.upload(120, 120))
+            other = School.objects.create(name="Other", logo=self.upload(120, 120))
+        manifest = get_manifest(school.logo.name)
+        self.assertEqual({entry["width"] for entry in manifest["sizes"].values()}, {120})
+        self.assertEqual(manifest["digest"], get_manifest(other.logo.name)["digest"])
+
+    def test_backfill_command(self):
+        school = School.objects.create(name="Royal University")
+        School.objects.filter(pk=school.pk).update(logo=default_storage.save("logos/old.png", self.upload(800, 800)))
+        out = io.StringIO()
+        call_command("generate_renditions", stdout=out)
+        self.assertIn("Generated renditions for 1 images", out.getvalue())
+        self.assertEqual(get_manifest("logos/old.png")["sizes"]["card"]["width"], 480)
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class UploadCleanupTest(UploadTestCase):
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def test_replaced_files_are_deleted_after_commit_without_a_select(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            school = School.objects.create(name="Royal University", logo=self.upload(400, 400))
+        old = school.logo.name
+        renditions = forget_renditions(old)
+        self.assertTrue(renditions and all(self.exists(name) for name in renditions))
+
+        school = School.objects.get(pk=school.pk)
+        school.logo = self.upload(300, 300)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks, \
+                CaptureQueriesContext(connection) as queries:
+            school.save()
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT") and '"schools_school"."logo"' in q["sql"]]
+        self.assertEqual(len(selects), 1)    # the "still referenced?" check, only because the logo changed
+        self.assertTrue(self.exists(old))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.exists(old))
+        self.assertFalse(any(self.exists(name) for name in renditions))
+        self.assertTrue(self.exists(school.logo.name))
+
+    def test_plain_save_does_not_query_or_delete(self):
+        school = School.objects.create(name="Royal University", logo=self.upload(100, 100))
+        school = School.objects.get(pk=school.pk)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            school.save(update_fields=["name"])
+        self.assertEqual([q for q in queries if '"schools_school"."logo" =' in q["sql"]], [])
+        self.assertTrue(self.exists(school.logo.name))
+
+    def test_rollback_keeps_files(self):
+        school = School.objects.create(name="Royal University", logo=self.upload(100, 100))
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    School.objects.get(pk=school.pk).delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertTrue(self.exists(school.logo.name))
+
+    def test_deletes_are_batched_and_shared_files_kept(self):
+        first = School.objects.create(name="First", logo=self.upload(100, 100))
+        second = School.objects.create(name="Second", cover_image=self.upload(100, 100))
+        third = School.objects.create(name="Third", logo=self.upload(100, 100))
+        shared = School.objects.create(name="Shared", logo=first.logo.name)
+        with mock.patch("main.files.delete_files") as delete_files, self.captureOnCommitCallbacks(execute=True):
+            School.objects.filter(pk__in=[first.pk, second.pk, third.pk]).delete()
+        delete_files.assert_called_once()
+        (files,), _kwargs = delete_files.call_args
+        self.assertEqual(set().union(*files.values()), {second.cover_image.name, third.logo.name})
+        self.assertTrue(self.exists(shared.logo.name))
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class MediaGarbageCollectorTest(UploadTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kept = School.objects.create(name="Kept", logo=self.upload(400, 400))
+            orphaned = School.objects.create(name="Orphaned", logo=self.upload(300, 300))
+        # A queryset update skips the signals, leaving the old logo and its renditions behind
+        self.orphans = [orphaned.logo.name] + forget_renditions(orphaned.logo.name)
+        School.objects.filter(pk=orphaned.pk).update(logo="")
+        self.orphans.append(default_storage.save("attachments/stray.pdf", io.BytesIO(b"%PDF")))
+        # QR codes have no file field; the current renderings of existing profiles are referenced
+        profile_uuid = User.objects.create_user(username="alice", password="correct-horse").profile.uuid
+        self.cached = default_storage.save(qr_name(profile_uuid, "svg"), io.BytesIO(b"<svg/>"))
+        self.orphans.append(default_storage.save(f"qr/{uuid.uuid4()}/deleted.svg", io.BytesIO(b"<svg/>")))
+        self.referenced = [self.kept.logo.name] + forget_renditions(self.kept.logo.name)
+
+    def gc(self, *args):
+        out = io.StringIO()
+        call_command("media_gc", "--min-age", "0", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_deleting(self):
+        output = self.gc("--dry-run", "-v", "2")
+        self.assertIn(f"Would delete {len(self.orphans)} of {len(self.orphans)} orphaned files", output)
+        self.assertIn("attachments/stray.pdf", output)
+        self.assertTrue(all(default_storage.exists(name) for name in self.orphans))
+
+    def test_deletes_only_unreferenced_files(self):
+        self.assertIn(f"Deleted {len(self.orphans)} of", self.gc("--batch-size", "2"))
+        self.assertFalse(any(default_storage.exists(name) for name in self.orphans))
+        self.assertTrue(all(default_storage.exists(name) for name in self.referenced + [self.cached]))
+
+    def test_recent_files_are_kept(self):
+        call_command("media_gc", stdout=io.StringIO())
+        self.assertTrue(all(default_storage.exists(name) for name in self.orphans))
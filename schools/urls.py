@@ -1,5 +1,5 @@
 from django.urls import path
-from schools.data import get_school_type_api, get_schools_list_data
+from schools.data import get_school_type_api
 from schools.views import base
 
 app_name = "schools"
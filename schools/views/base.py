@@ -1,6 +1,5 @@
 import uuid
 import logging
-from django.db.models import Q
 from typing import Any
 from django import forms
 from django.contrib import messages
@@ -14,7 +13,9 @@ from django.views.generic.edit import CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from schools.models.OnlineProfile import PlatformProfile
+from schools.models.related import RelatedSchool
 from schools.models.schoolsModel import School, SchoolType
+from schools.services.recommendations import RELATED_LIMIT
 
 logger = logging.getLogger(__name__)
 
@@ -85,29 +86,20 @@ class SchoolDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         school = context['school']
 
-        # Initialize coordinates and bbox
-        lat, lon = None, None
+        # Coordinates are parsed from ``location`` once, when the school is saved
+        lat, lon = school.latitude, school.longitude
         bbox = None
 
-        if school.location:
-            try:
-                lat_str, lon_str = school.location.split(',', 1)
-                lat = float(lat_str.strip())
-                lon = float(lon_str.strip())
-
-                # Validate coordinate ranges
-                if -90 <= lat <= 90 and -180 <= lon <= 180:
-                    # Precompute bbox with 6 decimal places
-                    bbox = {
-                        'min_lon': round(lon - 0.005, 6),
-                        'min_lat': round(lat - 0.003, 6),
-                        'max_lon': round(lon + 0.005, 6),
-                        'max_lat': round(lat + 0.003, 6),
-                    }
-                else:
-                    context['location_error'] = "Invalid latitude or longitude values."
-            except (ValueError, AttributeError):
-                context['location_error'] = "Invalid location format. Expected 'lat,lon'."
+        if lat is not None and lon is not None:
+            # Precompute bbox with 6 decimal places
+            bbox = {
+                'min_lon': round(lon - 0.005, 6),
+                'min_lat': round(lat - 0.003, 6),
+                'max_lon': round(lon + 0.005, 6),
+                'max_lat': round(lat + 0.003, 6),
+            }
+        elif school.location:
+            context['location_error'] = "Invalid location. Expected 'lat,lon' with valid coordinates."
         else:
             context['location_error'] = "No location data available."
 
@@ -117,7 +109,7 @@ class SchoolDetailView(DetailView):
         context['educational_levels'] = school.educational_levels.all()
         context['types'] = school.type.all()
         context['platforms'] = school.platforms.all()
-        context['platform_profiles'] = PlatformProfile.objects.filter(school=school)
+        context['platform_profiles'] = PlatformProfile.objects.filter(school=school).select_related('platform')
         context['title'] = "School Information"
         context['active'] = "active"
         context['page_name'] = "school"
@@ -125,16 +117,10 @@ class SchoolDetailView(DetailView):
         if school.cover_image:
             context['cover_image_url'] = self.request.build_absolute_uri(school.cover_image.url)
 
-        rec_qs = School.objects.exclude(id=school.id)
-        filters = Q()
-        if school.educational_levels.exists():
-            filters |= Q(educational_levels__in=school.educational_levels.all())
-        if school.type.exists():
-            filters |= Q(type__in=school.type.all())
-        if school.location:
-            filters |= Q(location=school.location)
-
-        context['related_items'] = rec_qs.filter(filters).distinct()[:6]
+        # Precomputed by schools.services.recommendations; one query on (school, -score)
+        related = (RelatedSchool.objects.filter(school=school, related__is_active=True)
+                   .select_related('related').order_by('-score')[:RELATED_LIMIT])
+        context['related_items'] = [entry.related for entry in related]
         return context
     
 
@@ -0,0 +1,238 @@
+"""
+ search/backends.py
+ Full-text search index for schools.
+
+ PostgreSQL keeps a weighted tsvector per school in ``search_school_document``
+ (GIN indexed); SQLite keeps an FTS5 virtual table ``search_school_fts``.
+ Any other database falls back to the plain ``icontains`` filters.
+
+ Both indexes split text into words on spaces and punctuation. Khmer, Thai
+ and the other scripts written without spaces between words end up as one
+ token per phrase, so queries in those scripts use ``icontains`` instead.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from schools.models.schoolsModel import School
+
+# Columns indexed for search and their relevance weight (A is the highest).
+SEARCH_FIELDS = (
+    ("name", "A"),
+    ("local_name", "A"),
+    ("short_name", "A"),
+    ("code", "A"),
+    ("founder", "B"),
+    ("president", "B"),
+    ("location", "C"),
+    ("motto", "C"),
+    ("description", "D"),
+)
+
+# bm25 column weights for the SQLite index, keyed by the weights above.
+BM25_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 2.0, "D": 1.0}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Thai, Lao, Myanmar, Khmer (and Khmer symbols), kana and CJK ideographs
+UNSEGMENTED_RE = re.compile(r"[\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u19e0-\u19ff\u3040-\u30ff\u3400-\u9fff]")
+
+
+def tokenize(query):
+    """ Split a raw search string into word tokens safe to embed in a full-text query. """
+    return TOKEN_RE.findall(query or "")
+
+
+def is_unsegmented(query):
+    """ True when ``query`` uses a script without spaces between words, which the word indexes cannot match. """
+    return bool(UNSEGMENTED_RE.search(query or ""))
+
+
+class IcontainsSearchBackend:
+    """ Unindexed fallback: OR of ``icontains`` lookups over every search field. """
+    vendor = None
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def index_schools(self, pks):
+        pass
+
+    def remove_schools(self, pks):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        filters = Q()
+        for field, _weight in SEARCH_FIELDS:
+            filters |= Q(**{f"{field}__icontains": query})
+        return queryset.filter(filters)
+
+
+class SQLiteSearchBackend(IcontainsSearchBackend):
+    """ FTS5 index ranked with bm25, used for local development. """
+    vendor = "sqlite"
+    table = "search_school_fts"
+
+    def install(self):
+        columns = ", ".join(field for field, _weight in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def uninstall(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index_schools(self, pks):
+        pks = list(pks)
+        if not pks:
+            return
+        columns = ", ".join(field for field, _weight in SEARCH_FIELDS)
+        placeholders = ", ".join(["%s"] * len(pks))
+        with connection.cursor() as cursor:
+            # FTS5 has no upsert, so replace the rows outright.
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", pks)
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM {School._meta.db_table} WHERE id IN ({placeholders})",
+                pks,
+            )
+
+    def remove_schools(self, pks):
+        pks = list(pks)
+        if not pks:
+            return
+        placeholders = ", ".join(["%s"] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", pks)
+
+    def rebuild(self):
+        columns = ", ".join(field for field, _weight in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM {School._meta.db_table}"
+            )
+
+    def match_expression(self, query):
+        """ AND together a prefix match for each token, e.g. ``"royal"* "univ"*`` """
+        return " ".join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        if is_unsegmented(query):
+            return super().search(queryset, query)
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        # bm25 returns lower-is-better scores; weights follow SEARCH_FIELDS order.
+        weights = ", ".join(str(BM25_WEIGHTS[weight]) for _field, weight in SEARCH_FIELDS)
+        school_table = School._meta.db_table
+        # Join the index table so MATCH drives the query and bm25 is computed once per hit.
+        return queryset.extra(
+            select={"search_rank": f"-bm25({self.table}, {weights})"},
+            tables=[self.table],
+            where=[f"{self.table} MATCH %s", f"{self.table}.rowid = {school_table}.id"],
+            params=[match],
+        ).order_by("-search_rank", "name")
+
+
+class PostgresSearchBackend(IcontainsSearchBackend):
+    """ Weighted tsvector per school with a GIN index, ranked with ts_rank. """
+    vendor = "postgresql"
+    table = "search_school_document"
+    config = "simple"
+
+    def install(self):
+        school_table = School._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"school_id bigint PRIMARY KEY REFERENCES {school_table} (id) "
+                f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING gin (document)"
+            )
+
+    def uninstall(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def document_queryset(self):
+        from django.contrib.postgres.search import SearchVector
+
+        vector = None
+        for field, weight in SEARCH_FIELDS:
+            part = SearchVector(field, weight=weight, config=self.config)
+            vector = part if vector is None else vector + part
+        return School.objects.order_by().annotate(document=vector).values_list("id", "document")
+
+    def upsert(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table} (school_id, document) {sql} "
+                f"ON CONFLICT (school_id) DO UPDATE SET document = EXCLUDED.document",
+                params,
+            )
+
+    def index_schools(self, pks):
+        pks = list(pks)
+        if pks:
+            self.upsert(self.document_queryset().filter(id__in=pks))
+
+    def remove_schools(self, pks):
+        pks = list(pks)
+        if not pks:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE school_id = ANY(%s)", [pks])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+        self.upsert(self.document_queryset())
+
+    def tsquery(self, query):
+        """ AND together a prefix match for each token, e.g. ``royal:* & univ:*`` """
+        return " & ".join(f"{token}:*" for token in tokenize(query))
+
+    def search(self, queryset, query):
+        if is_unsegmented(query):
+            return super().search(queryset, query)
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return queryset.none()
+        school_table = School._meta.db_table
+        return queryset.extra(
+            select={"search_rank": f"ts_rank({self.table}.document, to_tsquery(%s, %s))"},
+            select_params=(self.config, tsquery),
+            tables=[self.table],
+            where=[
+                f"{self.table}.document @@ to_tsquery(%s, %s)",
+                f"{self.table}.school_id = {school_table}.id",
+            ],
+            params=[self.config, tsquery],
+        ).order_by("-search_rank", "name")
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteSearchBackend, PostgresSearchBackend)
+}
+
+
+def get_search_backend():
+    """ Return the search backend matching the default database. """
+    return BACKENDS.get(connection.vendor, IcontainsSearchBackend)()
@@ -0,0 +1,78 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from schools.models.schoolsModel import School
+from search.backends import IcontainsSearchBackend, get_search_backend
+
+WORDS = (
+    "royal", "university", "phnom", "penh", "institute", "technology", "national",
+    "battambang", "siem", "reap", "kampot", "international", "school", "academy",
+    "science", "management", "economics", "law", "medicine", "agriculture",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the full-text search index with the icontains filters on generated schools. "
+        "The generated rows are rolled back when the benchmark finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000, help="Number of schools to generate.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+        parser.add_argument("--queries", default="royal,phnom penh,techno,kampot science",
+                            help="Comma separated search strings.")
+
+    def handle(self, *args, **options):
+        queries = [q.strip() for q in options["queries"].split(",") if q.strip()]
+        with transaction.atomic():
+            self.generate(options["count"])
+            backend = get_search_backend()
+            backend.rebuild()
+            for query in queries:
+                baseline = self.measure(IcontainsSearchBackend(), query, options["repeat"])
+                indexed = self.measure(backend, query, options["repeat"])
+                self.stdout.write(
+                    f"{query!r:20} icontains {baseline:8.2f} ms   "
+                    f"{type(backend).__name__} {indexed:8.2f} ms   "
+                    f"x{baseline / indexed if indexed else float('inf'):.1f}"
+                )
+            transaction.set_rollback(True)
+
+    def generate(self, count):
+        rng = random.Random(42)
+        # Filler vocabulary so descriptions look like prose rather than repeated keywords
+        filler = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+        batch = []
+        for i in range(count):
+            name = " ".join(rng.sample(WORDS, 3)).title()
+            batch.append(School(
+                name=name[:75],
+                short_name=f"S{i}",
+                code=f"BENCH{i}",
+                description=" ".join(rng.choices(filler, k=40) + rng.sample(WORDS, 2)),
+                founder=" ".join(rng.sample(WORDS, 2)).title(),
+                location=f"{rng.uniform(10, 14):.5f},{rng.uniform(102, 107):.5f}",
+                slug=f"bench-{i}",
+            ))
+            if len(batch) == 5000:
+                School.objects.bulk_create(batch)
+                batch = []
+        School.objects.bulk_create(batch)
+        self.stdout.write(f"Generated {count} schools.")
+
+    def measure(self, backend, query, repeat):
+        """ Median time in ms to fetch the first page and the total count, as the search view does. """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = backend.search(School.objects.all(), query)
+            list(queryset[:20])
+            queryset.count()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
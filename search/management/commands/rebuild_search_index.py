@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from search.backends import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for every school."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.install()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {type(backend).__name__}."))
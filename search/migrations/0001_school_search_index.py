@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Frozen copies of search.backends.SEARCH_FIELDS and the index tables, so this
+# migration keeps creating the same schema whatever the live backends become.
+SEARCH_FIELDS = (
+    ("name", "A"),
+    ("local_name", "A"),
+    ("short_name", "A"),
+    ("code", "A"),
+    ("founder", "B"),
+    ("president", "B"),
+    ("location", "C"),
+    ("motto", "C"),
+    ("description", "D"),
+)
+SQLITE_TABLE = "search_school_fts"
+POSTGRES_TABLE = "search_school_document"
+
+
+def install_search_index(apps, schema_editor):
+    school_table = schema_editor.quote_name(apps.get_model("schools", "School")._meta.db_table)
+    vendor = schema_editor.connection.vendor
+    columns = ", ".join(field for field, _weight in SEARCH_FIELDS)
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+            f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f"DELETE FROM {SQLITE_TABLE}")
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, {columns}) SELECT id, {columns} FROM {school_table}"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            f"school_id bigint PRIMARY KEY REFERENCES {school_table} (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin ON {POSTGRES_TABLE} USING gin (document)"
+        )
+        document = " || ".join(
+            f"setweight(to_tsvector('simple', coalesce({field}, '')), '{weight}')" for field, weight in SEARCH_FIELDS
+        )
+        schema_editor.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (school_id, document) SELECT id, {document} FROM {school_table} "
+            f"ON CONFLICT (school_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+
+def uninstall_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0006_schoolcustomizebutton'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
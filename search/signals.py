@@ -0,0 +1,21 @@
+""" Keep the school search index in sync with School rows """
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from schools.models.schoolsModel import School
+from search.backends import get_search_backend
+from search.suggest import suggest_index
+
+
+@receiver(post_save, sender=School)
+def index_school_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_schools([instance.pk])
+    suggest_index.update(instance)
+
+
+@receiver(post_delete, sender=School)
+def remove_school_on_delete(sender, instance, **kwargs):
+    get_search_backend().remove_schools([instance.pk])
+    suggest_index.remove(instance.pk)
@@ -0,0 +1,223 @@
+"""
+ search/suggest.py
+ In-memory autocomplete index for school names.
+
+ Each process keeps a sorted prefix list and a trigram map over ``name``,
+ ``local_name``, ``short_name`` and ``code``. The index is built from the
+ database on first use, patched from the School post_save/post_delete
+ signals, and rebuilt after ``SUGGEST_INDEX_MAX_AGE`` seconds so that
+ changes saved by other workers are eventually picked up.
+"""
+import bisect
+import heapq
+import math
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+from schools.models.schoolsModel import School
+
+SUGGEST_FIELDS = ("name", "local_name", "short_name", "code")
+ENTRY_FIELDS = ("id", "uuid", "slug") + SUGGEST_FIELDS
+
+# Scores used to order suggestions; trigram similarity scales below word prefixes.
+EXACT_SCORE = 100
+PREFIX_SCORE = 80
+WORD_PREFIX_SCORE = 60
+TRIGRAM_SCORE = 40
+MIN_TRIGRAM_SIMILARITY = 0.5
+# Stop collecting once this many schools matched; keeps very common prefixes cheap.
+MAX_CANDIDATES = 500
+
+
+def normalize(value):
+    """ Fold case and compatibility forms so Khmer and Latin input compare consistently. """
+    return " ".join(unicodedata.normalize("NFKC", str(value or "")).casefold().split())
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TermIndex:
+    """ Sorted distinct terms with the schools each term belongs to. """
+
+    def __init__(self):
+        self.term_pks = {}
+        self.sorted_terms = []
+
+    def add(self, term, pk, keep_sorted=False):
+        pks = self.term_pks.get(term)
+        created = pks is None
+        if created:
+            pks = self.term_pks[term] = set()
+            if keep_sorted:
+                bisect.insort(self.sorted_terms, term)
+            else:
+                self.sorted_terms.append(term)
+        pks.add(pk)
+        return created
+
+    def discard(self, term, pk):
+        """ Remove ``pk`` from ``term``; return True when the term is gone entirely. """
+        pks = self.term_pks[term]
+        pks.discard(pk)
+        if pks:
+            return False
+        del self.term_pks[term]
+        i = bisect.bisect_left(self.sorted_terms, term)
+        if i < len(self.sorted_terms) and self.sorted_terms[i] == term:
+            del self.sorted_terms[i]
+        return True
+
+    def sort(self):
+        self.sorted_terms.sort()
+
+    def with_prefix(self, prefix):
+        terms = self.sorted_terms
+        for i in range(bisect.bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                break
+            yield terms[i]
+
+
+class SchoolSuggestIndex:
+    """ Prefix and trigram lookups over school names, kept entirely in memory. """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """ Drop everything; the next lookup rebuilds from the database. """
+        with self.lock:
+            self.entries = {}             # pk -> public fields returned to clients
+            self.terms = {}               # pk -> (values, words) indexed for that school
+            self.values = TermIndex()     # whole normalized field values
+            self.words = TermIndex()      # individual words of those values
+            self.trigram_map = {}         # trigram -> words containing it
+            self.built_at = None
+
+    def get_max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, "SUGGEST_INDEX_MAX_AGE", 300)
+
+    def ensure_built(self):
+        if self.built_at is None:
+            with self.build_lock:
+                if self.built_at is None:
+                    self.build()
+        elif time.monotonic() - self.built_at > self.get_max_age():
+            # Only one thread refreshes a stale index; the others keep serving it.
+            if self.build_lock.acquire(blocking=False):
+                try:
+                    self.build()
+                finally:
+                    self.build_lock.release()
+
+    def build(self):
+        """ Load every active school into a fresh index, then swap it in. """
+        fresh = type(self)(max_age=self.max_age)
+        rows = School.objects.filter(is_active=True).values(*ENTRY_FIELDS).iterator(chunk_size=2000)
+        for row in rows:
+            fresh._add(row)
+        fresh.values.sort()
+        fresh.words.sort()
+        with self.lock:
+            self.entries = fresh.entries
+            self.terms = fresh.terms
+            self.values = fresh.values
+            self.words = fresh.words
+            self.trigram_map = fresh.trigram_map
+            self.built_at = time.monotonic()
+
+    def _add(self, row, keep_sorted=False):
+        pk = row["id"]
+        values = {normalize(row[field]) for field in SUGGEST_FIELDS} - {""}
+        words = {word for value in values for word in value.split()}
+        self.entries[pk] = dict(row, uuid=str(row["uuid"]))
+        self.terms[pk] = (values, words)
+        for value in values:
+            self.values.add(value, pk, keep_sorted)
+        for word in words:
+            if self.words.add(word, pk, keep_sorted):
+                for gram in trigrams(word):
+                    self.trigram_map.setdefault(gram, set()).add(word)
+
+    def _remove(self, pk):
+        values, words = self.terms.pop(pk, ((), ()))
+        for value in values:
+            self.values.discard(value, pk)
+        for word in words:
+            if self.words.discard(word, pk):
+                for gram in trigrams(word):
+                    gram_words = self.trigram_map[gram]
+                    gram_words.discard(word)
+                    if not gram_words:
+                        del self.trigram_map[gram]
+        self.entries.pop(pk, None)
+
+    def update(self, school):
+        """ Re-index one school after it was saved. """
+        with self.lock:
+            if self.built_at is None:
+                return
+            self._remove(school.pk)
+            if school.is_active:
+                self._add({field: getattr(school, field) for field in ENTRY_FIELDS}, keep_sorted=True)
+
+    def remove(self, pk):
+        with self.lock:
+            if self.built_at is not None:
+                self._remove(pk)
+
+    def suggest(self, query, limit=10):
+        """ Return up to ``limit`` entries for ``query``, best match first. """
+        query = normalize(query)
+        if not query:
+            return []
+        self.ensure_built()
+        with self.lock:
+            scores = {}
+            self.collect(scores, self.values.with_prefix(query), self.values.term_pks,
+                         lambda term: EXACT_SCORE if term == query else PREFIX_SCORE)
+            self.collect(scores, self.words.with_prefix(query), self.words.term_pks,
+                         lambda term: WORD_PREFIX_SCORE)
+            if len(scores) < limit and len(query) >= 3:
+                fuzzy = self.fuzzy(query)
+                self.collect(scores, sorted(fuzzy, key=fuzzy.get, reverse=True), self.words.term_pks, fuzzy.get)
+
+            ranked = heapq.nsmallest(limit, scores, key=lambda pk: (-scores[pk], self.entries[pk]["name"]))
+            return [self.entries[pk] for pk in ranked]
+
+    def collect(self, scores, terms, term_pks, score):
+        """ Give every school of each term its score, keeping the first (best) score per school. """
+        for term in terms:
+            term_score = score(term)
+            for pk in term_pks[term]:
+                if len(scores) >= MAX_CANDIDATES:
+                    return
+                scores.setdefault(pk, term_score)
+
+    def fuzzy(self, query):
+        """ Map words sharing enough trigrams with ``query`` to their trigram score. """
+        postings = sorted((self.trigram_map.get(gram, set()) for gram in trigrams(query)), key=len)
+        needed = math.ceil(len(postings) * MIN_TRIGRAM_SIMILARITY)
+        # A word sharing ``needed`` trigrams must appear in one of the rarest
+        # ``len - needed + 1`` posting lists, so only those are scanned for candidates.
+        candidates = set().union(*postings[:len(postings) - needed + 1])
+        results = {}
+        for word in candidates:
+            shared = sum(1 for words in postings if word in words)
+            if shared >= needed:
+                results[word] = TRIGRAM_SCORE * shared / len(postings)
+        return results
+
+
+suggest_index = SchoolSuggestIndex()
@@ -1,3 +1,102 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from schools.models.schoolsModel import School
+from search.backends import get_search_backend
+from search.suggest import suggest_index
+
+
+class SchoolSearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.royal = School.objects.create(name="Royal University of Phnom Penh", short_name="RUPP")
+        self.other = School.objects.create(name="Institute of Technology",
+                                           description="Founded with royal patronage")
+        School.objects.create(name="Battambang Teacher College")
+
+    def search(self, query):
+        return list(get_search_backend().search(School.objects.all(), query))
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("royal"), [self.royal, self.other])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self.search("phn univ"), [self.royal])
+        self.assertEqual(self.search("rupp"), [self.royal])
+
+    def test_index_follows_save_and_delete(self):
+        self.other.name = "Royal Academy"
+        self.other.save()
+        self.assertEqual(self.search("academy"), [self.other])
+
+        self.royal.delete()
+        self.assertEqual(self.search("royal"), [self.other])
+
+    def test_khmer_substring_matches(self):
+        school = School.objects.create(name="សាកលវិទ្យាល័យភូមិន្ទភ្នំពេញ")
+        self.assertEqual(self.search("ភ្នំពេញ"), [school])
+
+    def test_punctuation_only_query_returns_nothing(self):
+        self.assertEqual(self.search("%'\""), [])
+
+    def test_search_view_count(self):
+        response = self.client.get(reverse("search:search_schools"), {"q": "royal"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["search_count"], 2)
+        self.assertEqual(list(response.context["schools"]), [self.royal, self.other])
+
+
+class SchoolSuggestTest(TestCase):
+
+    def setUp(self):
+        suggest_index.clear()
+        self.rupp = School.objects.create(name="Royal University of Phnom Penh", short_name="RUPP",
+                                          local_name="សាកលវិទ្យាល័យភូមិន្ទភ្នំពេញ")
+        self.rua = School.objects.create(name="Royal University of Agriculture", short_name="RUA")
+        self.itc = School.objects.create(name="Institute of Technology of Cambodia", code="ITC")
+
+    def names(self, query, **kwargs):
+        return [entry["name"] for entry in suggest_index.suggest(query, **kwargs)]
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.names("roy"), [self.rua.name, self.rupp.name])
+        self.assertEqual(self.names("rupp"), [self.rupp.name])
+        self.assertEqual(self.names("cambo"), [self.itc.name])
+        self.assertEqual(self.names("សាកល"), [self.rupp.name])
+
+    def test_exact_match_ranks_first(self):
+        School.objects.create(name="ITC Alumni School")
+        self.assertEqual(self.names("itc")[0], self.itc.name)
+
+    def test_fuzzy_match(self):
+        self.assertEqual(self.names("tecnology"), [self.itc.name])
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.names("roy"), [self.rua.name, self.rupp.name])
+        self.rua.name = "National University of Agriculture"
+        self.rua.save()
+        self.rupp.delete()
+        self.assertEqual(self.names("roy"), [])
+        self.assertEqual(self.names("nation"), ["National University of Agriculture"])
+
+    def test_suggest_endpoint(self):
+        response = self.client.get("/api/v1/schools/suggest/", {"q": "royal", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry["short_name"] for entry in response.json()], ["RUA"])
+
+
+class AsyncSearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(25):
+            School.objects.create(name=f"Royal College {i:02d}")
+        School.objects.create(name="Institute of Technology")
+
+    async def test_async_pagination(self):
+        response = await self.async_client.get(reverse("search:search_schools"), {"q": "royal", "page": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["search_count"], 25)
+        self.assertEqual(len(response.context["schools"]), 5)
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertContains(response, "Royal College")
@@ -1,40 +1,53 @@
-from django.db.models import Q
-from django.views.generic import ListView
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.shortcuts import render
+from django.views import View
 from schools.models.schoolsModel import School
+from search.backends import get_search_backend
 import logging
 
 logger = logging.getLogger(__name__)
 
-class SchoolListSearchView(ListView):
+class SchoolListSearchView(View):
+    """
+    Search results page, 20 schools per page.
+
+    The count and the page are fetched with the async ORM; the template is
+    then rendered in a worker thread because the base layout reads the
+    session user lazily, which is a synchronous query.
+    """
     template_name = 'pages/search.html'
-    model = School
     paginate_by = 20
-    context_object_name = 'schools'  # optional: for clarity in templates
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Only the columns the result cards display
+        queryset = School.objects.only("pk", "name", "local_name", "short_name", "logo")
         query = self.request.GET.get("q")
 
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(local_name__icontains=query) |
-                Q(short_name__icontains=query) |
-                Q(code__icontains=query) |
-                Q(description__icontains=query) |
-                Q(founder__icontains=query) |
-                Q(president__icontains=query) |
-                Q(location__icontains=query) |
-                Q(motto__icontains=query)
-            ).distinct()
+            # Ranked full-text search; best matches first
+            queryset = get_search_backend().search(queryset, query)
 
         return queryset
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        query = self.request.GET.get("q", "")
-        context["page_title"] = f"'{query}'" if query else "Search for Schools"
-        context["active"] = "active"
-        context["search_count"] = self.get_queryset().count()
-        context["query"] = query  # so you can prefill the search box in the template
-        return context
\ No newline at end of file
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        paginator = Paginator(queryset, self.paginate_by)
+        # Paginator.count is a cached_property; fill it without the synchronous COUNT
+        paginator.count = await queryset.acount()
+        page = paginator.get_page(request.GET.get("page"))
+        page.object_list = [school async for school in page.object_list]
+
+        query = request.GET.get("q", "")
+        context = {
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+            "schools": page.object_list,
+            "object_list": page.object_list,
+            "page_title": f"'{query}'" if query else "Search for Schools",
+            "active": "active",
+            "search_count": paginator.count,
+            "query": query,  # so you can prefill the search box in the template
+        }
+        return await sync_to_async(render)(request, self.template_name, context)
@@ -0,0 +1,85 @@
+"""
+ user/aggregate.py
+ The whole profile graph, loaded with a fixed number of queries and cached
+ as one unit per profile UUID.
+
+ ``ProfileAggregate.get`` runs one query for the profile and its user, one
+ per child list (experiences with organizations, educations with
+ institutions, skills, languages, contacts with platforms) and one for the
+ letter, however many rows there are. The receivers in ``user.signal``
+ delete the cached aggregate when the profile, its user or one of its child
+ rows changes, and bump the ``profile_references`` generation when a shared
+ Organization, School or Platform does.
+"""
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from main.cache import get_generations
+from user.models import Education, Experience, Letter, Profile, ProfileContact
+
+REFERENCES_GENERATION = "profile_references"
+
+
+def aggregate_key(profile_uuid, generation):
+    return f"profile_aggregate:{profile_uuid}:{generation}"
+
+
+def invalidate_profile(profile_uuid):
+    """ Drop the cached aggregate of one profile (every generation is keyed by the current one). """
+    generation = get_generations(REFERENCES_GENERATION)[REFERENCES_GENERATION]
+    cache.delete(aggregate_key(profile_uuid, generation))
+
+
+@dataclass
+class ProfileAggregate:
+    profile: Profile
+    letter: Letter = None
+    experiences: list = field(default_factory=list)
+    educations: list = field(default_factory=list)
+    skills: list = field(default_factory=list)
+    languages: list = field(default_factory=list)
+    contacts: list = field(default_factory=list)
+
+    @property
+    def public_contacts(self):
+        return [contact for contact in self.contacts if contact.privacy == ProfileContact.PrivacyChoices.PUBLIC]
+
+    @classmethod
+    def load(cls, profile_uuid):
+        """ Fetch the aggregate from the database; raises ``Profile.DoesNotExist``. """
+        profile = (
+            Profile.objects.select_related("user")
+            .prefetch_related(
+                Prefetch("experience_set", queryset=Experience.objects.select_related("organization")),
+                Prefetch("education_set", queryset=Education.objects.select_related("institution")),
+                "skill_set",
+                "language_set",
+                Prefetch("contact_profiles", queryset=ProfileContact.objects.select_related("platform")),
+            )
+            .get(uuid=profile_uuid)
+        )
+        # Letters are ordered newest first; the profile shows the latest one
+        letter = Letter.objects.filter(user_id=profile.user_id).first()
+        return cls(
+            profile=profile,
+            letter=letter,
+            experiences=list(profile.experience_set.all()),
+            educations=list(profile.education_set.all()),
+            skills=list(profile.skill_set.all()),
+            languages=list(profile.language_set.all()),
+            contacts=list(profile.contact_profiles.all()),
+        )
+
+    @classmethod
+    def get(cls, profile_uuid):
+        """ The cached aggregate of ``profile_uuid``, loading it on a miss; raises ``Profile.DoesNotExist``. """
+        generation = get_generations(REFERENCES_GENERATION)[REFERENCES_GENERATION]
+        key = aggregate_key(profile_uuid, generation)
+        aggregate = cache.get(key)
+        if aggregate is None:
+            aggregate = cls.load(profile_uuid)
+            cache.set(key, aggregate, getattr(settings, "PROFILE_AGGREGATE_CACHE_TIMEOUT", 60 * 60))
+        return aggregate
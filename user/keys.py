@@ -0,0 +1,105 @@
+""" JWT signing and verification keys, parsed once and reloaded when key files change """
+import os
+import threading
+
+from django.conf import settings
+from jwcrypto import jwk
+
+
+def parse_pem(data):
+    """ Parse a PEM key and tag it with its RFC 7638 thumbprint as ``kid``. """
+    key = jwk.JWK.from_pem(data)
+    key.update(kid=key.thumbprint())
+    return key
+
+
+def parse_jwks(data):
+    """ Parse a JWKS document; keys without a ``kid`` get their thumbprint. """
+    keyset = jwk.JWKSet.from_json(data)
+    for key in keyset:
+        if not key.get("kid"):
+            key.update(kid=key.thumbprint())
+    return keyset
+
+
+class KeyFile:
+    """ A key file parsed on first use and parsed again only when its mtime changes. """
+
+    def __init__(self, path, parser):
+        self.path = path
+        self.parser = parser
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.value = None
+
+    def get(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self.mtime:
+            with self.lock:
+                if mtime != self.mtime:
+                    with open(self.path, 'rb') as f:
+                        self.value = self.parser(f.read())
+                    self.mtime = mtime
+        return self.value
+
+
+class KeyManager:
+    """
+    Hands out parsed JWK objects for signing and verifying tokens.
+
+    Keys come from ``settings.PRIVATE_KEY``/``PUBLIC_KEY`` when they are set,
+    otherwise from ``JWT_PRIVATE_KEY_PATH``/``JWT_PUBLIC_KEY_PATH``. Extra
+    verification keys (e.g. the previous key during a rotation) can be listed
+    in the JWKS file at ``JWT_JWKS_PATH``; tokens are matched to keys by ``kid``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.static_keys = {}
+        self.keyset_cache = None
+
+    def _key_file(self, path, parser):
+        key_file = self.files.get((path, parser))
+        if key_file is None:
+            with self.lock:
+                key_file = self.files.setdefault((path, parser), KeyFile(path, parser))
+        return key_file
+
+    def _static_key(self, pem):
+        key = self.static_keys.get(pem)
+        if key is None:
+            key = self.static_keys[pem] = parse_pem(pem)
+        return key
+
+    def _load(self, pem, path):
+        if pem:
+            return self._static_key(pem)
+        return self._key_file(path, parse_pem).get()
+
+    def signing_key(self):
+        return self._load(settings.PRIVATE_KEY, settings.JWT_PRIVATE_KEY_PATH)
+
+    def public_key(self):
+        return self._load(settings.PUBLIC_KEY, settings.JWT_PUBLIC_KEY_PATH)
+
+    def verification_keys(self):
+        """ Return a JWKSet with the current public key plus any keys from ``JWT_JWKS_PATH``. """
+        public_key = self.public_key()
+        jwks_path = getattr(settings, 'JWT_JWKS_PATH', None)
+        extra = self._key_file(jwks_path, parse_jwks).get() if jwks_path else None
+
+        # Parsed keys are only replaced when a file changes, so identity is enough here.
+        cached = self.keyset_cache
+        if cached and cached[0] is public_key and cached[1] is extra:
+            return cached[2]
+        keyset = jwk.JWKSet()
+        keyset.add(public_key)
+        for key in extra or ():
+            if key.get("kid") != public_key.get("kid"):
+                keyset.add(key)
+        self.keyset_cache = (public_key, extra, keyset)
+        return keyset
+
+
+key_manager = KeyManager()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from user.models import Profile, User
+
+
+class Command(BaseCommand):
+    help = "Create the missing Profile of every user that does not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Profiles created per INSERT.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # Read the ids up front so the inserts below do not change the rows being iterated
+        user_ids = list(User.objects.filter(profile__isnull=True).order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(user_ids), batch_size):
+            Profile.objects.bulk_create(
+                [Profile(user_id=user_id) for user_id in user_ids[start:start + batch_size]],
+                ignore_conflicts=True,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Created {len(user_ids)} missing profiles."))
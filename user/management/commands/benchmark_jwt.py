@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from jwcrypto import jwk, jwt
+
+from user.keys import KeyManager
+from user.token_cache import VerifiedTokenCache
+
+
+class Command(BaseCommand):
+    help = ("Measure JWT signs/verifies per second, parsing the PEM on every call vs. the cached KeyManager, "
+            "and repeated verifies of one token through the verified-token cache.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each measurement.")
+
+    def handle(self, *args, **options):
+        seconds = options["seconds"]
+        key = jwk.JWK.generate(kty="RSA", size=2048)
+        with tempfile.TemporaryDirectory() as tmp:
+            private_path = os.path.join(tmp, "private_key.pem")
+            public_path = os.path.join(tmp, "public_key.pem")
+            with open(private_path, "wb") as f:
+                f.write(key.export_to_pem(private_key=True, password=None))
+            with open(public_path, "wb") as f:
+                f.write(key.export_to_pem())
+
+            with override_settings(PRIVATE_KEY=b"", PUBLIC_KEY=b"", JWT_JWKS_PATH=None,
+                                   JWT_PRIVATE_KEY_PATH=private_path, JWT_PUBLIC_KEY_PATH=public_path):
+                manager = KeyManager()
+                token_cache = VerifiedTokenCache()
+                token = self.sign(manager.signing_key())
+
+                def sign_uncached():
+                    with open(private_path, "rb") as f:
+                        self.sign(jwk.JWK.from_pem(f.read()))
+
+                def verify_uncached():
+                    with open(public_path, "rb") as f:
+                        jwt.JWT(jwt=token, key=jwk.JWK.from_pem(f.read()))
+
+                def verify_cached():
+                    keys = manager.verification_keys()
+                    if token_cache.get(token, keys) is None:
+                        token_cache.set(token, jwt.JWT(jwt=token, key=keys).claims, keys)
+
+                results = [
+                    ("sign", self.rate(sign_uncached, seconds),
+                     self.rate(lambda: self.sign(manager.signing_key()), seconds)),
+                    ("verify", self.rate(verify_uncached, seconds),
+                     self.rate(lambda: jwt.JWT(jwt=token, key=manager.verification_keys()), seconds)),
+                    ("verify (token cache)", self.rate(verify_uncached, seconds), self.rate(verify_cached, seconds)),
+                ]
+
+        for name, before, after in results:
+            self.stdout.write(f"{name:20} parse per call {before:9.0f}/s   cached {after:9.0f}/s   x{after / before:.1f}")
+
+    def sign(self, key):
+        token = jwt.JWT(header={"alg": "RS256", "kid": key.get("kid")}, claims={"user": "benchmark"})
+        token.make_signed_token(key)
+        return token.serialize()
+
+    def rate(self, func, seconds):
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            func()
+            count += 1
+        return count / (time.perf_counter() - start)
@@ -0,0 +1,91 @@
+import statistics
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from user.models import User
+from user.throttling import LoginThrottle
+
+
+def throttle_keys(idents, times):
+    """ Cache keys of the ``LoginThrottle`` windows of ``{scope: [ident, ...]}`` around ``times``. """
+    return [
+        key
+        for window in LoginThrottle().windows()
+        for ident in idents.get(window.scope, [])
+        for now in times
+        for key in window.keys(ident, now)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire a burst of bad-password logins at user_login through a fixed pool of worker threads "
+        "and report how long each request holds a worker, plus the latency of a legitimate login "
+        "sent in the middle of the burst. Two throwaway users are created and deleted again, and only "
+        "their throttle counters (and those of the burst's addresses) are removed from the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attempts", type=int, default=200, help="Bad-password requests in the burst.")
+        parser.add_argument("--workers", type=int, default=4, help="Worker threads, like a gunicorn pool.")
+        parser.add_argument("--ips", type=int, default=4, help="Client addresses the burst is spread over.")
+
+    def handle(self, *args, **options):
+        attempts, workers = options["attempts"], options["workers"]
+        suffix = uuid.uuid4().hex[:8]
+        victim = User.objects.create_user(username=f"bench-victim-{suffix}", password="correct-horse")
+        legit = User.objects.create_user(username=f"bench-legit-{suffix}", password="correct-horse")
+        url = reverse("profiles:login")
+        ips = [f"10.0.0.{i + 1}" for i in range(options["ips"])]
+        # The cache may be shared with sessions and other caches, so never clear() it
+        idents = {"username": [victim.username, legit.username], "ip": [*ips, "10.1.0.1"]}
+        started = time.time()
+
+        def post(username, password, ip):
+            start = time.perf_counter()
+            try:
+                response = Client().post(url, {"username": username, "password": password}, REMOTE_ADDR=ip)
+                return response.status_code, time.perf_counter() - start
+            finally:
+                connections.close_all()
+
+        try:
+            cache.delete_many(throttle_keys(idents, [started]))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                start = time.perf_counter()
+                burst = [
+                    pool.submit(post, victim.username, "wrong", ips[i % len(ips)])
+                    for i in range(attempts // 2)
+                ]
+                legit_future = pool.submit(post, legit.username, "correct-horse", "10.1.0.1")
+                burst += [
+                    pool.submit(post, victim.username, "wrong", ips[i % len(ips)])
+                    for i in range(attempts // 2, attempts)
+                ]
+                results = [future.result() for future in burst]
+                elapsed = time.perf_counter() - start
+            legit_status, legit_latency = legit_future.result()
+        finally:
+            # Both ends, in case the burst crossed into another bucket
+            cache.delete_many(throttle_keys(idents, [started, time.time()]))
+            User.objects.filter(pk__in=[victim.pk, legit.pk]).delete()
+
+        statuses = Counter(status for status, _ in results)
+        durations = [duration for _, duration in results]
+        # The old view slept 1 + <failed attempts so far> seconds before every check.
+        legacy_seconds = sum(1 + i for i in range(attempts))
+        self.stdout.write(f"burst: {attempts} requests on {workers} workers in {elapsed:.2f}s "
+                          f"({dict(sorted(statuses.items()))})")
+        self.stdout.write(f"worker time per request: mean {statistics.mean(durations) * 1000:.1f} ms, "
+                          f"max {max(durations) * 1000:.1f} ms, total {sum(durations):.2f}s")
+        self.stdout.write(f"legitimate login during burst: HTTP {legit_status} in {legit_latency * 1000:.1f} ms")
+        self.stdout.write(f"time.sleep throttling would have held workers for at least {legacy_seconds}s "
+                          f"({legacy_seconds / workers:.0f}s of wall time on {workers} workers)")
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from user.models import User
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Count database writes and session reads per request for a signed-in user, with the old "
+        "db backend + SESSION_SAVE_EVERY_REQUEST and with the current session settings. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Page views per configuration.")
+        parser.add_argument("--path", default=None, help="Path to request (defaults to the home page).")
+
+    def handle(self, *args, **options):
+        path = options["path"] or reverse("home")
+        legacy_middleware = [
+            "django.contrib.sessions.middleware.SessionMiddleware"
+            if name == "user.middleware.session.RefreshingSessionMiddleware" else name
+            for name in settings.MIDDLEWARE
+        ]
+        configurations = [
+            ("db + SESSION_SAVE_EVERY_REQUEST", dict(
+                SESSION_ENGINE="django.contrib.sessions.backends.db",
+                SESSION_SAVE_EVERY_REQUEST=True,
+                MIDDLEWARE=legacy_middleware,
+            )),
+            ("current settings", {}),
+        ]
+        with transaction.atomic():
+            user = User.objects.create_user(username="benchmark-sessions", password="benchmark")
+            for label, overrides in configurations:
+                with override_settings(**overrides):
+                    writes, session_reads = self.measure(user, path, options["requests"])
+                requests = options["requests"]
+                self.stdout.write(
+                    f"{label:32} writes/request {writes / requests:5.2f}   "
+                    f"session SELECTs/request {session_reads / requests:5.2f}"
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, user, path, requests):
+        client = Client()
+        client.force_login(user)
+        client.get(path)  # warm up templates and the session cache
+        counts = {"writes": 0, "session_reads": 0}
+
+        def count(execute, sql, params, many, context):
+            statement = sql.lstrip().upper()
+            if statement.startswith(WRITE_STATEMENTS):
+                counts["writes"] += 1
+            elif statement.startswith("SELECT") and "DJANGO_SESSION" in statement:
+                counts["session_reads"] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            for _ in range(requests):
+                client.get(path)
+        return counts["writes"], counts["session_reads"]
@@ -0,0 +1,29 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions in small batches, so the purge never holds a long lock on "
+        "django_session. Meant to run periodically (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Sessions deleted per statement.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by("expire_date")
+        deleted = 0
+        while True:
+            keys = list(expired.values_list("session_key", flat=True)[:options["batch_size"]])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions."))
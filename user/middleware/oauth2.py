@@ -0,0 +1,43 @@
+""" OAuth2 bearer token middleware that also runs natively under ASGI """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth import authenticate
+from django.utils.cache import patch_vary_headers
+from oauth2_provider.middleware import OAuth2TokenMiddleware as BaseOAuth2TokenMiddleware
+
+
+class OAuth2TokenMiddleware(BaseOAuth2TokenMiddleware):
+    """
+    ``oauth2_provider``'s ``OAuth2TokenMiddleware``, async capable.
+
+    The upstream class is sync only, which makes Django run the whole
+    middleware chain, and the async views behind it, on one sync thread per
+    request. Requests without a bearer token pass straight through; with one,
+    the user lookup and token check run in ``sync_to_async``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if request.META.get("HTTP_AUTHORIZATION", "").startswith("Bearer"):
+            await sync_to_async(authenticate_bearer)(request)
+        response = await self.get_response(request)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+def authenticate_bearer(request):
+    """ Same rule as the upstream middleware: only replace an anonymous (or missing) user. """
+    if not hasattr(request, "user") or request.user.is_anonymous:
+        user = authenticate(request=request)
+        if user:
+            request.user = request._cached_user = user
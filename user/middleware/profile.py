@@ -1,12 +1,29 @@
 """ User Profile middleware """
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 # Internal import
-from user.models import Profile
+from user.models import Profile, User
 
 
-class EnsureProfileMiddleware(MiddlewareMixin):
-    def process_request(self, request):
+def get_profile(request):
+    """ Load the profile of ``request.user`` with its user in one query, or None. """
+    if not hasattr(request, '_cached_profile'):
+        profile = None
         if request.user.is_authenticated:
-            user = request.user
-            # Use get_or_create to ensure a profile exists
-            Profile.objects.get_or_create(user=user)
\ No newline at end of file
+            profile = Profile.objects.select_related('user').filter(user_id=request.user.pk).first()
+            if profile is not None:
+                # Let ``request.user.profile`` (e.g. in templates) reuse it
+                User.profile.related.set_cached_value(request.user, profile)
+        request._cached_profile = profile
+    return request._cached_profile
+
+
+class LazyProfileMiddleware(MiddlewareMixin):
+    """
+    Adds ``request.profile``, loaded on first access only.
+
+    Profiles are created by the ``create_or_update_profile`` signal; users
+    created before it existed are covered by ``manage.py backfill_profiles``.
+    """
+    def process_request(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
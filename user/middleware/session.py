@@ -0,0 +1,26 @@
+""" Session middleware that refreshes the expiry only once per refresh window """
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+REFRESHED_AT_KEY = '_session_refreshed_at'
+
+
+class RefreshingSessionMiddleware(SessionMiddleware):
+    """
+    Drop-in replacement for ``SessionMiddleware`` used with
+    ``SESSION_SAVE_EVERY_REQUEST = False``.
+
+    A session that was read but not modified is saved again, which bumps its
+    expiry and cookie, only when its last save is older than
+    ``SESSION_REFRESH_WINDOW`` seconds. Every other request skips the write.
+    """
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(time.time())
+            window = getattr(settings, 'SESSION_REFRESH_WINDOW', 15 * 60)
+            if session.modified or now - session.get(REFRESHED_AT_KEY, 0) >= window:
+                session[REFRESHED_AT_KEY] = now
+        return super().process_response(request, response)
@@ -5,7 +5,6 @@ import pytz
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext as _
-from django.core.files.storage import default_storage
 from schools.models.OnlineProfile import Platform
 from schools.models.schoolsModel import School
 from organization.models import Organization
@@ -46,14 +45,6 @@ class Attachment(models.Model):
         
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        if not self.is_used():
-            if self.file:
-                if default_storage.exists(self.file.name):
-                    default_storage.delete(self.file.name)
-        
-        super().delete(*args, **kwargs)
-
     def is_used(self):
         # Check if the attachment is being used in any other models (e.g., Education, Experience, etc.)
         from django.db.models import Q
@@ -97,12 +88,6 @@ class Profile(models.Model):
 
     objects = models.Manager()
 
-    def delete(self, *args, **kwargs):
-        # Check if the photo field has an associated file
-        if self.photo and self.photo.name:
-            self.photo.delete(save=False)
-        super().delete(*args, **kwargs)
-
     def __str__(self):
         user_first_name = self.user.first_name if self.user.first_name else self.user.username
         user_last_name = self.user.last_name if self.user.last_name else ""
@@ -0,0 +1,87 @@
+""" QR codes linking to public profiles, rendered once and kept in the default storage """
+import hashlib
+import io
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from user.models import Profile
+
+# Bump when the rendering changes; it is part of the stored name, the ETag and the page's image URL
+QR_VERSION = 1
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+URL_NAMES = {
+    "png": "profiles:profile_qr_png",
+    "svg": "profiles:profile_qr_svg",
+}
+
+
+def public_profile_url(profile_uuid):
+    """
+    Absolute URL of a public profile on ``SITE_URL``. It never comes from the
+    request's Host header, so clients cannot make the QR codes encode (and
+    store) arbitrary hosts.
+    """
+    path = reverse("profiles:public_profile", kwargs={"id": profile_uuid})
+    return settings.SITE_URL.rstrip("/") + path
+
+
+def qr_digest(data, fmt):
+    """ Identifies one rendering of ``data``; used as the stored file name and the ETag. """
+    return hashlib.sha256(f"{QR_VERSION}:{fmt}:{data}".encode()).hexdigest()
+
+
+def qr_tag(profile_uuid, fmt):
+    """ Short digest of the current rendering, versioning the image URL so a new SITE_URL gets a new URL. """
+    return qr_digest(public_profile_url(profile_uuid), fmt)[:16]
+
+
+def qr_url(profile_uuid, fmt="png"):
+    """ Image URL for pages; it changes with the rendering, so it may be cached as immutable. """
+    return reverse(URL_NAMES[fmt], kwargs={"uuid": profile_uuid}) + f"?v={qr_tag(profile_uuid, fmt)}"
+
+
+def qr_name(profile_uuid, fmt):
+    """ Stored name of the current rendering; the profile UUID prefix lets media_gc find stale ones. """
+    return f"qr/{profile_uuid}/{qr_digest(public_profile_url(profile_uuid), fmt)}.{fmt}"
+
+
+def render_qr(data, fmt):
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qrcode.make(data).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def get_qr(profile_uuid, fmt):
+    """ Bytes of the QR code of a public profile, rendered on the first request and read back from storage after. """
+    name = qr_name(profile_uuid, fmt)
+    if default_storage.exists(name):
+        with default_storage.open(name, "rb") as stored:
+            return stored.read()
+    content = render_qr(public_profile_url(profile_uuid), fmt)
+    # A concurrent request may have stored it meanwhile; the renderings are identical either way
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    return content
+
+
+def stored_qr_files():
+    """
+    ``(storage, name)`` of the current rendering of every profile's QR codes,
+    for ``main.files.referenced_files``. Renderings of deleted profiles, or of
+    an older ``QR_VERSION`` or ``SITE_URL``, are not listed, so media_gc
+    collects them.
+    """
+    for profile_uuid in Profile.objects.values_list("uuid", flat=True).iterator(chunk_size=5000):
+        for fmt in QR_FORMATS:
+            yield default_storage, qr_name(profile_uuid, fmt)
@@ -2,7 +2,15 @@
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 # Internal app modules import
-from .models import User, Profile
+from main.cache import bump_generation
+from main.files import register_references, track_file_fields
+from main.images import watch_image_fields
+from organization.models import Organization
+from schools.models.OnlineProfile import Platform
+from schools.models.schoolsModel import School
+from .aggregate import REFERENCES_GENERATION, invalidate_profile
+from .models import Attachment, Education, Experience, Language, Letter, Profile, ProfileContact, Skill, User
+from .qr import stored_qr_files
 
 
 @receiver(post_save, sender=User)
@@ -11,18 +19,58 @@ def create_or_update_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
     else:
-        instance.profile.save()
+        try:
+            instance.profile.save()
+        except Profile.DoesNotExist:
+            Profile.objects.create(user=instance)
         
-@receiver(post_delete, sender=Profile)
-def auto_delete_file_on_delete(sender, instance, **kwargs):
-    """ Deletes file from filesystem when corresponding `Profile` object is deleted. """
-    if instance.photo:
-        instance.photo.delete(save=False)
-    
 @receiver(post_delete, sender=User)
 def auto_delete_profile_on_delete_user(sender, instance, **kwargs):
     """ Deletes `Profile` object when corresponding `User` object is deleted. """
     try:
         instance.profile.delete()
     except Profile.DoesNotExist:
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_aggregate(sender, instance, **kwargs):
+    """ Drop the cached ``ProfileAggregate`` of a changed profile. """
+    invalidate_profile(instance.uuid)
+
+
+@receiver([post_save, post_delete], sender=Experience)
+@receiver([post_save, post_delete], sender=Education)
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Language)
+def invalidate_profile_aggregate_of_child(sender, instance, **kwargs):
+    for profile_uuid in Profile.objects.filter(pk=instance.user_id).values_list("uuid", flat=True):
+        invalidate_profile(profile_uuid)
+
+
+@receiver([post_save, post_delete], sender=ProfileContact)
+def invalidate_profile_aggregate_of_contact(sender, instance, **kwargs):
+    for profile_uuid in Profile.objects.filter(pk=instance.profile_id).values_list("uuid", flat=True):
+        invalidate_profile(profile_uuid)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Letter)
+def invalidate_profile_aggregate_of_user(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    for profile_uuid in Profile.objects.filter(user_id=user_id).values_list("uuid", flat=True):
+        invalidate_profile(profile_uuid)
+
+
+@receiver([post_save, post_delete], sender=Organization)
+@receiver([post_save, post_delete], sender=School)
+@receiver([post_save, post_delete], sender=Platform)
+def bump_profile_references_generation(sender, **kwargs):
+    """ Organizations, schools and platforms are shared by many profiles; retire every cached aggregate. """
+    bump_generation(REFERENCES_GENERATION)
+
+
+track_file_fields(Profile, "photo")
+track_file_fields(Attachment, "file")
+register_references(stored_qr_files)
+watch_image_fields(Profile, "photo")
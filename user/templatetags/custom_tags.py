@@ -7,15 +7,13 @@ import pytz
 from django import template
 from django.utils.timezone import activate, localtime
 
-from user.models import Profile
-
 register = template.Library()
 
 
 @register.filter
 def greeting(user):
     """ Greeting based on user's local time """
-    user_profile = Profile.objects.get(user=user)
+    user_profile = user.profile
     user_timezone = pytz.timezone(user_profile.timezone)
 
     # Activate user's time zone
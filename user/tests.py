@@ -0,0 +1,624 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from jwcrypto import jwk
+from jwcrypto.jwt import JWTMissingKey
+from oauth2_provider.models import AccessToken, Application
+
+from main.cache import TieredCache, redis_url
+from main.database import parse_connection_string, pool_mode, postgres_settings
+from main.instrumentation import QueryBudgetExceeded, RequestMetricsMiddleware
+from main.testing import MediaTestCase
+from organization.models import Organization
+from schools.models.OnlineProfile import Platform, PlatformProfile
+from schools.models.schoolsModel import Scholarship, School, SchoolType
+from user.aggregate import ProfileAggregate
+from user.keys import key_manager
+from user.middleware.oauth2 import OAuth2TokenMiddleware
+from user.middleware.profile import LazyProfileMiddleware
+from user.middleware.session import REFRESHED_AT_KEY
+from user.management.commands.benchmark_login_throttle import throttle_keys
+from user.models import Experience, Letter, Profile, ProfileContact, Skill, User
+from user.qr import qr_name, qr_url, render_qr
+from user.throttling import SlidingWindow
+from user.token_cache import VerifiedTokenCache, token_cache, token_revoked
+from user.views import utils
+from user.views.utils import generate_jwt, verify_jwt
+
+
+class KeyManagerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.private_path = os.path.join(self.tmp, "private_key.pem")
+        self.public_path = os.path.join(self.tmp, "public_key.pem")
+        self.jwks_path = os.path.join(self.tmp, "jwks.json")
+        settings = override_settings(PRIVATE_KEY=b"", PUBLIC_KEY=b"", JWT_JWKS_PATH=None,
+                                     JWT_PRIVATE_KEY_PATH=self.private_path,
+                                     JWT_PUBLIC_KEY_PATH=self.public_path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_key(self, key, mtime):
+        with open(self.private_path, "wb") as f:
+            f.write(key.export_to_pem(private_key=True, password=None))
+        with open(self.public_path, "wb") as f:
+            f.write(key.export_to_pem())
+        os.utime(self.private_path, ns=(mtime, mtime))
+        os.utime(self.public_path, ns=(mtime, mtime))
+
+    def test_keys_are_parsed_once(self):
+        self.write_key(jwk.JWK.generate(kty="RSA", size=2048), mtime=1)
+        self.assertIs(key_manager.signing_key(), key_manager.signing_key())
+        self.assertIs(key_manager.verification_keys(), key_manager.verification_keys())
+        token = generate_jwt({"user": "alice"})
+        self.assertEqual(json.loads(verify_jwt(token)), {"user": "alice"})
+
+    def test_rotation_with_jwks(self):
+        old_key = jwk.JWK.generate(kty="RSA", size=2048)
+        self.write_key(old_key, mtime=1)
+        old_token = generate_jwt({"user": "alice"})
+
+        new_key = jwk.JWK.generate(kty="RSA", size=2048)
+        self.write_key(new_key, mtime=2)
+        new_token = generate_jwt({"user": "bob"})
+        self.assertEqual(key_manager.signing_key().thumbprint(), new_key.thumbprint())
+        self.assertEqual(json.loads(verify_jwt(new_token)), {"user": "bob"})
+        with self.assertRaises(JWTMissingKey):
+            verify_jwt(old_token)
+
+        # Keep accepting tokens signed with the previous key while they expire
+        old_public = jwk.JWK.from_json(old_key.export_public())
+        with open(self.jwks_path, "w") as f:
+            f.write(json.dumps({"keys": [json.loads(old_public.export_public())]}))
+        with override_settings(JWT_JWKS_PATH=self.jwks_path):
+            self.assertEqual(json.loads(verify_jwt(old_token)), {"user": "alice"})
+            self.assertEqual(json.loads(verify_jwt(new_token)), {"user": "bob"})
+
+
+class VerifiedTokenCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.keys = object()
+        self.cache = VerifiedTokenCache(max_size=2, max_ttl=300)
+
+    def test_entries_expire_with_the_token(self):
+        self.cache.set("a", json.dumps({"exp": time.time() + 60}), self.keys)
+        self.cache.set("b", json.dumps({"exp": time.time() - 1}), self.keys)
+        self.assertIsNotNone(self.cache.get("a", self.keys))
+        self.assertIsNone(self.cache.get("b", self.keys))
+
+    def test_least_recently_used_entry_is_dropped(self):
+        for token in ("a", "b"):
+            self.cache.set(token, "{}", self.keys)
+        self.cache.get("a", self.keys)
+        self.cache.set("c", "{}", self.keys)
+        self.assertIsNone(self.cache.get("b", self.keys))
+        self.assertEqual(self.cache.get("a", self.keys), "{}")
+
+    def test_changed_keys_drop_cached_tokens(self):
+        self.cache.set("a", "{}", self.keys)
+        self.assertIsNone(self.cache.get("a", object()))
+
+    def test_verify_jwt_uses_cache_until_revoked(self):
+        key = jwk.JWK.generate(kty="RSA", size=2048)
+        with override_settings(PRIVATE_KEY=key.export_to_pem(private_key=True, password=None),
+                               PUBLIC_KEY=key.export_to_pem()):
+            token = generate_jwt({"user": "alice", "exp": int(time.time()) + 60})
+            with mock.patch.object(utils.jwt, "JWT", wraps=utils.jwt.JWT) as jwt_class:
+                verify_jwt(token)
+                verify_jwt(token)
+                self.assertEqual(jwt_class.call_count, 1)
+                token_revoked.send(sender=None, token=token)
+                verify_jwt(token)
+                self.assertEqual(jwt_class.call_count, 2)
+        token_cache.clear()
+
+
+@override_settings(LOGIN_THROTTLE_RATES={"username": (3, 300), "ip": (5, 300)})
+class LoginThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        User.objects.create_user(username="alice", password="correct-horse")
+        # Pin the clock mid-bucket so a test never straddles a bucket boundary
+        clock = mock.patch("user.throttling.time.time", return_value=1_000_050.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def login(self, username, password, ip="10.0.0.1"):
+        return self.client.post(reverse("profiles:login"), {"username": username, "password": password},
+                                REMOTE_ADDR=ip)
+
+    def test_username_is_throttled_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.login("alice", "wrong").status_code, 200)
+        response = self.login("alice", "correct-horse", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_ip_is_throttled_across_usernames(self):
+        for i in range(5):
+            self.login(f"user{i}", "wrong")
+        self.assertEqual(self.login("alice", "correct-horse").status_code, 429)
+        self.assertEqual(self.login("alice", "correct-horse", ip="10.0.0.2").status_code, 302)
+
+    def test_success_resets_username_window(self):
+        for _ in range(2):
+            self.login("alice", "wrong")
+        self.assertEqual(self.login("alice", "correct-horse").status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self.login("alice", "wrong")
+        self.assertEqual(self.login("alice", "correct-horse").status_code, 302)
+
+    def test_previous_bucket_slides_out(self):
+        window = SlidingWindow("username", limit=4, window=100)
+        for _ in range(8):
+            window.hit("bob", now=1050)
+        self.assertEqual(window.retry_after("bob", now=1099), 1 + 50)
+        # Next bucket: 8 hits weighted by the 90% that still overlaps the window
+        self.assertEqual(window.retry_after("bob", now=1110), 40)
+        self.assertEqual(window.retry_after("bob", now=1151), 0)
+
+    def test_benchmark_deletes_only_its_throttle_keys(self):
+        cache.set("unrelated", "kept")
+        window = SlidingWindow("ip", limit=20, window=300)
+        window.hit("10.0.0.1", now=1_000_050.0)
+        cache.delete_many(throttle_keys({"ip": ["10.0.0.1"]}, [1_000_050.0]))
+        self.assertEqual(window.counts("10.0.0.1", now=1_000_050.0), (0, 0))
+        self.assertEqual(cache.get("unrelated"), "kept")
+
+
+class LazyProfileTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+
+    def test_profile_is_loaded_only_when_read(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with self.assertNumQueries(0):
+            LazyProfileMiddleware(lambda request: None).process_request(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.profile.user_id, self.user.pk)
+            self.assertEqual(request.profile.user.username, "alice")
+            self.assertEqual(request.user.profile.pk, request.profile.pk)
+
+    def test_add_contact_without_profile_is_not_found(self):
+        platform = Platform.objects.create(name="Telegram", short_name="Te")
+        data = {"platform": platform.pk, "username": "alice", "profile_url": "https://t.me/alice", "privacy": 0}
+        self.client.force_login(self.user)
+        Profile.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.post(reverse("profiles:add_contact"), data).status_code, 404)
+        self.assertFalse(ProfileContact.objects.exists())
+
+    def test_backfill_creates_missing_profiles(self):
+        Profile.objects.filter(user=self.user).delete()
+        other = User.objects.create_user(username="bob", password="correct-horse")
+        call_command("backfill_profiles", batch_size=1, stdout=StringIO())
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        self.assertEqual(Profile.objects.filter(user=other).count(), 1)
+
+
+class OAuth2TokenMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+
+    async def test_bearer_token_under_asgi(self):
+        application = await Application.objects.acreate(
+            name="app", client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS)
+        await AccessToken.objects.acreate(user=self.user, application=application, token="bearer-token",
+                                          scope="read", expires=timezone.now() + timezone.timedelta(hours=1))
+
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = OAuth2TokenMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get("/", headers={"authorization": "Bearer bearer-token"})
+        request.user = AnonymousUser()
+        response = await middleware(request)
+        self.assertEqual(request.user, self.user)
+        self.assertIn("Authorization", response["Vary"])
+
+
+@override_settings(SESSION_REFRESH_WINDOW=600)
+class RefreshingSessionTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+        self.client.force_login(self.user)
+
+    def session_writes(self, now):
+        session = self.client.session
+        session[REFRESHED_AT_KEY] = 1000
+        session.save()
+        store = type(session)
+        with mock.patch("user.middleware.session.time.time", return_value=now), \
+                mock.patch.object(store, "save", autospec=True, side_effect=store.save) as save:
+            self.client.get(reverse("home"))
+        return save.call_count
+
+    def test_expiry_is_refreshed_once_per_window(self):
+        self.assertEqual(self.session_writes(now=1000 + 599), 0)
+        self.assertEqual(self.session_writes(now=1000 + 600), 1)
+        self.assertEqual(self.client.session[REFRESHED_AT_KEY], 1600)
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        past = timezone.now() - timezone.timedelta(days=1)
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{i}", session_data="", expire_date=past) for i in range(5)]
+        )
+        call_command("purge_sessions", batch_size=2, stdout=StringIO())
+        self.assertFalse(Session.objects.filter(expire_date__lt=timezone.now()).exists())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class HomePageFragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.university = SchoolType.objects.create(type="University")
+        School.objects.create(name="Royal University", location="11.5564,104.9282").type.add(self.university)
+
+    def test_anonymous_home_page_is_served_from_cache(self):
+        self.assertContains(self.client.get(reverse("home")), "Royal University")
+        with self.assertNumQueries(0):
+            self.client.get(reverse("home"))
+
+    def test_signals_invalidate_fragments(self):
+        self.client.get(reverse("home"))
+        School.objects.create(name="Institute of Technology")
+        SchoolType.objects.create(type="Institute")
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Institute of Technology")
+        self.assertContains(response, "Institute")
+
+    def test_fragments_vary_by_type_filter(self):
+        self.client.get(reverse("home"))
+        School.objects.filter(name="Royal University").update(name="Renamed")  # no signal
+        response = self.client.get(reverse("home_type", args=["University"]))
+        self.assertContains(response, "Renamed")
+        self.assertContains(self.client.get(reverse("home")), "Royal University")
+
+
+class ScholarshipListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Scholarship(name="Erasmus Mundus", local_name="Erasmus").save()
+
+    async def test_async_scholarship_list(self):
+        response = await self.async_client.get(reverse("scholarships"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s.name for s in response.context["scholarships"]], ["Erasmus Mundus"])
+        self.assertContains(response, "Erasmus Mundus")
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def make_cache(self, location="tiered-test"):
+        return TieredCache("test", {"OPTIONS": {
+            "LOCAL_TIMEOUT": 60,
+            "REMOTE": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": location},
+        }})
+
+    def setUp(self):
+        self.cache = self.make_cache()
+        self.addCleanup(self.cache.clear)
+
+    def test_local_tier_serves_recent_values(self):
+        self.cache.set("school:1", "Royal University")
+        self.cache.remote.delete("school:1")
+        self.assertEqual(self.cache.get("school:1"), "Royal University")
+        self.cache.local.clear()
+        self.assertIsNone(self.cache.get("school:1"))
+
+    def test_excluded_keys_and_counters_skip_local_tier(self):
+        self.cache.set("login_throttle:ip:1", 3)
+        self.cache.remote.set("login_throttle:ip:1", 4)
+        self.assertEqual(self.cache.get("login_throttle:ip:1"), 4)
+        self.cache.set("generation:schools", 1)
+        self.assertEqual(self.cache.incr("generation:schools"), 2)
+        self.assertEqual(self.cache.get("generation:schools"), 2)
+
+    def test_get_or_set_computes_once_across_processes(self):
+        # Two backends sharing one remote stand in for two worker processes
+        caches = [self.cache, self.make_cache()]
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_set("expensive", compute)))
+                   for c in caches * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_redis_url_from_azure_connection_string(self):
+        self.assertEqual(redis_url("example.redis.cache.windows.net:6380,password=a/b=,ssl=True,abortConnect=False"),
+                         "rediss://:a%2Fb%3D@example.redis.cache.windows.net:6380/0")
+        self.assertEqual(redis_url("redis://localhost:6379/1"), "redis://localhost:6379/1")
+
+
+class DatabaseSettingsTest(SimpleTestCase):
+    CONNECTION_STRING = "dbname=edu host=db.example.com port=5432 sslmode=require user=app password='p@ss word'"
+
+    def settings(self, extra="", pool_installed=True):
+        with mock.patch("main.database.has_psycopg_pool", return_value=pool_installed):
+            return postgres_settings(f"{self.CONNECTION_STRING} {extra}".strip())
+
+    def test_libpq_parameters(self):
+        database = self.settings(pool_installed=False)
+        self.assertEqual((database["NAME"], database["HOST"], database["PASSWORD"]), ("edu", "db.example.com", "p@ss word"))
+        self.assertEqual(database["OPTIONS"], {"sslmode": "require"})
+
+    def test_psycopg_pool_by_default(self):
+        database = self.settings("pool_max_size=20")
+        self.assertEqual(database["OPTIONS"]["pool"], {"min_size": 2, "max_size": 20, "timeout": 10.0})
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertEqual(pool_mode(database), "psycopg")
+
+    def test_persistent_without_psycopg_pool(self):
+        database = self.settings("conn_max_age=120", pool_installed=False)
+        self.assertEqual((database["CONN_MAX_AGE"], database["CONN_HEALTH_CHECKS"]), (120, True))
+        self.assertNotIn("pool", database["OPTIONS"])
+        self.assertEqual(pool_mode(database), "persistent")
+        with self.assertRaises(ImproperlyConfigured):
+            self.settings("pool=psycopg", pool_installed=False)
+
+    def test_pgbouncer_mode(self):
+        database = self.settings("pool=pgbouncer")
+        self.assertTrue(database["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertIsNone(database["OPTIONS"]["prepare_threshold"])
+        self.assertEqual(pool_mode(database), "pgbouncer")
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.settings("pool=magic")
+        with self.assertRaises(ImproperlyConfigured):
+            parse_connection_string("dbname=edu garbage")
+
+
+@override_settings(QUERY_BUDGETS_STRICT=True)
+class RequestMetricsTest(TestCase):
+    """ Query budgets of the main pages; a new N+1 makes these requests raise QueryBudgetExceeded. """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+        Letter.objects.create(user=self.user, title="Cover letter", content="Hello")
+        university = SchoolType.objects.create(type="University")
+        self.schools = [School.objects.create(name=f"School {i}", location="11.5564,104.9282") for i in range(5)]
+        for school in self.schools:
+            school.type.add(university)
+        # Several related rows per page, so a per-row query shows up as a budget overrun
+        platforms = [Platform.objects.create(name=name, short_name=name[:2]) for name in ("Facebook", "Telegram", "X")]
+        for platform in platforms:
+            PlatformProfile.objects.create(school=self.schools[0], platform=platform, username="school")
+            ProfileContact.objects.create(profile=self.user.profile, platform=platform, username="alice")
+        for year in (2020, 2021, 2022):
+            Experience.objects.create(user=self.user.profile, title=f"Teacher {year}", responsibilities="Teaching",
+                                      start_date=date(year, 1, 1), end_date=date(year, 12, 31))
+
+    def test_home_within_budget_and_server_timing(self):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.metrics.view, "home")
+        self.assertGreater(response.metrics.queries, 0)
+        self.assertGreater(response.metrics.cache_misses, 0)
+        self.assertIn('sql;desc="', response["Server-Timing"])
+        # The fragments are cached now
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.metrics.queries, 0)
+        self.assertEqual(response.metrics.cache_misses, 0)
+        self.assertGreater(response.metrics.cache_hits, 0)
+
+    def test_signed_in_home_with_session_refresh_within_budget(self):
+        self.client.get(reverse("home"))  # warm the fragments
+        self.client.force_login(self.user)
+        session = self.client.session
+        session[REFRESHED_AT_KEY] = 0
+        session.save()
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.client.session[REFRESHED_AT_KEY], 0)
+
+    def test_school_detail_within_budget(self):
+        response = self.client.get(reverse("schools:school-detail", args=[self.schools[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.metrics.view, "schools:school-detail")
+
+    def test_profile_within_budget(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("profiles:profile"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.metrics.view, "profiles:profile")
+
+    def test_over_budget_raises(self):
+        with override_settings(QUERY_BUDGETS={"home": 0}), self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("home"))
+
+    def test_log_line(self):
+        with self.assertLogs("main.instrumentation", "INFO") as logs:
+            self.client.get(reverse("schools:school-detail", args=[self.schools[0].pk]))
+        fields = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(fields["view"], "schools:school-detail")
+        self.assertEqual(fields["status"], 200)
+        self.assertGreater(fields["queries"], 0)
+
+    @override_settings(MIDDLEWARE=["main.instrumentation.RequestMetricsMiddleware"])
+    async def test_async_view_queries_are_counted(self):
+        # Alone in MIDDLEWARE, the chain stays async and the view's queries run on a sync_to_async thread
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(self.async_view)))
+        response = await self.async_client.get(reverse("api:schools-view"))
+        self.assertEqual(response.metrics.view, "api:schools-view")
+        self.assertGreater(response.metrics.queries, 0)
+        with override_settings(QUERY_BUDGETS={"api:schools-view": 0}), self.assertRaises(QueryBudgetExceeded):
+            await self.async_client.get(reverse("api:schools-view"))
+
+    async def async_view(self, request):
+        pass
+
+
+class ProfileQRTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+        self.url = reverse("profiles:profile_qr_png", args=[self.user.profile.uuid])
+        self.versioned_url = qr_url(self.user.profile.uuid)
+
+    def test_png_is_stored_and_immutable(self):
+        with mock.patch("user.qr.render_qr", wraps=render_qr) as render:
+            first = self.client.get(self.versioned_url)
+            second = self.client.get(self.versioned_url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first["Content-Type"], "image/png")
+        self.assertTrue(first.content.startswith(b"\x89PNG"))
+        self.assertEqual(first.content, second.content)
+        self.assertIn("immutable", first["Cache-Control"])
+        self.assertEqual(os.listdir(os.path.join(self.media, "qr", str(self.user.profile.uuid))),
+                         [os.path.basename(qr_name(self.user.profile.uuid, "png"))])
+
+    def test_etag_revalidation_skips_the_database(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(SITE_URL="https://edu.example.org")
+    def test_encodes_site_url_whatever_the_host(self):
+        with mock.patch("user.qr.render_qr", wraps=render_qr) as render:
+            etag = self.client.get(self.url)["ETag"]
+            for host in ("example.com", "attacker.example"):
+                self.assertEqual(self.client.get(self.url, HTTP_HOST=host)["ETag"], etag)
+        public_url = reverse("profiles:public_profile", args=[self.user.profile.uuid])
+        render.assert_called_once_with(f"https://edu.example.org{public_url}", "png")
+        self.assertEqual(len(os.listdir(os.path.join(self.media, "qr", str(self.user.profile.uuid)))), 1)
+
+    def test_new_site_url_gets_a_new_image_url(self):
+        with override_settings(SITE_URL="https://edu.example.org"):
+            old_url = qr_url(self.user.profile.uuid)
+            old_etag = self.client.get(old_url)["ETag"]
+        self.assertNotEqual(self.versioned_url, old_url)
+        # Only the current rendering's URL may be kept forever; others revalidate and get the new ETag
+        response = self.client.get(old_url, headers={"if-none-match": old_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+        self.assertEqual(self.client.get(self.url)["Cache-Control"], "public, no-cache")
+
+    def test_media_gc_collects_stale_renderings(self):
+        self.client.get(self.url)
+        other = User.objects.create_user(username="bob", password="correct-horse")
+        self.client.get(reverse("profiles:profile_qr_svg", args=[other.profile.uuid]))
+        stale = default_storage.save(f"qr/{self.user.profile.uuid}/old.png", ContentFile(b"png"))
+        deleted = qr_name(other.profile.uuid, "svg")
+        other.profile.delete()
+        call_command("media_gc", "--min-age", "0", stdout=StringIO())
+        self.assertTrue(default_storage.exists(qr_name(self.user.profile.uuid, "png")))
+        self.assertFalse(default_storage.exists(stale))
+        self.assertFalse(default_storage.exists(deleted))
+
+    def test_svg_and_unknown_profile(self):
+        response = self.client.get(reverse("profiles:profile_qr_svg", args=[self.user.profile.uuid]))
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", response.content)
+        self.assertEqual(self.client.get(reverse("profiles:profile_qr_png", args=[uuid.uuid4()])).status_code, 404)
+
+    def test_profile_page_links_to_the_image(self):
+        Letter.objects.create(user=self.user, title="Cover letter", content="Hello")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("profiles:profile"))
+        self.assertContains(response, f'src="{self.versioned_url}"')
+        self.assertNotContains(response, "data:image/png;base64")
+
+
+class ProfileAggregateTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="alice", password="correct-horse")
+        self.profile = self.user.profile
+        self.organization = Organization.objects.create(name="Ministry", description="")
+        platforms = [Platform.objects.create(name=name, short_name=name[:2]) for name in ("Facebook", "Telegram")]
+        for year in (2020, 2021, 2022):
+            Experience.objects.create(user=self.profile, title=f"Teacher {year}", organization=self.organization,
+                                      responsibilities="Teaching", start_date=date(year, 1, 1),
+                                      end_date=date(year, 12, 31))
+            Skill.objects.create(user=self.profile, name=f"Skill {year}")
+        ProfileContact.objects.create(profile=self.profile, platform=platforms[0], username="public")
+        ProfileContact.objects.create(profile=self.profile, platform=platforms[1], username="private",
+                                      privacy=ProfileContact.PrivacyChoices.PRIVATE)
+        Letter.objects.create(user=self.user, title="Cover letter", content="Hello")
+
+    def test_fixed_number_of_queries(self):
+        # profile + user, five child lists, letter
+        with self.assertNumQueries(7):
+            aggregate = ProfileAggregate.load(self.profile.uuid)
+        with self.assertNumQueries(0):
+            self.assertEqual([e.organization.name for e in aggregate.experiences], ["Ministry"] * 3)
+            self.assertEqual([c.platform.name for c in aggregate.contacts], ["Facebook", "Telegram"])
+            self.assertEqual(aggregate.letter.content, "Hello")
+            self.assertEqual(aggregate.profile.user.username, "alice")
+        self.assertEqual([c.username for c in aggregate.public_contacts], ["public"])
+
+    def test_cached_and_invalidated_by_children(self):
+        ProfileAggregate.get(self.profile.uuid)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(ProfileAggregate.get(self.profile.uuid).skills), 3)
+        Skill.objects.create(user=self.profile, name="Khmer typing")
+        self.assertEqual(len(ProfileAggregate.get(self.profile.uuid).skills), 4)
+        Letter.objects.create(user=self.user, title="New letter", content="Updated")
+        self.assertEqual(ProfileAggregate.get(self.profile.uuid).letter.content, "Updated")
+        self.organization.name = "Ministry of Education"
+        self.organization.save()
+        self.assertEqual(ProfileAggregate.get(self.profile.uuid).experiences[0].organization.name,
+                         "Ministry of Education")
+
+    def test_public_page_shows_public_contacts(self):
+        response = self.client.get(reverse("profiles:public_profile", args=[self.profile.uuid]))
+        self.assertContains(response, "Facebook")
+        self.assertNotContains(response, "Telegram")
+        self.assertEqual(self.client.get(reverse("profiles:public_profile", args=[uuid.uuid4()])).status_code, 404)
+
+    def test_profile_without_letter_is_not_found(self):
+        Letter.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(reverse("profiles:public_profile", args=[self.profile.uuid])).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("profiles:profile")).status_code, 404)
@@ -0,0 +1,111 @@
+""" Sliding-window throttling of failed logins per username and per client IP """
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_RATES = {
+    "username": (5, 300),   # failed attempts allowed per window (seconds)
+    "ip": (20, 300),
+}
+
+
+def get_client_ip(request):
+    """ Client address, read from ``LOGIN_THROTTLE_IP_HEADER`` when running behind a proxy. """
+    header = getattr(settings, "LOGIN_THROTTLE_IP_HEADER", None)
+    value = request.META.get(header) if header else None
+    if value:
+        return value.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+class SlidingWindow:
+    """
+    Approximate sliding window counter stored in the cache.
+
+    Hits are counted in fixed buckets of ``window`` seconds; the current
+    estimate is the current bucket plus the previous bucket weighted by how
+    much of it still overlaps the window. Each check is one ``get_many`` and
+    each hit one ``add`` + ``incr``, so nothing blocks the request thread.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def keys(self, ident, now):
+        digest = hashlib.sha256(str(ident).casefold().encode()).hexdigest()
+        bucket = int(now // self.window)
+        return (f"login_throttle:{self.scope}:{digest}:{bucket - 1}",
+                f"login_throttle:{self.scope}:{digest}:{bucket}")
+
+    def counts(self, ident, now):
+        previous_key, current_key = self.keys(ident, now)
+        values = cache.get_many([previous_key, current_key])
+        return values.get(previous_key, 0), values.get(current_key, 0)
+
+    def retry_after(self, ident, now=None):
+        """ Seconds until another attempt is allowed, or 0 when ``ident`` is not throttled. """
+        now = time.time() if now is None else now
+        previous, current = self.counts(ident, now)
+        elapsed = now % self.window
+        overlap = 1 - elapsed / self.window
+        if previous * overlap + current < self.limit:
+            return 0
+        if current < self.limit:
+            # Wait for enough of the previous bucket to slide out of the window
+            wait = self.window * (1 - (self.limit - current) / previous) - elapsed
+        else:
+            # Wait for the next bucket, then for the current one to slide out in turn
+            wait = self.window - elapsed + self.window * (1 - self.limit / current)
+        return max(1, math.ceil(wait))
+
+    def hit(self, ident, now=None):
+        now = time.time() if now is None else now
+        _previous_key, current_key = self.keys(ident, now)
+        cache.add(current_key, 0, timeout=self.window * 2)
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            # The key expired between add() and incr()
+            cache.set(current_key, 1, timeout=self.window * 2)
+
+    def reset(self, ident, now=None):
+        now = time.time() if now is None else now
+        cache.delete_many(self.keys(ident, now))
+
+
+class LoginThrottle:
+    """ Failed-login windows per username and per IP, configured by ``LOGIN_THROTTLE_RATES``. """
+
+    def windows(self):
+        rates = getattr(settings, "LOGIN_THROTTLE_RATES", DEFAULT_RATES)
+        return [SlidingWindow(scope, limit, window) for scope, (limit, window) in rates.items()]
+
+    def idents(self, request, username):
+        return {"username": username or "", "ip": get_client_ip(request)}
+
+    def retry_after(self, request, username):
+        """ Seconds the client must wait before trying again; 0 when it may try now. """
+        idents = self.idents(request, username)
+        now = time.time()
+        return max([w.retry_after(idents[w.scope], now) for w in self.windows()], default=0)
+
+    def failure(self, request, username):
+        idents = self.idents(request, username)
+        now = time.time()
+        for window in self.windows():
+            window.hit(idents[window.scope], now)
+
+    def success(self, request, username):
+        # Only the account's counter is cleared; one good login must not unlock an IP that is guessing
+        now = time.time()
+        for window in self.windows():
+            if window.scope == "username":
+                window.reset(username or "", now)
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,88 @@
+""" Bounded LRU cache of verified JWT claims, so repeated bearer tokens skip the RS256 check """
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.dispatch import Signal, receiver
+
+# Send with ``token=<raw token>`` when a token is revoked to drop it from the cache.
+token_revoked = Signal()
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """
+    Maps sha256(token) to its verified claims until the token's ``exp``.
+
+    Entries are capped at ``JWT_VERIFY_CACHE_SIZE`` (least recently used are
+    dropped first) and never live longer than ``JWT_VERIFY_CACHE_TTL``
+    seconds. The whole cache is dropped when the verification keys change.
+    """
+
+    def __init__(self, max_size=None, max_ttl=None):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keyset = None
+
+    def get_max_size(self):
+        return self.max_size if self.max_size is not None else getattr(settings, 'JWT_VERIFY_CACHE_SIZE', 10000)
+
+    def get_max_ttl(self):
+        return self.max_ttl if self.max_ttl is not None else getattr(settings, 'JWT_VERIFY_CACHE_TTL', 300)
+
+    def get(self, token, keyset):
+        """ Return cached claims for ``token`` verified against ``keyset``, or None. """
+        digest = token_digest(token)
+        with self.lock:
+            if keyset is not self.keyset:
+                self.entries.clear()
+                self.keyset = keyset
+                return None
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if time.time() >= expires_at:
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return claims
+
+    def set(self, token, claims, keyset):
+        expires_at = time.time() + self.get_max_ttl()
+        exp = json.loads(claims).get('exp')
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        digest = token_digest(token)
+        with self.lock:
+            if keyset is not self.keyset:
+                self.entries.clear()
+                self.keyset = keyset
+            self.entries[digest] = (claims, expires_at)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.get_max_size():
+                self.entries.popitem(last=False)
+
+    def evict(self, token):
+        with self.lock:
+            self.entries.pop(token_digest(token), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = VerifiedTokenCache()
+
+
+@receiver(token_revoked)
+def evict_revoked_token(sender, token, **kwargs):
+    token_cache.evict(token)
@@ -7,6 +7,8 @@ app_name = "profiles"
 urlpatterns = [
     path('me/', profile.ProfileDetailView.as_view(), name='profile'),
     path('public/<uuid:id>/', profile.PublicProfileDetailView.as_view(), name='public_profile'),
+    path('qr/<uuid:uuid>.png', profile.profile_qr, {'fmt': 'png'}, name='profile_qr_png'),
+    path('qr/<uuid:uuid>.svg', profile.profile_qr, {'fmt': 'svg'}, name='profile_qr_svg'),
     path('register/', user_view.user_register, name='register'),
     path('login/', user_view.user_login, name='login'),
     path('logout/', user_view.user_logout, name='logout'),
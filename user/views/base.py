@@ -7,12 +7,15 @@ import random
 import string
 import base64
 import hashlib
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.http import response
 from django.views.decorators.csrf import csrf_exempt
 from user.views.utils import generate_jwt, verify_jwt
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.conf import settings
+from main.cache import get_generations
 from schools.models.schoolsModel import ScholarshipType, School, SchoolType, Scholarship
 
 
@@ -27,38 +30,41 @@ def index(request, type=None):
         
     types = SchoolType.objects.all()
         
+    # The querysets are lazy: they only run when a cached fragment below has to be rebuilt
     context = {
         "page_title": "Home",
         "header_title": "Home",
         'school_data': SCHOOL, 
         'type_req': type,
         'types': types,
+        'fragment_timeout': settings.HOME_FRAGMENT_CACHE_TIMEOUT,
+        'fragment_versions': get_generations("schools", "school_types", "ads"),
     }
 
     return render(request, "pages/home.html", context)
 
 
-def scholarship(request, type=None):
-    
+async def scholarship(request, type=None):
+    """ Scholarships, optionally of one type; fetched with the async ORM, rendered in a worker thread. """
     if type:
-        try:
-            scholarship_data = Scholarship.objects.filter(type__type__iexact = type).distinct()        
-        except SchoolType.DoesNotExist:
-            scholarship_data = Scholarship.objects.none()
+        scholarship_data = Scholarship.objects.filter(type__type__iexact = type).distinct()
     else:
         scholarship_data = Scholarship.objects.all()
-        
+
+    # The template only shows the name and thumbnail of each scholarship
+    scholarship_data = scholarship_data.only("pk", "name", "local_name", "thumbnail")
     types = ScholarshipType.objects.all()
         
     context = {
         "page_title": "Home",
         "header_title": "Home",
-        'scholarships': scholarship_data, 
+        'scholarships': [s async for s in scholarship_data.aiterator()], 
         'type_req': type,
-        'types': types,
+        'types': [t async for t in types],
     }
 
-    return render(request, "pages/scholarships.html", context)
+    # The base layout reads the session user lazily, which must stay synchronous
+    return await sync_to_async(render)(request, "pages/scholarships.html", context)
 
 
 @csrf_exempt
@@ -1,22 +1,35 @@
-import qrcode
-import io
 import logging
-import base64
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import UpdateView
 from django.views.generic.edit import CreateView
-from django.urls import reverse, reverse_lazy
+from django.urls import reverse_lazy
 from schools.models.OnlineProfile import Platform
-from user.models import Letter, Profile, ProfileContact
+from user.aggregate import ProfileAggregate
+from user.middleware.profile import get_profile
+from user.models import Profile, ProfileContact
+from user.qr import QR_FORMATS, get_qr, public_profile_url, qr_digest, qr_tag, qr_url
 from django.utils.translation import gettext as _
 from user.views.experience import ExperienceObject 
 from django.contrib import messages
 
 logger = logging.getLogger(__name__)
 
+def get_aggregate_or_404(profile_uuid):
+    """ The profile aggregate; a missing profile or a profile without a letter is a 404. """
+    try:
+        aggregate = ProfileAggregate.get(profile_uuid)
+    except Profile.DoesNotExist:
+        raise Http404
+    if aggregate.letter is None:
+        raise Http404
+    return aggregate
+
+
 # @login_required
 class ProfileDetailView(DetailView):
     model = Profile
@@ -24,29 +37,24 @@ class ProfileDetailView(DetailView):
     context_object_name = 'profile'
 
     def get_object(self):
-        return get_object_or_404(Profile, user=self.request.user)
+        profile = get_profile(self.request)
+        if profile is None:
+            raise Http404
+        self.aggregate = get_aggregate_or_404(profile.uuid)
+        return self.aggregate.profile
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         user_profile = self.object
-        experience_object = ExperienceObject(user=user_profile)
-        experiences = experience_object.get_by_user()
-        letter = get_object_or_404(Letter, user=self.request.user)
+        aggregate = self.aggregate
 
-        # Build public profile URL
-        public_profile_url = self.request.build_absolute_uri(
-            reverse('profiles:public_profile', kwargs={'id': user_profile.uuid})
-        )
+        profile_url = public_profile_url(user_profile.uuid)
 
-        # Generate QR Code
-        qr_image = qrcode.make(public_profile_url)
-        buffered = io.BytesIO()
-        qr_image.save(buffered, format="PNG")
-        qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
+        # The QR code is served (and cached) by profile_qr; the page only links to it
+        qr_code_url = qr_url(user_profile.uuid)
 
         # Contacts and platforms
-        contact_profiles = ProfileContact.objects.filter(profile__user=self.request.user)
         privacy_choices = ProfileContact.PrivacyChoices.choices
         platforms = Platform.objects.all()
 
@@ -54,13 +62,13 @@ class ProfileDetailView(DetailView):
         context.update({
             "Title": _("Profile"),
             "Header": "Profile",
-            "experiences": experiences,
-            "letter": letter.content,
-            "contact_profiles": contact_profiles.filter(privacy=0),
-            "qr_code_base64": qr_code_base64,
-            "public_profile_url": public_profile_url,
+            "aggregate": aggregate,
+            "experiences": aggregate.experiences,
+            "letter": aggregate.letter.content,
+            "qr_code_url": qr_code_url,
+            "public_profile_url": profile_url,
             "privacy_choices": privacy_choices,
-            "contact_profiles": contact_profiles,
+            "contact_profiles": aggregate.contacts,
             "platforms": platforms,
             "now": timezone.now(),
         })
@@ -107,15 +115,14 @@ class PublicProfileDetailView(DetailView):
     def get_object(self, queryset=None):
         uuid = self.kwargs.get(self.pk_url_kwarg)
         logger.info(f"Accessing public profile with id={uuid}")
-        return get_object_or_404(Profile, uuid=uuid)
+        self.aggregate = get_aggregate_or_404(uuid)
+        return self.aggregate.profile
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         user_profile = self.object
-        experience_object = ExperienceObject(user=user_profile)
-        experiences = experience_object.get_by_user()
-        letter = get_object_or_404(Letter, user=user_profile.user)
+        aggregate = self.aggregate
 
         full_name = "unknown"
         if user_profile.user.first_name and user_profile.user.last_name:
@@ -124,10 +131,10 @@ class PublicProfileDetailView(DetailView):
         context.update({
             "Title": _("Profile") + " " + full_name,
             "Header": "Profile",
-            "experiences": experiences,
-            "letter": letter.content,
-            "contact_profiles": ProfileContact.objects.filter(profile__user=user_profile.user, privacy=0),
-            "platforms": Platform.objects.all(),
+            "aggregate": aggregate,
+            "experiences": aggregate.experiences,
+            "letter": aggregate.letter.content,
+            "contact_profiles": aggregate.public_contacts,
         })
 
         return context
@@ -166,8 +173,13 @@ class AddContactView(CreateView):
         platform_id = self.request.POST.get("platform")
         platform = get_object_or_404(Platform, id=platform_id)
 
+        # request.profile is lazy; resolve it before assigning it to the FK
+        profile = get_profile(self.request)
+        if profile is None:
+            raise Http404
+
         # Set fields that are not coming from the form
-        form.instance.profile = self.request.user.profile
+        form.instance.profile = profile
         form.instance.platform = platform
 
         messages.success(self.request, _("Contact added!"))
@@ -198,4 +210,28 @@ def profile_beta(request):
         "page_title": "Beta profile",
         "content": "Profile Beta content"
     }
-    return render(request, template_name, context)
\ No newline at end of file
+    return render(request, template_name, context)
+
+
+def qr_etag(request, uuid, fmt):
+    return qr_digest(public_profile_url(uuid), fmt)
+
+
+@require_GET
+@condition(etag_func=qr_etag)
+def profile_qr(request, uuid, fmt):
+    """
+    QR code (PNG or SVG) of a public profile URL on SITE_URL. Each rendering
+    is stored once per profile. Requested through ``qr_url`` (``?v=`` names
+    the current rendering) the response never changes, so browsers and CDNs
+    may keep it for a year; any other URL is revalidated with the ETag, so a
+    new SITE_URL reaches it.
+    """
+    get_object_or_404(Profile.objects.only("pk"), uuid=uuid)
+    content = get_qr(uuid, fmt)
+    response = HttpResponse(content, content_type=QR_FORMATS[fmt])
+    if request.GET.get("v") == qr_tag(uuid, fmt):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "public, no-cache"
+    return response
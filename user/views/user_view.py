@@ -1,13 +1,12 @@
 import logging
-import time
-from django.core.cache import cache
 from django.contrib import messages
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth import authenticate, login, logout
-from user.models import User, Profile
+from user.models import User
 from user.forms.user_forms import RegisterForm, CustomerAuthenticationForm
+from user.throttling import login_throttle
 
 # Create your views here.
 def user_register(request):
@@ -44,20 +43,20 @@ def user_login(request):
         username = request.POST.get("username")
         password = request.POST.get("password")
         
-        # Rate-limiting: get failed attempts from cache
-        cache_key = f"login_attempts_{username}"
-        attempts = cache.get(cache_key, 0)
-
-        # Introduce delay: 1 + 1 * attempts seconds
-        time.sleep(1 + attempts)
+        # Rate-limiting: reject right away while the username or IP has too many failures
+        retry_after = login_throttle.retry_after(request, username)
+        if retry_after:
+            messages.error(request, f'Too many failed attempts. Try again in {retry_after} seconds.')
+            response = render(request, template_name, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
 
         user = authenticate(request, username=username, password=password)
 
         if user is not None:
             # Reset the attempt counter on successful login
-            cache.delete(cache_key)
+            login_throttle.success(request, username)
 
-            Profile.objects.get_or_create(user=user)
             login(request, user)
 
             next_url = request.GET.get('next')
@@ -73,8 +72,8 @@ def user_login(request):
 
             return redirect(next_url)
         else:
-            # Increment failed attempts
-            cache.set(cache_key, attempts + 1, timeout=300)  # expire after 5 minutes
+            # Count the failure against both the username and the IP
+            login_throttle.failure(request, username)
             messages.error(request, 'Invalid Username or Password')
 
     return render(request, template_name)
@@ -1,24 +1,22 @@
-from jwcrypto import jwt, jwk
-from django.conf import settings
+from jwcrypto import jwt
 from django.urls import reverse
-import os
-
-def load_key(file_path):
-    with open(file_path, 'rb') as f:
-        return f.read()
+from user.keys import key_manager
+from user.token_cache import token_cache
 
 def generate_jwt(payload):
-    private_key = load_key(settings.JWT_PRIVATE_KEY_PATH)
-    key = jwk.JWK.from_pem(private_key)
-    token = jwt.JWT(header={'alg': 'RS256'}, claims=payload)
+    key = key_manager.signing_key()
+    token = jwt.JWT(header={'alg': 'RS256', 'kid': key.get('kid')}, claims=payload)
     token.make_signed_token(key)
     return token.serialize()
 
 def verify_jwt(token):
-    public_key = load_key(settings.JWT_PUBLIC_KEY_PATH)
-    key = jwk.JWK.from_pem(public_key)
-    jwt_token = jwt.JWT(jwt=token, key=key)
-    return jwt_token.claims
+    # The key set picks the key matching the token's ``kid`` header
+    keys = key_manager.verification_keys()
+    claims = token_cache.get(token, keys)
+    if claims is None:
+        claims = jwt.JWT(jwt=token, key=keys).claims
+        token_cache.set(token, claims, keys)
+    return claims
 
 
 def get_base_breadcrumbs():